@@ -0,0 +1,177 @@
+"""
+Agregado por máquina de mpredict_mpredictalert en una vista materializada, para que el
+detalle 'summary' de los listados de máquinas no agregue alertas en vivo.
+
+Las tools no crean nada: la vista se construye una vez con
+
+    python -m src.deps.alert_agg            # crea la vista y sus índices
+    python -m src.deps.alert_agg --refresh  # la refresca a mano
+    python -m src.deps.alert_agg --drop     # la elimina
+
+y se activa con MPREDICT_AGG_ENABLED=true. Mientras esté desactivada o no exista, las
+tools siguen con la agregación LATERAL en vivo.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from src.deps import db_portal, utils
+
+logger = logging.getLogger("plant-risk-mcp.alert_agg")
+
+
+# -----------------------------------------------------------------------------
+# Agregado por máquina de mpredict_mpredictalert (vista materializada)
+# -----------------------------------------------------------------------------
+VIEW = "public.mcp_asset_alert_agg"
+
+ENABLED = os.getenv("MPREDICT_AGG_ENABLED", "false").lower() == "true"
+REFRESH_SECONDS = float(os.getenv("MPREDICT_AGG_REFRESH_SECONDS", "60"))
+RETRY_SECONDS = float(os.getenv("MPREDICT_AGG_RETRY_SECONDS", "300"))
+
+_OPEN = "lower(m.state) = 'open'"
+_TOP_LEVEL = f"ARRAY_AGG(m.risk_level ORDER BY {utils._risk_order_sql('m')} DESC)"
+
+CREATE_SQL = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {VIEW} AS
+    SELECT
+        m.asset_id,
+        COUNT(*)::int                                   AS alert_count,
+        (COUNT(*) FILTER (WHERE {_OPEN}))::int          AS open_count,
+        MAX(m.timestamp)                                AS last_ts,
+        MAX(m.timestamp) FILTER (WHERE {_OPEN})         AS open_last_ts,
+        ({_TOP_LEVEL})[1]                               AS top_level,
+        ({_TOP_LEVEL} FILTER (WHERE {_OPEN}))[1]        AS open_top_level,
+        now()                                           AS refreshed_at
+    FROM public.mpredict_mpredictalert m
+    GROUP BY m.asset_id
+"""
+INDEX_SQL = f"CREATE UNIQUE INDEX IF NOT EXISTS mcp_asset_alert_agg_asset_id ON {VIEW} (asset_id)"
+OPEN_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS mcp_asset_alert_agg_open ON {VIEW} (asset_id) WHERE open_count > 0"
+)
+# Un solo refresco a la vez entre réplicas; CONCURRENTLY no bloquea las lecturas
+REFRESH_SQL = f"""
+    DO $$
+    BEGIN
+        IF pg_try_advisory_xact_lock(hashtext('{VIEW}')) THEN
+            REFRESH MATERIALIZED VIEW CONCURRENTLY {VIEW};
+        END IF;
+    END
+    $$
+"""
+READY_SQL = f"""
+    SELECT to_regclass('{VIEW}') IS NOT NULL
+       AND to_regclass('public.mcp_asset_alert_agg_asset_id') IS NOT NULL AS ok
+"""
+AS_OF_SQL = f"""
+    SELECT MAX(refreshed_at) AS as_of,
+           COALESCE(EXTRACT(EPOCH FROM now() - MAX(refreshed_at)), 0)::float AS age
+    FROM {VIEW}
+"""
+
+
+class AlertAggregates:
+    """
+    Comprueba (cacheado) si la vista está construida y la refresca en segundo plano cada
+    REFRESH_SECONDS. Nunca ejecuta DDL: si la vista no existe, `ready()` devuelve False
+    y se vuelve a comprobar cada RETRY_SECONDS, para detectar un bootstrap posterior.
+    """
+
+    def __init__(self) -> None:
+        self.available: Optional[bool] = None
+        self.as_of = None
+        self._checked_at = 0.0
+        self._refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            row = await db_portal.fetch_one(READY_SQL)
+            self.available = bool(row and row["ok"])
+            if self.available:
+                await self._read_as_of()
+        except Exception as e:
+            logger.warning(f"[alert_agg] no se pudo comprobar la vista: {e}")
+            self.available = False
+        if not self.available:
+            logger.info("[alert_agg] vista no construida, se usa agregación en vivo (python -m src.deps.alert_agg)")
+
+    async def _read_as_of(self) -> None:
+        # La antigüedad real (puede haber refrescado otra réplica) marca el próximo refresco
+        row = await db_portal.fetch_one(AS_OF_SQL)
+        self.as_of = row["as_of"] if row else None
+        self._refreshed_at = time.monotonic() - (float(row["age"]) if row else 0.0)
+
+    async def refresh(self) -> None:
+        try:
+            await db_portal.execute(REFRESH_SQL)
+            await self._read_as_of()
+        except Exception as e:
+            logger.warning(f"[alert_agg] refresco fallido: {e}")
+            self._refreshed_at = time.monotonic()
+
+    async def ready(self) -> bool:
+        if not ENABLED:
+            return False
+        now = time.monotonic()
+        if self.available is None or (not self.available and now - self._checked_at > RETRY_SECONDS):
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._check())
+            await asyncio.shield(self._task)
+        elif self.available and now - self._refreshed_at > REFRESH_SECONDS:
+            # No se espera: la tool lee la vista tal como esté y el refresco va por detrás
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self.refresh())
+        return bool(self.available)
+
+    def freshness(self) -> Optional[str]:
+        as_of = self.as_of
+        return as_of.isoformat() if hasattr(as_of, "isoformat") else as_of
+
+
+aggregates = AlertAggregates()
+
+
+# -----------------------------------------------------------------------------
+# Bootstrap / migración
+# -----------------------------------------------------------------------------
+async def install() -> None:
+    await db_portal.execute(CREATE_SQL)
+    await db_portal.execute(INDEX_SQL)
+    await db_portal.execute(OPEN_INDEX_SQL)
+
+
+async def drop() -> None:
+    await db_portal.execute(f"DROP MATERIALIZED VIEW IF EXISTS {VIEW}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Construye/refresca/elimina la vista de agregados de alertas")
+    ap.add_argument("--refresh", action="store_true", help="refresca la vista ya construida")
+    ap.add_argument("--drop", action="store_true", help="elimina la vista y sus índices")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> None:
+        if args.drop:
+            await drop()
+            logger.info("[alert_agg] vista eliminada")
+            return
+        if args.refresh:
+            await db_portal.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {VIEW}")
+        else:
+            await install()
+        row = await db_portal.fetch_one(f"SELECT COUNT(*)::int AS n FROM {VIEW}")
+        logger.info(f"[alert_agg] listo: {row['n']} máquinas en {VIEW}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import anyio
+
+from src.deps import metrics
+
+logger = logging.getLogger("plant-risk-mcp.bq")
+
+
+# -----------------------------------------------------------------------------
+# Ejecución de BigQuery fuera del event loop
+# -----------------------------------------------------------------------------
+# El cliente de google-cloud-bigquery es síncrono: cada llamada se hace en un hilo y, como mucho,
+# BQ_MAX_CONCURRENCY a la vez (el resto espera sin bloquear el loop ni acaparar los hilos de anyio
+# que usan los pools de Postgres).
+MAX_CONCURRENCY = int(os.getenv("BQ_MAX_CONCURRENCY", "4"))
+TIMEOUT_SECONDS = float(os.getenv("BQ_TIMEOUT_SECONDS", "120"))
+METRICS_NAME = "bigquery"
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+_module: Any = None
+
+
+async def bigquery() -> Any:
+    """
+    Módulo google.cloud.bigquery, importado en un hilo la primera vez que una tool lo pide
+    (arrastra pyarrow, y pandas si está instalado: ~0.5 s que ni el arranque ni el event loop tienen por qué pagar).
+    """
+    global _module
+    if _module is None:
+        _module = await anyio.to_thread.run_sync(importlib.import_module, "google.cloud.bigquery")
+    return _module
+
+
+class LazyClient:
+    """bigquery.Client(project=...) creado en el primer uso, desde el hilo que lanza el job."""
+
+    def __init__(self, project: str) -> None:
+        self.project = project
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                from google.cloud import bigquery as bq_module
+
+                self._client = bq_module.Client(project=self.project)
+            return self._client
+
+
+def resolve(client: Any) -> Any:
+    """Cliente real a partir de un cliente o un LazyClient (bloqueante: llamar desde un hilo)."""
+    return client.get() if isinstance(client, LazyClient) else client
+
+
+def limiter() -> anyio.CapacityLimiter:
+    # Perezoso: CapacityLimiter necesita un event loop en marcha
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(MAX_CONCURRENCY)
+    return _limiter
+
+
+async def call(client: Any, method: str, *args: Any) -> Any:
+    """Llamada bloqueante corta al cliente (p.ej. "get_table") en un hilo acotado."""
+    return await anyio.to_thread.run_sync(lambda: getattr(resolve(client), method)(*args), limiter=limiter())
+
+
+async def _cancel(job: Any) -> None:
+    with anyio.CancelScope(shield=True):
+        try:
+            await anyio.to_thread.run_sync(job.cancel)
+            logger.info(f"[bq] job {job.job_id} cancelado")
+        except Exception as e:
+            logger.warning(f"[bq] no se pudo cancelar el job {getattr(job, 'job_id', '?')}: {e}")
+
+
+async def _run(
+    client: Any,
+    sql: str,
+    job_config: Any,
+    fetch: Callable[[Any, float], Any],
+    timeout: Optional[float],
+) -> Any:
+    """
+    Lanza el job y espera `fetch(job, timeout)` en un hilo. Si se pasa de `timeout` o la
+    llamada se cancela (cliente desconectado), cancela también el job en BigQuery para no
+    seguir pagando el escaneo. El hilo no se espera: job.result(timeout=...) lo acota.
+    """
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    submitted: List[Any] = []
+    queued_at = time.perf_counter()
+    started: List[float] = []
+
+    def submit() -> Any:
+        started.append(time.perf_counter())
+        job = resolve(client).query(sql, job_config=job_config)
+        submitted.append(job)
+        return job
+
+    try:
+        with anyio.fail_after(timeout):
+            job = await anyio.to_thread.run_sync(submit, limiter=limiter())
+            out = await anyio.to_thread.run_sync(fetch, job, timeout, limiter=limiter(), abandon_on_cancel=True)
+    except TimeoutError:
+        if submitted:
+            await _cancel(submitted[0])
+        job_id = getattr(submitted[0], "job_id", "?") if submitted else "-"
+        raise TimeoutError(f"BigQuery job {job_id} cancelled after {timeout:g}s") from None
+    except anyio.get_cancelled_exc_class():
+        if submitted:
+            await _cancel(submitted[0])
+        raise
+
+    done = time.perf_counter()
+    begin = started[0] if started else queued_at
+    rows = len(out) if hasattr(out, "__len__") else 0  # lista o DataFrame; un QueryJob no cuenta filas
+    metrics.record_query(METRICS_NAME, begin - queued_at, done - begin, rows)
+    return out
+
+
+async def query(client: Any, sql: str, job_config: Any = None, *, timeout: Optional[float] = None) -> Any:
+    """Ejecuta la consulta (o DML) hasta el final y devuelve el QueryJob (p.ej. num_dml_affected_rows)."""
+
+    def wait(job: Any, t: float) -> Any:
+        job.result(timeout=t)
+        return job
+
+    return await _run(client, sql, job_config, wait, timeout)
+
+
+async def query_rows(
+    client: Any, sql: str, job_config: Any = None, *, timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Filas como dicts (columna -> valor), leídas en el hilo directamente del RowIterator:
+    sin pasar por pandas y con los tipos de Python del cliente (int, datetime, None...).
+    """
+
+    def rows(job: Any, t: float) -> List[Dict[str, Any]]:
+        it = job.result(timeout=t)
+        names = [field.name for field in it.schema]
+        return [dict(zip(names, row.values())) for row in it]
+
+    return await _run(client, sql, job_config, rows, timeout)
@@ -0,0 +1,307 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from pydantic_core import to_jsonable_python
+
+logger = logging.getLogger("plant-risk-mcp.cache")
+
+
+# -----------------------------------------------------------------------------
+# Caché en memoria con TTL, tope LRU y single-flight
+# -----------------------------------------------------------------------------
+class TTLCache:
+    """
+    clave -> (caduca_en, valor). Con ttl <= 0 no guarda nada (get_or_load llama siempre
+    al loader), así que se puede dejar siempre puesta y activarla por configuración.
+
+    `get_or_load()` comparte una sola carga entre las llamadas concurrentes con la misma
+    clave: si diez peticiones llegan a la vez con la caché fría, sólo una va a la BD.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Elimina las entradas para las que predicate(clave, valor) es cierto; devuelve cuántas."""
+        keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await loader()
+        hit, value = self.get(key)
+        if hit:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+        # shield: si el llamante que la lanzó se cancela, las demás siguen esperando la misma carga
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+
+# -----------------------------------------------------------------------------
+# Caché de resultados de tools (decorador)
+# -----------------------------------------------------------------------------
+def _parse_ttls(value: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for item in value.replace(";", ",").split(","):
+        name, sep, ttl = item.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = float(ttl)
+    return out
+
+
+DEFAULT_TTL = float(os.getenv("MCP_CACHE_TTL", "30"))  # s; 0 = sin caché
+# Por tool o prefijo de tool: "rca_simple_counters=10,minspect_=120" (gana el prefijo más largo)
+TTL_OVERRIDES = _parse_ttls(os.getenv("MCP_CACHE_TTLS", ""))
+MAX_ENTRIES = int(os.getenv("MCP_CACHE_MAX_ENTRIES", "1024"))
+# Backend compartido entre réplicas (Redis o compatible: Valkey, KeyDB, Memorystore...)
+REDIS_URL = os.getenv("MCP_CACHE_REDIS_URL")
+REDIS_PREFIX = os.getenv("MCP_CACHE_REDIS_PREFIX", "mcp:cache:")
+
+
+def _json_default(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def make_key(tool: str, args: Dict[str, Any]) -> str:
+    """'<tool>:<sha1 de los argumentos normalizados>' (el prefijo permite invalidar por tool)."""
+    payload = json.dumps(args, sort_keys=True, default=_json_default, separators=(",", ":"))
+    return f"{tool}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def _matches(args: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    return all(str(args.get(k)) == str(_normalize(v)) for k, v in filters.items())
+
+
+class RedisBackend:
+    """
+    Entradas {"args": ..., "value": ...} en JSON con caducidad nativa (PX). El cliente
+    (redis.asyncio) se importa y crea en el primer uso: sin MCP_CACHE_REDIS_URL no hace
+    falta tener instalado el paquete redis.
+    """
+
+    def __init__(self, url: str, prefix: str = REDIS_PREFIX) -> None:
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis.asyncio as aioredis
+
+            self._client = aioredis.from_url(self.url)
+        return self._client
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        raw = await self._redis().get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        # Mismo conversor que usa FastMCP al serializar la respuesta: un hit sale idéntico a un miss
+        raw = json.dumps(to_jsonable_python(entry), separators=(",", ":"))
+        await self._redis().set(self.prefix + key, raw, px=max(1, int(ttl * 1000)))
+
+    async def invalidate(self, prefix: str, filters: Dict[str, Any]) -> int:
+        client = self._redis()
+        pattern = self.prefix + "".join("\\" + c if c in "*?[]\\" else c for c in prefix) + "*"
+        removed = 0
+        async for k in client.scan_iter(match=pattern, count=500):
+            if filters:
+                raw = await client.get(k)
+                if raw is None or not _matches(json.loads(raw).get("args") or {}, filters):
+                    continue
+            removed += await client.delete(k)
+        return removed
+
+
+class ToolCache:
+    """
+    Caché de resultados de las tools de sólo lectura:
+
+        @mcp.tool(description=...)
+        @cache.cached()
+        async def rca_simple_counters(...): ...
+
+    - Clave: nombre de la tool + argumentos normalizados (con sus valores por defecto).
+    - TTL por tool (MCP_CACHE_TTLS, o el del decorador, o MCP_CACHE_TTL); 0 la desactiva.
+    - En memoria con tope LRU (MCP_CACHE_MAX_ENTRIES) o en Redis si hay MCP_CACHE_REDIS_URL.
+    - Single-flight: llamadas idénticas concurrentes en la misma réplica esperan a una sola.
+    - No se cachean excepciones ni respuestas {"error": ...}.
+    """
+
+    def __init__(self, redis_url: Optional[str] = REDIS_URL) -> None:
+        self.memory = TTLCache(DEFAULT_TTL, maxsize=MAX_ENTRIES)
+        self.backend: Optional[RedisBackend] = RedisBackend(redis_url) if redis_url else None
+        self.hits = 0
+        self.misses = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def ttl_for(self, tool: str, default: Optional[float] = None) -> float:
+        matches = [p for p in TTL_OVERRIDES if tool.startswith(p)]
+        if matches:
+            return TTL_OVERRIDES[max(matches, key=len)]
+        return DEFAULT_TTL if default is None else default
+
+    async def _lookup(self, key: str) -> Tuple[bool, Any]:
+        if self.backend is None:
+            hit, entry = self.memory.get(key)
+            return hit, entry["value"] if hit else None
+        try:
+            hit, entry = await self.backend.get(key)
+            return hit, entry["value"] if hit else None
+        except Exception as e:
+            logger.warning(f"[cache] lectura de Redis fallida, se consulta la BD: {e}")
+            return False, None
+
+    async def _store(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        if self.backend is None:
+            self.memory.set(key, entry, ttl)
+            return
+        try:
+            await self.backend.set(key, entry, ttl)
+        except Exception as e:
+            logger.warning(f"[cache] escritura en Redis fallida: {e}")
+
+    async def _fetch(self, key: str, args: Dict[str, Any], ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            hit, value = await self._lookup(key)
+            if hit:
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = await loader()
+            if not (isinstance(value, dict) and "error" in value):
+                await self._store(key, {"args": args, "value": value}, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_load(self, tool: str, args: Dict[str, Any], ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        key = make_key(tool, args)
+        if self.backend is None:
+            hit, entry = self.memory.get(key)
+            if hit:
+                self.hits += 1
+                return entry["value"]
+        # La lectura de Redis también va dentro del single-flight: las llamadas que llegan
+        # mientras tanto esperan a esta tarea en vez de leer (y quizá fallar) por su cuenta
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, args, ttl, loader))
+            self._inflight[key] = task
+        # shield: si el llamante que la lanzó se cancela, las demás siguen esperando la misma carga
+        return await asyncio.shield(task)
+
+    def cached(self, ttl: Optional[float] = None, name: Optional[str] = None):
+        """Decorador para la función de la tool (debajo de @mcp.tool); conserva firma y docstring."""
+
+        def decorator(fn):
+            tool = name or fn.__name__
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                seconds = self.ttl_for(tool, ttl)
+                if seconds <= 0:
+                    return await fn(*args, **kwargs)
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return await self.get_or_load(
+                    tool, _normalize(dict(bound.arguments)), seconds, lambda: fn(*args, **kwargs)
+                )
+
+            return wrapper
+
+        return decorator
+
+    async def invalidate(self, prefix: str = "", **filters: Any) -> int:
+        """
+        Borra las entradas de las tools que empiezan por `prefix` ("" = todas) cuyos
+        argumentos coinciden con `filters`, p.ej. invalidate("mpredict_", plant_id="3").
+        """
+        if self.backend is None:
+            return self.memory.invalidate(
+                lambda k, entry: str(k).startswith(prefix) and _matches(entry["args"], filters)
+            )
+        try:
+            return await self.backend.invalidate(prefix, filters)
+        except Exception as e:
+            logger.warning(f"[cache] invalidación en Redis fallida: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.backend is not None else "memory",
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+tools = ToolCache()
+cached = tools.cached
+invalidate = tools.invalidate
@@ -0,0 +1,876 @@
+import atexit
+import functools
+import json
+import logging
+import re
+import threading
+import time
+import weakref
+from contextlib import aclosing, contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import anyio
+
+from src.deps import metrics, slow_queries, stmt_cache
+
+logger = logging.getLogger("plant-risk-mcp.db")
+
+
+def _connect_direct_pg8000(host: str, port: int, user: str, password: str, db: str):
+    """Conexión directa (sin Cloud SQL Connector), para desarrollo local y benchmarks."""
+    import pg8000.dbapi
+
+    if host.startswith("/"):  # directorio de socket unix
+        return pg8000.dbapi.connect(user=user, password=password, database=db, unix_sock=f"{host}/.s.PGSQL.{port}")
+    return pg8000.dbapi.connect(user=user, password=password, database=db, host=host, port=port)
+
+
+# -----------------------------------------------------------------------------
+# Pool de conexiones pg8000 sobre un único Cloud SQL Connector por proceso
+# -----------------------------------------------------------------------------
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used", "needs_check", "statements")
+
+    def __init__(self, conn: Any):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.needs_check = False
+        # Sentencias preparadas de esta conexión; desaparecen con ella al reciclarla
+        self.statements: Optional[stmt_cache.StatementCache] = None
+
+
+class ConnectionPool:
+    """
+    Pool acotado y thread-safe de conexiones pg8000.
+
+    - Un solo Connector (TLS + refresco de certificados) para toda la vida del proceso.
+    - Como mucho `size` conexiones abiertas; si no hay libres se espera hasta `acquire_timeout`.
+    - Las conexiones ociosas más de `max_idle` s o con más de `max_lifetime` s se cierran.
+    - Si una conexión lleva más de `health_check_after` s sin usarse (o falló en su último
+      uso) se valida con `SELECT 1` antes de entregarla.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        instance: str,
+        user: str,
+        password: str,
+        db: str,
+        ip_type: str = "PUBLIC",
+        *,
+        host: Optional[str] = None,
+        port: int = 5432,
+        size: int = 10,
+        max_idle: float = 300.0,
+        max_lifetime: float = 1800.0,
+        health_check_after: float = 30.0,
+        acquire_timeout: float = 30.0,
+        statement_cache_size: int = 64,
+    ):
+        self.name = name
+        self.instance = instance
+        self.user = user
+        self.password = password
+        self.db = db
+        self.ip_type = ip_type
+        self.host = host
+        self.port = port
+        self.size = max(1, int(size))
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self.statement_cache_size = max(0, int(statement_cache_size))
+        self.statement_stats = stmt_cache.StatementCacheStats()
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[_PooledConnection] = []  # LIFO: reutiliza la más caliente
+        self._open = 0
+        self._connector: Any = None
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._closed = False
+        atexit.register(self.close)
+
+    # ---------------- conexión física ----------------
+    def _get_connector(self) -> Any:
+        with self._lock:
+            if self._connector is None:
+                # Importado aquí: el Cloud SQL Connector tarda en cargar y no hace falta hasta conectar
+                from google.cloud.sql.connector import Connector
+
+                self._connector = Connector()
+            return self._connector
+
+    def _connect(self) -> _PooledConnection:
+        if self.host:
+            conn = _connect_direct_pg8000(self.host, self.port, self.user, self.password, self.db)
+        else:
+            from google.cloud.sql.connector import IPTypes
+
+            ip_choice = IPTypes.PRIVATE if self.ip_type == "PRIVATE" else IPTypes.PUBLIC
+            conn = self._get_connector().connect(
+                self.instance,
+                driver="pg8000",
+                user=self.user,
+                password=self.password,
+                db=self.db,
+                ip_type=ip_choice,
+            )
+        # autocommit para evitar transacciones abiertas en lecturas
+        try:
+            conn.autocommit = True
+        except Exception:
+            pass
+        return _PooledConnection(conn)
+
+    def _discard(self, pc: _PooledConnection) -> None:
+        with self._lock:
+            self._open -= 1
+        try:
+            pc.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pc: _PooledConnection, now: float) -> bool:
+        return (now - pc.last_used) > self.max_idle or (now - pc.created_at) > self.max_lifetime
+
+    def _is_healthy(self, pc: _PooledConnection) -> bool:
+        try:
+            cur = pc.conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchall()
+            finally:
+                cur.close()
+            return True
+        except Exception as e:
+            logger.info(f"[pool:{self.name}] conexión descartada en health check: {e}")
+            return False
+
+    # ---------------- API ----------------
+    def acquire(self) -> _PooledConnection:
+        if self._closed:
+            raise RuntimeError(f"Pool '{self.name}' cerrado")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise RuntimeError(f"Pool '{self.name}' agotado ({self.size} conexiones en uso)")
+        try:
+            while True:
+                with self._lock:
+                    pc = self._idle.pop() if self._idle else None
+                if pc is None:
+                    break
+                now = time.monotonic()
+                if self._is_expired(pc, now):
+                    self._discard(pc)
+                    continue
+                if (pc.needs_check or (now - pc.last_used) > self.health_check_after) and not self._is_healthy(pc):
+                    self._discard(pc)
+                    continue
+                pc.needs_check = False
+                return pc
+
+            pc = self._connect()
+            with self._lock:
+                self._open += 1
+            return pc
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, pc: _PooledConnection, failed: bool = False) -> None:
+        try:
+            now = time.monotonic()
+            pc.last_used = now
+            pc.needs_check = pc.needs_check or failed
+            if self._closed or (now - pc.created_at) > self.max_lifetime:
+                self._discard(pc)
+                return
+            with self._lock:
+                self._idle.append(pc)
+            self._evict_idle(now)
+        finally:
+            self._slots.release()
+
+    def _evict_idle(self, now: float) -> None:
+        with self._lock:
+            expired = [pc for pc in self._idle if self._is_expired(pc, now)]
+            if not expired:
+                return
+            self._idle = [pc for pc in self._idle if pc not in expired]
+        for pc in expired:
+            self._discard(pc)
+
+    def statements_for(self, pc: _PooledConnection) -> Optional[stmt_cache.StatementCache]:
+        if not self.statement_cache_size:
+            return None
+        if pc.statements is None:
+            conn = pc.conn
+            pc.statements = stmt_cache.StatementCache(
+                self.statement_cache_size,
+                self.statement_stats,
+                on_evict=lambda entry: conn.close_prepared_statement(entry[1]),
+            )
+        return pc.statements
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        pc = self.acquire()
+        failed = False
+        try:
+            yield pc
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(pc, failed=failed)
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        """Limitador de hilos del mismo tamaño que el pool (se crea dentro del event loop)."""
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.size)
+        return self._limiter
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"name": self.name, "size": self.size, "open": self._open, "idle": len(self._idle)}
+        out["statement_cache"] = self.statement_stats.snapshot()
+        return out
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+            connector, self._connector = self._connector, None
+        for pc in idle:
+            self._discard(pc)
+        if connector is not None:
+            try:
+                connector.close()
+            except Exception:
+                pass
+
+
+# -----------------------------------------------------------------------------
+# Filas compactas: tuplas con un índice de columnas compartido por clase
+# -----------------------------------------------------------------------------
+class Row(tuple):
+    """
+    Fila de fetch_rows / iter_rows / fetch_batches. Ocupa lo que una tupla (sin dict por
+    fila) y se lee igual que las filas de fetch_all: r["col"], r.get("col"), dict(r).
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+@functools.lru_cache(maxsize=512)
+def row_type(fields: Tuple[str, ...]) -> type:
+    """Una clase Row por conjunto de columnas (las consultas de las tools son un conjunto fijo)."""
+    return type("Row", (Row,), {"__slots__": (), "_fields": fields, "_index": {f: i for i, f in enumerate(fields)}})
+
+
+class _CursorStream:
+    """
+    Cursor de servidor (DECLARE ... / FETCH FORWARD n) sobre una conexión del pool pg8000.
+    Cada método es bloqueante y se llama desde un hilo; la conexión queda tomada hasta close().
+    """
+
+    NAME = "mcp_stream"
+
+    def __init__(self, pool: ConnectionPool, sql: str, params: Optional[Sequence[Any]], batch_size: int):
+        self.pool = pool
+        self.sql = sql.strip().rstrip(";")
+        self.params = tuple(params or ())
+        self.batch_size = batch_size
+        self.pc: Optional[_PooledConnection] = None
+        self.cur: Any = None
+        self.db_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def open(self, queued_at: float) -> None:
+        self.pc = self.pool.acquire()
+        start = time.perf_counter()
+        self.wait_seconds = start - queued_at
+        self.cur = self.pc.conn.cursor()
+        self.cur.execute("BEGIN")
+        self.cur.execute(f"DECLARE {self.NAME} NO SCROLL CURSOR FOR {self.sql}", self.params)
+        self.db_seconds += time.perf_counter() - start
+
+    def fetch(self) -> List[Row]:
+        start = time.perf_counter()
+        self.cur.execute(f"FETCH FORWARD {int(self.batch_size)} FROM {self.NAME}")
+        rows = self.cur.fetchall() if self.cur.description else []
+        cls = row_type(tuple(d[0] for d in self.cur.description or ()))
+        batch = [cls(r) for r in rows]
+        self.db_seconds += time.perf_counter() - start
+        return batch
+
+    def close(self, failed: bool) -> None:
+        if self.pc is None:
+            return
+        try:
+            if self.cur is not None:
+                # COMMIT cierra el cursor; tras un error la transacción está abortada
+                self.cur.execute("ROLLBACK" if failed else "COMMIT")
+        except Exception:
+            failed = True
+        finally:
+            try:
+                if self.cur is not None:
+                    self.cur.close()
+            except Exception:
+                pass
+            self.pool.release(self.pc, failed=failed)
+            self.pc = None
+
+
+# -----------------------------------------------------------------------------
+# Fachada de consultas (fetch_all / fetch_one) sobre el pool
+# -----------------------------------------------------------------------------
+_STALE_STATEMENT_CODES = {"0A000", "26000"}  # cached plan must not change result type | no existe
+
+
+def _is_stale_statement(exc: Exception) -> bool:
+    info = exc.args[0] if exc.args else None
+    return isinstance(info, dict) and info.get("C") in _STALE_STATEMENT_CODES
+
+
+class Database:
+    """Backend pg8000: consultas bloqueantes ejecutadas en hilos acotados por el pool."""
+
+    def __init__(self, pool: ConnectionPool, batch_size: int = 1000):
+        self.pool = pool
+        self.batch_size = max(1, int(batch_size))
+
+    def _run_sync(
+        self, sql: str, params: Optional[Sequence[Any]], queued_at: Optional[float] = None
+    ) -> Tuple[List[str], List[Sequence[Any]]]:
+        # queued_at: cuándo la pidió el event loop (incluye la espera por un hilo del limitador)
+        start = time.perf_counter()
+        with self.pool.connection() as pc:
+            acquired = time.perf_counter()
+            cols, rows = self._run_on(pc, sql, params)
+            done = time.perf_counter()
+        metrics.record_query(self.pool.name, acquired - (queued_at or start), done - acquired, len(rows))
+        slow_queries.log.observe(self.pool.name, sql, params, done - acquired, len(rows), self.explain_sync)
+        return cols, rows
+
+    def explain_sync(self, sql: str, params: Sequence[Any]) -> List[str]:
+        """EXPLAIN (ANALYZE, BUFFERS) de una lectura, con statement_timeout acotado; devuelve las líneas del plan."""
+        with self.pool.connection() as pc:
+            cur = pc.conn.cursor()
+            try:
+                # Transacción de sólo lectura: SET LOCAL no se queda en la conexión del pool
+                cur.execute("BEGIN READ ONLY")
+                try:
+                    cur.execute(f"SET LOCAL statement_timeout = {int(slow_queries.EXPLAIN_TIMEOUT_MS)}")
+                    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, tuple(params or ()))
+                    return [row[0] for row in cur.fetchall()]
+                finally:
+                    cur.execute("ROLLBACK")
+            finally:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+
+    def _run_on(
+        self, pc: _PooledConnection, sql: str, params: Optional[Sequence[Any]]
+    ) -> Tuple[List[str], List[Sequence[Any]]]:
+        statements = self.pool.statements_for(pc) if params else None
+        if statements is not None:
+            return self._run_prepared(pc.conn, statements, sql, params)
+        cur = pc.conn.cursor()
+        try:
+            cur.execute(sql, params or ())
+            cols = [d[0] for d in cur.description] if cur.description else []
+            return cols, (cur.fetchall() if cols else [])
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+
+    def _run_prepared(
+        self, conn: Any, statements: stmt_cache.StatementCache, sql: str, params: Sequence[Any]
+    ) -> Tuple[List[str], List[Sequence[Any]]]:
+        """
+        Ejecuta con una sentencia preparada con nombre (Parse/Describe una sola vez por conexión).
+        Si el servidor invalidó la sentencia (cambio de esquema, DEALLOCATE) se prepara de nuevo.
+        """
+        from pg8000.converters import make_params
+        from pg8000.dbapi import convert_paramstyle
+
+        key = stmt_cache.normalize_sql(sql)
+        statement, vals = convert_paramstyle("format", sql, params)
+        for attempt in (0, 1):
+            entry = statements.get(key)
+            if entry is None:
+                name_bin, columns, input_funcs = conn.prepare_statement(statement, ())
+                entry = (statement, name_bin, columns, input_funcs)
+                statements.put(key, entry)
+            try:
+                context = conn.execute_named(entry[1], make_params(conn.py_types, vals), entry[2], entry[3], entry[0])
+            except Exception as e:
+                statements.invalidate(key)
+                if attempt == 0 and _is_stale_statement(e):
+                    continue
+                raise
+            cols = [c["name"] for c in context.columns] if context.columns else []
+            return cols, (context.rows or [])
+        raise RuntimeError("unreachable")
+
+    def fetch_all_sync(self, sql: str, params: tuple = (), queued_at: Optional[float] = None) -> List[Dict[str, Any]]:
+        cols, rows = self._run_sync(sql, params, queued_at)
+        return [dict(zip(cols, row)) for row in rows]
+
+    def fetch_one_sync(self, sql: str, params: tuple = (), queued_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        cols, rows = self._run_sync(sql, params, queued_at)
+        return dict(zip(cols, rows[0])) if rows else None
+
+    def execute_sync(self, sql: str, params: tuple = (), queued_at: Optional[float] = None) -> None:
+        self._run_sync(sql, params, queued_at)
+
+    async def fetch_all(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return await anyio.to_thread.run_sync(
+            self.fetch_all_sync, sql, params, time.perf_counter(), limiter=self.pool.limiter
+        )
+
+    async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        return await anyio.to_thread.run_sync(
+            self.fetch_one_sync, sql, params, time.perf_counter(), limiter=self.pool.limiter
+        )
+
+    async def execute(self, sql: str, params: tuple = ()) -> None:
+        await anyio.to_thread.run_sync(self.execute_sync, sql, params, time.perf_counter(), limiter=self.pool.limiter)
+
+    # ---------------- filas compactas y streaming ----------------
+    def fetch_rows_sync(self, sql: str, params: tuple = (), queued_at: Optional[float] = None) -> List[Row]:
+        cols, rows = self._run_sync(sql, params, queued_at)
+        cls = row_type(tuple(cols))
+        return [cls(r) for r in rows]
+
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> List[Row]:
+        return await anyio.to_thread.run_sync(
+            self.fetch_rows_sync, sql, params, time.perf_counter(), limiter=self.pool.limiter
+        )
+
+    async def fetch_batches(
+        self, sql: str, params: tuple = (), batch_size: Optional[int] = None
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Lotes de `batch_size` filas desde un cursor de servidor: en memoria sólo hay un lote
+        a la vez. La conexión queda tomada mientras se itera; si se sale antes del final,
+        usar `async with contextlib.aclosing(...)` para devolverla en el acto.
+        """
+        stream = _CursorStream(self.pool, sql, params, max(1, int(batch_size or self.batch_size)))
+        rows = 0
+        failed = True
+        # Sin el limitador del pool: la conexión ya es nuestra, y esperar por un hilo que
+        # ocupan consultas a la espera de conexión podría bloquearse mutuamente
+        try:
+            await anyio.to_thread.run_sync(stream.open, time.perf_counter())
+            while True:
+                batch = await anyio.to_thread.run_sync(stream.fetch)
+                rows += len(batch)
+                if batch:
+                    yield batch
+                if len(batch) < stream.batch_size:
+                    break
+            failed = False
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(stream.close, failed)
+            metrics.record_query(self.pool.name, stream.wait_seconds, stream.db_seconds, rows)
+            slow_queries.log.observe(self.pool.name, sql, params, stream.db_seconds, rows, self.explain_sync)
+
+    async def iter_rows(self, sql: str, params: tuple = (), batch_size: Optional[int] = None) -> AsyncIterator[Row]:
+        """Como fetch_batches, fila a fila."""
+        async with aclosing(self.fetch_batches(sql, params, batch_size)) as batches:
+            async for batch in batches:
+                for row in batch:
+                    yield row
+
+
+# -----------------------------------------------------------------------------
+# Backend asyncio nativo (asyncpg), sin hilos
+# -----------------------------------------------------------------------------
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|%%|%s")
+
+
+def to_numbered_params(sql: str) -> str:
+    """Convierte placeholders estilo format (%s) a los de asyncpg ($1, $2, ...)."""
+    counter = 0
+
+    def _sub(m: "re.Match[str]") -> str:
+        nonlocal counter
+        tok = m.group(0)
+        if tok == "%s":
+            counter += 1
+            return f"${counter}"
+        if tok == "%%":
+            return "%"
+        return tok  # literal o identificador entrecomillado
+
+    return _PLACEHOLDER_RE.sub(_sub, sql)
+
+
+_INTERVAL_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(second|minute|hour|day|week)s?\s*$", re.IGNORECASE)
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+
+
+def _coerce(type_name: str, value: Any) -> Any:
+    """
+    asyncpg es estricto con los tipos de parámetro (pg8000 deja que Postgres convierta el texto).
+    Adaptamos los valores que las tools pasan como texto (fechas ISO, '72 hours', ...).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)) and type_name.startswith("_"):
+        return [_coerce(type_name[1:], v) for v in value]
+    if type_name == "date":
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, str):
+            return _parse_datetime(value).date() if len(value.strip()) > 10 else date.fromisoformat(value.strip())
+    elif type_name in ("timestamp", "timestamptz"):
+        if isinstance(value, str):
+            value = _parse_datetime(value)
+        elif isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        if isinstance(value, datetime) and type_name == "timestamp" and value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        return value
+    elif type_name == "interval" and isinstance(value, str):
+        m = _INTERVAL_RE.match(value)
+        if m:
+            return timedelta(**{f"{m.group(2).lower()}s": float(m.group(1))})
+    elif type_name in ("int2", "int4", "int8") and isinstance(value, str):
+        return int(value)
+    elif type_name in ("float4", "float8") and isinstance(value, str):
+        return float(value)
+    elif type_name == "numeric" and isinstance(value, (str, int, float)):
+        return Decimal(str(value))
+    elif type_name in ("text", "varchar", "bpchar", "name") and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def coerce_params(param_types: Sequence[Any], params: Sequence[Any]) -> List[Any]:
+    return [_coerce(t.name, v) for t, v in zip(param_types, params)]
+
+
+async def _init_asyncpg_connection(conn: Any) -> None:
+    # Igual que pg8000: json/jsonb se devuelven ya decodificados
+    for typ in ("json", "jsonb"):
+        await conn.set_type_codec(typ, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncConnectionPool:
+    """
+    Pool asyncpg (conexiones en el propio event loop, sin hilos).
+
+    Se crea de forma perezosa en la primera consulta, dentro del loop de FastMCP.
+    Vía Cloud SQL usa el conector asíncrono; con `host` conecta directamente.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        instance: str,
+        user: str,
+        password: str,
+        db: str,
+        ip_type: str = "PUBLIC",
+        *,
+        host: Optional[str] = None,
+        port: int = 5432,
+        size: int = 10,
+        max_idle: float = 300.0,
+        acquire_timeout: float = 30.0,
+        statement_cache_size: int = 64,
+    ):
+        self.name = name
+        self.instance = instance
+        self.user = user
+        self.password = password
+        self.db = db
+        self.ip_type = ip_type
+        self.host = host
+        self.port = port
+        self.size = max(1, int(size))
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self.statement_cache_size = max(0, int(statement_cache_size))
+        self.statement_stats = stmt_cache.StatementCacheStats()
+        # conexión asyncpg física -> StatementCache (se va con la conexión al reciclarla)
+        self._statements: "weakref.WeakKeyDictionary[Any, stmt_cache.StatementCache]" = weakref.WeakKeyDictionary()
+
+        self._pool: Any = None
+        self._connector: Any = None
+        self._init_lock: Optional[anyio.Lock] = None
+
+    async def _connect(self, *args: Any, **kwargs: Any) -> Any:
+        import asyncpg
+
+        if self.host:
+            return await asyncpg.connect(
+                host=self.host, port=self.port, user=self.user, password=self.password, database=self.db
+            )
+        from google.cloud.sql.connector import IPTypes, create_async_connector
+
+        if self._connector is None:
+            self._connector = await create_async_connector()
+        ip_choice = IPTypes.PRIVATE if self.ip_type == "PRIVATE" else IPTypes.PUBLIC
+        return await self._connector.connect_async(
+            self.instance,
+            "asyncpg",
+            user=self.user,
+            password=self.password,
+            db=self.db,
+            ip_type=ip_choice,
+        )
+
+    async def get(self) -> Any:
+        if self._pool is not None:
+            return self._pool
+        if self._init_lock is None:
+            self._init_lock = anyio.Lock()
+        async with self._init_lock:
+            if self._pool is None:
+                import asyncpg
+
+                self._pool = await asyncpg.create_pool(
+                    connect=self._connect,
+                    min_size=0,
+                    max_size=self.size,
+                    max_inactive_connection_lifetime=self.max_idle,
+                    statement_cache_size=self.statement_cache_size,
+                    init=_init_asyncpg_connection,
+                )
+        return self._pool
+
+    def statements_for(self, conn: Any) -> Optional[stmt_cache.StatementCache]:
+        if not self.statement_cache_size:
+            return None
+        raw = getattr(conn, "_con", conn)  # PoolConnectionProxy -> Connection
+        cache = self._statements.get(raw)
+        if cache is None:
+            cache = stmt_cache.StatementCache(self.statement_cache_size, self.statement_stats)
+            self._statements[raw] = cache
+        return cache
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        out = {"name": self.name, "size": self.size, "open": 0, "idle": 0}
+        if pool is not None:
+            out.update(open=pool.get_size(), idle=pool.get_idle_size())
+        out["statement_cache"] = self.statement_stats.snapshot()
+        return out
+
+    async def close(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await pool.close()
+        connector, self._connector = self._connector, None
+        if connector is not None:
+            await connector.close_async()
+
+
+class AsyncDatabase:
+    """Backend asyncpg: misma API fetch_all/fetch_one, con SQL en estilo %s."""
+
+    def __init__(self, pool: AsyncConnectionPool, batch_size: int = 1000):
+        self.pool = pool
+        self.batch_size = max(1, int(batch_size))
+
+    async def _run(self, sql: str, params: Optional[Sequence[Any]], one: bool, compact: bool = False) -> Any:
+        queued_at = time.perf_counter()
+        pool = await self.pool.get()
+        async with pool.acquire(timeout=self.pool.acquire_timeout) as conn:
+            acquired = time.perf_counter()
+            query, param_types, stmt = await self._statement(conn, sql)
+            args = coerce_params(param_types, params or ())
+            if one:
+                row = await (stmt.fetchrow(*args) if stmt is not None else conn.fetchrow(query, *args))
+                out = dict(row) if row is not None else None
+            else:
+                records = await (stmt.fetch(*args) if stmt is not None else conn.fetch(query, *args))
+                if compact:
+                    cls = row_type(tuple(records[0].keys())) if records else Row
+                    out = [cls(r) for r in records]
+                else:
+                    out = [dict(r) for r in records]
+            done = time.perf_counter()
+        rows = len(out) if isinstance(out, list) else int(out is not None)
+        metrics.record_query(self.pool.name, acquired - queued_at, done - acquired, rows)
+        slow_queries.log.observe(self.pool.name, sql, params, done - acquired, rows, self.explain)
+        return out
+
+    async def explain(self, sql: str, params: Sequence[Any]) -> List[str]:
+        """EXPLAIN (ANALYZE, BUFFERS) de una lectura, con statement_timeout acotado; devuelve las líneas del plan."""
+        pool = await self.pool.get()
+        async with pool.acquire(timeout=self.pool.acquire_timeout) as conn:
+            # SET LOCAL dentro de la transacción: no se queda en la conexión del pool
+            async with conn.transaction(readonly=True):
+                await conn.execute(f"SET LOCAL statement_timeout = {int(slow_queries.EXPLAIN_TIMEOUT_MS)}")
+                stmt = await conn.prepare("EXPLAIN (ANALYZE, BUFFERS) " + to_numbered_params(sql))
+                rows = await stmt.fetch(*coerce_params(stmt.get_parameters(), params or ()))
+        return [r[0] for r in rows]
+
+    async def _statement(self, conn: Any, sql: str) -> Tuple[str, Sequence[Any], Optional[Any]]:
+        """
+        asyncpg ya mantiene su propia caché LRU de sentencias preparadas por conexión (las
+        PreparedStatement no pueden sobrevivir a la devolución al pool), así que aquí sólo
+        registramos el SQL convertido y los tipos de parámetro para no volver a describirlo.
+
+        Devuelve (query, tipos, stmt). En frío stmt es la PreparedStatement de la que salen los
+        tipos y el llamante ejecuta ésa: un solo Parse. Se prepara con la caché de asyncpg
+        (la misma que usan conn.fetch/fetchrow/cursor), así que en caliente (stmt None) las
+        llamadas conn.*(query) tampoco vuelven a prepararla.
+        """
+        statements = self.pool.statements_for(conn)
+        key = stmt_cache.normalize_sql(sql)
+        entry = statements.get(key) if statements is not None else None
+        if entry is not None:
+            return entry[0], entry[1], None
+        query = to_numbered_params(sql)
+        # _prepare(use_cache=True): conn.prepare() público no pasa por la caché de asyncpg
+        stmt = await conn._prepare(query, use_cache=True)
+        param_types = stmt.get_parameters()
+        if statements is not None:
+            statements.put(key, (query, param_types))
+        return query, param_types, stmt
+
+    async def fetch_all(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return await self._run(sql, params, one=False)
+
+    async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        return await self._run(sql, params, one=True)
+
+    async def execute(self, sql: str, params: tuple = ()) -> None:
+        queued_at = time.perf_counter()
+        pool = await self.pool.get()
+        async with pool.acquire(timeout=self.pool.acquire_timeout) as conn:
+            acquired = time.perf_counter()
+            if not params:
+                await conn.execute(sql)
+            else:
+                query, param_types, stmt = await self._statement(conn, sql)
+                args = coerce_params(param_types, params)
+                await (stmt.fetch(*args) if stmt is not None else conn.execute(query, *args))
+            done = time.perf_counter()
+        metrics.record_query(self.pool.name, acquired - queued_at, done - acquired, 0)
+        slow_queries.log.observe(self.pool.name, sql, params, done - acquired, 0)
+
+    # ---------------- filas compactas y streaming ----------------
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> List[Row]:
+        return await self._run(sql, params, one=False, compact=True)
+
+    async def fetch_batches(
+        self, sql: str, params: tuple = (), batch_size: Optional[int] = None
+    ) -> AsyncIterator[List[Row]]:
+        """Lotes desde un cursor de servidor (portal asyncpg dentro de una transacción)."""
+        size = max(1, int(batch_size or self.batch_size))
+        queued_at = time.perf_counter()
+        acquired = queued_at
+        db_seconds = 0.0
+        rows = 0
+        try:
+            pool = await self.pool.get()
+            async with pool.acquire(timeout=self.pool.acquire_timeout) as conn:
+                acquired = time.perf_counter()
+                async with conn.transaction():
+                    query, param_types, stmt = await self._statement(conn, sql)
+                    args = coerce_params(param_types, params or ())
+                    cur = await (stmt.cursor(*args) if stmt is not None else conn.cursor(query, *args))
+                    db_seconds += time.perf_counter() - acquired
+                    while True:
+                        start = time.perf_counter()
+                        records = await cur.fetch(size)
+                        cls = row_type(tuple(records[0].keys())) if records else Row
+                        batch = [cls(r) for r in records]
+                        db_seconds += time.perf_counter() - start
+                        rows += len(batch)
+                        if batch:
+                            yield batch
+                        if len(batch) < size:
+                            break
+        finally:
+            metrics.record_query(self.pool.name, acquired - queued_at, db_seconds, rows)
+            slow_queries.log.observe(self.pool.name, sql, params, db_seconds, rows, self.explain)
+
+    async def iter_rows(self, sql: str, params: tuple = (), batch_size: Optional[int] = None) -> AsyncIterator[Row]:
+        async with aclosing(self.fetch_batches(sql, params, batch_size)) as batches:
+            async for batch in batches:
+                for row in batch:
+                    yield row
+
+    def fetch_all_sync(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        raise RuntimeError("Acceso síncrono no disponible con DB_BACKEND=asyncpg")
+
+    fetch_one_sync = fetch_rows_sync = fetch_all_sync
+
+
+def create_database(
+    backend: str,
+    name: str,
+    instance: str,
+    user: str,
+    password: str,
+    db: str,
+    ip_type: str = "PUBLIC",
+    *,
+    host: Optional[str] = None,
+    port: int = 5432,
+    size: int = 10,
+    max_idle: float = 300.0,
+    max_lifetime: float = 1800.0,
+    health_check_after: float = 30.0,
+    acquire_timeout: float = 30.0,
+    statement_cache_size: int = 64,
+    fetch_batch_size: int = 1000,
+) -> Tuple[Any, Any]:
+    """Devuelve (pool, database) para el backend indicado: pg8000 (por defecto) | asyncpg."""
+    if backend == "asyncpg":
+        apool = AsyncConnectionPool(
+            name, instance, user, password, db, ip_type,
+            host=host, port=port, size=size, max_idle=max_idle, acquire_timeout=acquire_timeout,
+            statement_cache_size=statement_cache_size,
+        )
+        return apool, AsyncDatabase(apool, fetch_batch_size)
+    if backend != "pg8000":
+        raise RuntimeError(f"DB_BACKEND desconocido: {backend} (pg8000|asyncpg)")
+    spool = ConnectionPool(
+        name, instance, user, password, db, ip_type,
+        host=host, port=port, size=size, max_idle=max_idle, max_lifetime=max_lifetime,
+        health_check_after=health_check_after, acquire_timeout=acquire_timeout,
+        statement_cache_size=statement_cache_size,
+    )
+    return spool, Database(spool, fetch_batch_size)
@@ -1,84 +1,107 @@
 import os
+import threading
 from typing import Any, Dict, List, Optional, Tuple
 
-import anyio
-from google.cloud.sql.connector import Connector, IPTypes
+from src.deps import db_pool
 
 
 # -----------------------------------------------------------------------------
-# DB (Cloud SQL Connector + pg8000)
+# DB (Cloud SQL Connector + pg8000 | asyncpg, pool persistente)
 # -----------------------------------------------------------------------------
 INSTANCE = os.environ.get("PORTAL_INSTANCE") or os.environ.get("PORTAL_INSTANCE_CONNECTION_NAME")
 PGUSER   = os.environ.get("PORTAL_PGUSER")
 PGPASS   = os.environ.get("PORTAL_PGPASS")
 PGDB     = os.environ.get("PORTAL_PGDB")
 IP_TYPE  = (os.environ.get("PORTAL_IP_TYPE") or "PUBLIC").upper()  # PUBLIC | PRIVATE
+# Conexión directa sin Cloud SQL Connector (desarrollo local / benchmarks); un path => socket unix
+PGHOST   = os.environ.get("PORTAL_PGHOST")
+PGPORT   = int(os.environ.get("PORTAL_PGPORT", "5432"))
+
+# Backend: pg8000 (hilos + pool síncrono) | asyncpg (asyncio nativo)
+BACKEND  = (os.environ.get("PORTAL_DB_BACKEND") or os.environ.get("DB_BACKEND") or "pg8000").lower()
+
+# Pool: por defecto igual al tamaño del limitador de hilos que usa fetch_*
+POOL_SIZE          = int(os.environ.get("PORTAL_POOL_SIZE", "10"))
+POOL_MAX_IDLE      = float(os.environ.get("PORTAL_POOL_MAX_IDLE", "300"))       # s
+POOL_MAX_LIFETIME  = float(os.environ.get("PORTAL_POOL_MAX_LIFETIME", "1800"))  # s
+POOL_HEALTHCHECK   = float(os.environ.get("PORTAL_POOL_HEALTHCHECK", "30"))     # s ociosa antes de validar
+POOL_TIMEOUT       = float(os.environ.get("PORTAL_POOL_TIMEOUT", "30"))         # s esperando conexión libre
+STMT_CACHE_SIZE    = int(os.environ.get("PORTAL_STMT_CACHE_SIZE", "64"))        # sentencias preparadas por conexión (0 = off)
+FETCH_BATCH_SIZE   = int(os.environ.get("PORTAL_FETCH_BATCH_SIZE", "1000"))      # filas por FETCH en iter_rows/fetch_batches
+
+_db: Any = None
+_init_lock = threading.Lock()
+
+
+def _database() -> Any:
+    """
+    Pool + Database, creados en el primer uso y no al importar: las variables de entorno se
+    validan aquí, así que el servidor arranca (y registra las tools) sin tocar la BD.
+    """
+    global _db
+    if _db is None:
+        with _init_lock:
+            if _db is None:
+                if not all([INSTANCE or PGHOST, PGUSER, PGPASS, PGDB]):
+                    raise RuntimeError("Faltan variables DB: INSTANCE/INSTANCE_CONNECTION_NAME, PGUSER, PGPASS, PGDB")
+                _, _db = db_pool.create_database(
+                    BACKEND,
+                    "portal",
+                    INSTANCE,
+                    PGUSER,
+                    PGPASS,
+                    PGDB,
+                    IP_TYPE,
+                    host=PGHOST,
+                    port=PGPORT,
+                    size=POOL_SIZE,
+                    max_idle=POOL_MAX_IDLE,
+                    max_lifetime=POOL_MAX_LIFETIME,
+                    health_check_after=POOL_HEALTHCHECK,
+                    acquire_timeout=POOL_TIMEOUT,
+                    statement_cache_size=STMT_CACHE_SIZE,
+                    fetch_batch_size=FETCH_BATCH_SIZE,
+                )
+    return _db
 
-if not all([INSTANCE, PGUSER, PGPASS, PGDB]):
-    raise RuntimeError("Faltan variables DB: INSTANCE/INSTANCE_CONNECTION_NAME, PGUSER, PGPASS, PGDB")
 
 def _fetch_all_sync(sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
-    connector, conn = open_db_connection()
-    try:
-        # Opcional: autocommit para evitar transacciones abiertas en lecturas
-        try:
-            conn.autocommit = True
-        except Exception:
-            pass
-
-        cur = conn.cursor()
-        try:
-            cur.execute(sql, params)
-            cols = [d[0] for d in cur.description]
-            rows = cur.fetchall()
-            return [dict(zip(cols, row)) for row in rows]
-        finally:
-            try:
-                cur.close()
-            except Exception:
-                pass
-    finally:
-        try:
-            conn.close()
-        finally:
-            connector.close()
+    return _database().fetch_all_sync(sql, params)
 
 
 def _fetch_one_sync(sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
-    connector, conn = open_db_connection()
-    try:
-        try:
-            conn.autocommit = True
-        except Exception:
-            pass
-
-        cur = conn.cursor()
-        try:
-            cur.execute(sql, params)
-            row = cur.fetchone()
-            if row is None:
-                return None
-            cols = [d[0] for d in cur.description]
-            return dict(zip(cols, row))
-        finally:
-            try:
-                cur.close()
-            except Exception:
-                pass
-    finally:
-        try:
-            conn.close()
-        finally:
-            connector.close()
+    return _database().fetch_one_sync(sql, params)
 
 async def fetch_all(sql: str, params: tuple = ()):
-    return await anyio.to_thread.run_sync(_fetch_all_sync, sql, params)
+    return await _database().fetch_all(sql, params)
 
 async def fetch_one(sql: str, params: tuple = ()):
-    return await anyio.to_thread.run_sync(_fetch_one_sync, sql, params)
+    return await _database().fetch_one(sql, params)
+
+async def execute(sql: str, params: tuple = ()) -> None:
+    """Sentencias sin resultado (DDL, REFRESH, ...)."""
+    await _database().execute(sql, params)
+
+async def fetch_rows(sql: str, params: tuple = ()):
+    """Como fetch_all pero con filas compactas (db_pool.Row: r["col"], r.get, dict(r))."""
+    return await _database().fetch_rows(sql, params)
+
+def fetch_batches(sql: str, params: tuple = (), batch_size: Optional[int] = None):
+    """Async iterator de lotes de filas compactas desde un cursor de servidor."""
+    return _database().fetch_batches(sql, params, batch_size)
+
+def iter_rows(sql: str, params: tuple = (), batch_size: Optional[int] = None):
+    """Async iterator fila a fila (cursor de servidor, lotes de FETCH_BATCH_SIZE)."""
+    return _database().iter_rows(sql, params, batch_size)
+
+def stats() -> Dict[str, Any]:
+    """Estado del pool y contadores hit/miss de la caché de sentencias preparadas."""
+    return _database().pool.stats()
 
 def open_db_connection():
-    """Abre una conexión nueva a Cloud SQL (pg8000) y devuelve (connector, conn)."""
+    """Abre una conexión nueva a Cloud SQL (pg8000), fuera del pool, y devuelve (connector, conn)."""
+    from google.cloud.sql.connector import Connector, IPTypes
+
     connector = Connector()
     ip_choice = IPTypes.PRIVATE if IP_TYPE == "PRIVATE" else IPTypes.PUBLIC
     conn = connector.connect(
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+
+logger = logging.getLogger("plant-risk-mcp.export")
+
+
+# -----------------------------------------------------------------------------
+# Exportación de resultados completos a Parquet / Arrow IPC (descarga por token)
+# -----------------------------------------------------------------------------
+EXPORT_DIR = os.getenv("MCP_EXPORT_DIR", "/app/data/exports")             # en el PVC: compartido entre reinicios
+EXPORT_TTL = float(os.getenv("MCP_EXPORT_TTL", "3600"))                    # s hasta que caduca el enlace
+EXPORT_MAX_ROWS = int(os.getenv("MCP_EXPORT_MAX_ROWS", "5000000"))
+EXPORT_BATCH_ROWS = int(os.getenv("MCP_EXPORT_BATCH_ROWS", "50000"))       # filas por FETCH y por row group
+BASE_URL = os.getenv("BASE_URL")
+ROUTE = "/exports"
+
+FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{20,64}$")
+
+# Tipos de columna (el SELECT de cada export castea a estos tipos de Postgres)
+_TYPES = {
+    "int32": lambda pa: pa.int32(),
+    "int64": lambda pa: pa.int64(),
+    "float64": lambda pa: pa.float64(),
+    "bool": lambda pa: pa.bool_(),
+    "string": lambda pa: pa.string(),
+    "date": lambda pa: pa.date32(),
+    "timestamp": lambda pa: pa.timestamp("us"),
+    "timestamptz": lambda pa: pa.timestamp("us", tz="UTC"),
+}
+
+Fields = Sequence[Tuple[str, str]]
+
+
+class _Writer:
+    """
+    Escritor por lotes (bloqueante: se llama desde un hilo). Cada lote de filas se convierte
+    columna a columna en un RecordBatch y se escribe (un row group por lote en Parquet), así
+    que en memoria sólo hay un lote. pyarrow se importa aquí, no al arrancar el servidor.
+    """
+
+    def __init__(self, path: str, fields: Fields, fmt: str) -> None:
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = pa.schema([(name, _TYPES[kind](pa)) for name, kind in fields])
+        self.sink = open(path, "wb")
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        pa = self.pa
+        columns = list(zip(*rows))
+        arrays = [pa.array(col, type=field.type) for col, field in zip(columns, self.schema)]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        finally:
+            self.sink.close()
+
+
+def _paths(token: str) -> Tuple[str, str]:
+    return os.path.join(EXPORT_DIR, token + ".data"), os.path.join(EXPORT_DIR, token + ".json")
+
+
+def purge_expired(now: Optional[float] = None) -> int:
+    """Borra los exports caducados (y los .part abandonados); devuelve cuántos."""
+    now = now or time.time()
+    removed = 0
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if name.endswith(".json"):
+                with open(path) as f:
+                    expires_at = json.load(f).get("expires_at", 0)
+                if expires_at < now:
+                    data_path, _ = _paths(name[: -len(".json")])
+                    for p in (data_path, path):
+                        if os.path.exists(p):
+                            os.remove(p)
+                    removed += 1
+            elif name.endswith(".part") and os.path.getmtime(path) < now - EXPORT_TTL:
+                os.remove(path)
+        except (OSError, ValueError):
+            continue
+    return removed
+
+
+def lookup(token: str) -> Optional[Dict[str, Any]]:
+    """Metadatos de un export vigente ({path, filename, media_type, ...}) o None."""
+    if not token or not _TOKEN_RE.match(token):
+        return None
+    data_path, meta_path = _paths(token)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("expires_at", 0) < time.time() or not os.path.exists(data_path):
+        return None
+    meta["path"] = data_path
+    return meta
+
+
+def download_url(token: str) -> str:
+    path = f"{ROUTE}/{token}"
+    return f"{BASE_URL.rstrip('/')}{path}" if BASE_URL else path
+
+
+async def export_batches(
+    name: str,
+    batches: AsyncIterator[List[Any]],
+    fields: Fields,
+    fmt: str = "parquet",
+    max_rows: int = EXPORT_MAX_ROWS,
+) -> Dict[str, Any]:
+    """
+    Vuelca los lotes (p.ej. db_portal.fetch_batches(...)) a un fichero y devuelve el enlace
+    de descarga. Las filas deben traer las columnas de `fields` en ese orden. Si se pasa de
+    `max_rows` se corta ahí y se marca truncated=true (el SELECT puede pedir max_rows + 1).
+    """
+    fmt = (fmt or "parquet").lower()
+    if fmt not in FORMATS:
+        return {"error": f"INVALID_ARGUMENT: format must be one of {', '.join(FORMATS)}"}
+    ext, media_type = FORMATS[fmt]
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    purge_expired()
+    token = secrets.token_urlsafe(24)
+    data_path, meta_path = _paths(token)
+    tmp_path = data_path + ".part"
+
+    started = time.perf_counter()
+    rows = 0
+    truncated = False
+    writer = await anyio.to_thread.run_sync(_Writer, tmp_path, fields, fmt)
+    try:
+        try:
+            async for batch in batches:
+                if rows + len(batch) > max_rows:
+                    batch = batch[: max_rows - rows]
+                    truncated = True
+                if batch:
+                    await anyio.to_thread.run_sync(writer.write, batch)
+                    rows += len(batch)
+                if truncated:
+                    break
+        finally:
+            closer = getattr(batches, "aclose", None)
+            if closer is not None:
+                await closer()
+            await anyio.to_thread.run_sync(writer.close)
+        os.replace(tmp_path, data_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    now = datetime.now(timezone.utc)
+    meta = {
+        "name": name,
+        "format": fmt,
+        "media_type": media_type,
+        "filename": f"{name}-{now.strftime('%Y%m%dT%H%M%SZ')}{ext}",
+        "rows": rows,
+        "bytes": os.path.getsize(data_path),
+        "truncated": truncated,
+        "created_at": now.isoformat(),
+        "expires_at": time.time() + EXPORT_TTL,
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    logger.info(
+        f"[export] {meta['filename']} rows={rows} bytes={meta['bytes']} "
+        f"ms={(time.perf_counter() - started) * 1000:.0f} truncated={truncated}"
+    )
+    return {
+        "download_url": download_url(token),
+        "filename": meta["filename"],
+        "format": fmt,
+        "rows": rows,
+        "bytes": meta["bytes"],
+        "truncated": truncated,
+        "columns": [n for n, _ in fields],
+        "expires_at": datetime.fromtimestamp(meta["expires_at"], timezone.utc).isoformat(),
+    }
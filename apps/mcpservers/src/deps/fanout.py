@@ -0,0 +1,41 @@
+import inspect
+from typing import Any, Awaitable, Dict, Optional
+
+import anyio
+
+
+# -----------------------------------------------------------------------------
+# Fan-out de consultas independientes (structured concurrency con anyio)
+# -----------------------------------------------------------------------------
+async def gather(calls: Dict[str, Awaitable[Any]], limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Ejecuta en paralelo las consultas con nombre y devuelve {nombre: resultado}.
+
+        res = await fanout.gather(
+            {"solutions": db_cause.fetch_all(SQL_S, p), "actions": db_cause.fetch_all(SQL_A, p)},
+            limit=db_cause.POOL_SIZE,
+        )
+
+    `limit` acota cuántas van a la vez (p.ej. el tamaño del pool) para que una sola tool
+    no acapare todas las conexiones. Si alguna falla se cancelan las demás y se
+    relanza la excepción original (no el ExceptionGroup), igual que con awaits en serie.
+    """
+    results: Dict[str, Any] = {}
+    limiter = anyio.CapacityLimiter(max(1, min(limit or len(calls), len(calls) or 1)))
+
+    async def run(name: str, aw: Awaitable[Any]) -> None:
+        try:
+            async with limiter:
+                results[name] = await aw
+        finally:
+            # Cancelada antes de arrancar: cerrar la corrutina para no dejar warnings
+            if inspect.iscoroutine(aw) and inspect.getcoroutinestate(aw) == inspect.CORO_CREATED:
+                aw.close()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            for name, aw in calls.items():
+                tg.start_soon(run, name, aw)
+    except BaseExceptionGroup as eg:
+        raise eg.exceptions[0]
+    return {name: results[name] for name in calls}  # en el orden pedido, no el de llegada
@@ -0,0 +1,179 @@
+import contextvars
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# -----------------------------------------------------------------------------
+# Registro mínimo de métricas en formato de texto de Prometheus (sin dependencias)
+# -----------------------------------------------------------------------------
+# Segundos; las tools con BigQuery pueden tardar decenas de segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_fmt(value)}"
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> (cuentas por bucket, suma, total)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts, total, n = self._values.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[labels] = (counts, total + value, n + 1)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._values.items())
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _fmt(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {n}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {n}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[object] = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -----------------------------------------------------------------------------
+# Métricas de tools y de BD
+# -----------------------------------------------------------------------------
+tool_calls = registry.counter("mcp_tool_calls_total", "Llamadas a tools", ["tool"])
+tool_errors = registry.counter(
+    "mcp_tool_errors_total", "Llamadas fallidas (exception) o con respuesta {error} (result)", ["tool", "kind"]
+)
+tool_duration = registry.histogram("mcp_tool_duration_seconds", "Latencia de la tool (incluye middleware)", ["tool"])
+tool_db_seconds = registry.counter("mcp_tool_db_seconds_total", "Tiempo en BD (consulta + lectura de filas) por tool", ["tool"])
+tool_db_wait = registry.counter(
+    "mcp_tool_db_acquire_wait_seconds_total", "Espera por hilo/conexión del pool por tool", ["tool"]
+)
+tool_db_queries = registry.counter("mcp_tool_db_queries_total", "Consultas a BD por tool", ["tool"])
+tool_db_rows = registry.counter("mcp_tool_db_rows_total", "Filas devueltas por la BD por tool", ["tool"])
+
+db_query_duration = registry.histogram("mcp_db_query_seconds", "Duración de cada consulta (sin la espera del pool)", ["db"])
+db_acquire_wait = registry.histogram("mcp_db_acquire_wait_seconds", "Espera por hilo/conexión del pool", ["db"])
+db_rows = registry.counter("mcp_db_rows_total", "Filas devueltas", ["db"])
+
+
+class CallStats:
+    """Acumulado de BD de una llamada a tool (lo rellenan los fetch_* vía contextvar)."""
+
+    __slots__ = ("queries", "rows", "db_seconds", "wait_seconds", "_lock")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.wait_seconds = 0.0
+        # pg8000 ejecuta en hilos y el fan-out lanza varias consultas a la vez
+        self._lock = threading.Lock()
+
+    def add(self, rows: int, db_seconds: float, wait_seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.db_seconds += db_seconds
+            self.wait_seconds += wait_seconds
+
+
+# anyio copia el contexto a los hilos y a las tareas hijas: todas ven el mismo CallStats
+current_call: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar("mcp_call_stats", default=None)
+
+
+def record_query(db: str, wait_seconds: float, db_seconds: float, rows: int) -> None:
+    db_acquire_wait.observe(wait_seconds, db)
+    db_query_duration.observe(db_seconds, db)
+    db_rows.inc(db, amount=rows)
+    stats = current_call.get()
+    if stats is not None:
+        stats.add(rows, db_seconds, wait_seconds)
+
+
+def record_call(tool: str, seconds: float, stats: CallStats, error: Optional[str] = None) -> None:
+    tool_calls.inc(tool)
+    tool_duration.observe(seconds, tool)
+    if error:
+        tool_errors.inc(tool, error)
+    if stats.queries:
+        tool_db_queries.inc(tool, amount=stats.queries)
+        tool_db_rows.inc(tool, amount=stats.rows)
+        tool_db_seconds.inc(tool, amount=stats.db_seconds)
+        tool_db_wait.inc(tool, amount=stats.wait_seconds)
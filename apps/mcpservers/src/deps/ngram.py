@@ -0,0 +1,110 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from src.deps import utils
+
+
+# -----------------------------------------------------------------------------
+# Índice invertido de n-gramas (trigramas por defecto) para búsqueda difusa
+# -----------------------------------------------------------------------------
+def grams(text: str, n: int = 3) -> Set[str]:
+    """
+    N-gramas de cada palabra de `text` (ya normalizado), con relleno al estilo pg_trgm:
+    dos espacios delante y uno detrás, de modo que los prefijos cortos también casan.
+    """
+    out: Set[str] = set()
+    for word in text.split():
+        padded = " " * (n - 1) + word + " "
+        out.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return out
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Misma métrica que pg_trgm.similarity(): compartidos / unión."""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class NgramIndex:
+    """
+    clave -> textos (p.ej. nombre y código de una planta), indexados por n-grama.
+
+    `sync()` recibe el estado completo y sólo reindexa las claves nuevas, modificadas
+    o desaparecidas. `search()` puntúa únicamente los candidatos que comparten algún
+    n-grama con la consulta, así que no recorre todo el catálogo.
+    """
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._texts: Dict[Hashable, Tuple[str, ...]] = {}
+        self._grams: Dict[Tuple[Hashable, int], Set[str]] = {}
+        self._postings: Dict[str, Set[Tuple[Hashable, int]]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def upsert(self, key: Hashable, texts: Iterable[Optional[str]]) -> None:
+        norm = tuple(utils._norm(t) for t in texts if t)
+        if self._texts.get(key) == norm:
+            return
+        self.remove(key)
+        self._texts[key] = norm
+        for i, text in enumerate(norm):
+            g = grams(text, self.n)
+            self._grams[(key, i)] = g
+            for gram in g:
+                self._postings[gram].add((key, i))
+
+    def remove(self, key: Hashable) -> None:
+        for i in range(len(self._texts.pop(key, ()))):
+            for gram in self._grams.pop((key, i), ()):
+                entries = self._postings.get(gram)
+                if entries is not None:
+                    entries.discard((key, i))
+                    if not entries:
+                        del self._postings[gram]
+
+    def sync(self, items: Dict[Hashable, Iterable[Optional[str]]]) -> Tuple[int, int]:
+        """Deja el índice igual a `items`; devuelve (claves reindexadas, claves eliminadas)."""
+        removed = [k for k in self._texts if k not in items]
+        for key in removed:
+            self.remove(key)
+        changed = 0
+        for key, texts in items.items():
+            before = self._texts.get(key)
+            self.upsert(key, texts)
+            changed += self._texts.get(key) != before
+        return changed, len(removed)
+
+    def search(self, query: str, limit: int = 20, min_score: float = 0.3) -> List[Tuple[Hashable, float]]:
+        """
+        Top `limit` claves por puntuación en [0, 1]. La similitud de trigramas se
+        combina con coincidencia por subcadena: cualquier texto que contenga la
+        consulta puntúa al menos 0.5, por encima de las coincidencias sólo difusas
+        (también las que sólo se encuentran por subcadena, sin n-gramas en común).
+        """
+        qn = utils._norm(query)
+        qg = grams(qn, self.n)
+        if not qg:
+            return []
+        candidates: Set[Tuple[Hashable, int]] = set()
+        for gram in qg:
+            candidates |= self._postings.get(gram, set())
+        if len(qn) < self.n or not candidates:
+            # Consultas cortas o infijos ('rr' en 'tarragona') no comparten n-gramas con
+            # relleno: se buscan por subcadena en todos los textos, como antes del índice
+            candidates |= {
+                (key, i) for key, texts in self._texts.items() for i, text in enumerate(texts) if qn in text
+            }
+
+        best: Dict[Hashable, float] = {}
+        for key, i in candidates:
+            score = similarity(qg, self._grams[(key, i)])
+            if qn in self._texts[key][i]:
+                score = 0.5 + score / 2
+            if score >= min_score and score > best.get(key, 0.0):
+                best[key] = score
+        ranked = sorted(best.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return [(key, round(score, 4)) for key, score in ranked[:limit]]
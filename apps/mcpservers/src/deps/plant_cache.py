@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.deps import db_portal, ngram, utils
+
+logger = logging.getLogger("plant-risk-mcp.plant_cache")
+
+
+# -----------------------------------------------------------------------------
+# Directorio de plantas en memoria (plants_plant, sin borradas)
+# -----------------------------------------------------------------------------
+TTL_SECONDS = float(os.getenv("PLANT_CACHE_TTL_SECONDS", "300"))
+# Ante un fallo de búsqueda (planta recién creada) se fuerza recarga como mucho cada N s
+MISS_REFRESH_SECONDS = float(os.getenv("PLANT_CACHE_MISS_REFRESH_SECONDS", "30"))
+
+LOAD_SQL = """
+    SELECT id::text AS id, name, acs_code
+    FROM public.plants_plant
+    WHERE deleted_at IS NULL
+    ORDER BY id
+"""
+
+
+class PlantDirectory:
+    """
+    Índices id / nombre exacto / nombre normalizado / acs_code -> planta, más un índice
+    de trigramas (nombre + acs_code) para la búsqueda difusa.
+
+    La primera carga se espera (una sola consulta aunque lleguen N tools a la vez);
+    después, al vencer el TTL se recarga en segundo plano y las búsquedas siguen
+    sirviéndose desde la copia anterior. Cada recarga sustituye los diccionarios de golpe
+    y actualiza el índice de trigramas en sitio.
+    """
+
+    def __init__(self) -> None:
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        self.by_norm: Dict[str, Dict[str, Any]] = {}
+        self.by_acs: Dict[str, Dict[str, Any]] = {}
+        self.index = ngram.NgramIndex()
+        self.loaded_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self) -> None:
+        rows = await db_portal.fetch_all(LOAD_SQL)
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_name: Dict[str, Dict[str, Any]] = {}
+        by_norm: Dict[str, Dict[str, Any]] = {}
+        by_acs: Dict[str, Dict[str, Any]] = {}
+        # ORDER BY id + setdefault: ante duplicados gana el id más bajo (como el next() anterior)
+        for r in rows:
+            plant = {"id": r["id"], "name": r["name"], "acs_code": r["acs_code"]}
+            by_id[plant["id"]] = plant
+            if plant["name"] is not None:
+                by_name.setdefault(plant["name"], plant)
+                by_norm.setdefault(utils._norm(plant["name"]), plant)
+            if plant["acs_code"]:
+                by_acs.setdefault(plant["acs_code"], plant)
+        self.by_id, self.by_name, self.by_norm, self.by_acs = by_id, by_name, by_norm, by_acs
+        # Incremental: sólo se reindexan las plantas nuevas, renombradas o borradas
+        changed, removed = self.index.sync({pid: (p["name"], p["acs_code"]) for pid, p in by_id.items()})
+        self.loaded_at = time.monotonic()
+        logger.info(f"[plant_cache] {len(by_id)} plantas cargadas ({changed} reindexadas, {removed} eliminadas)")
+
+    async def _refresh_background(self) -> None:
+        try:
+            await self._load()
+        except Exception as e:
+            # Seguimos con la copia anterior; se reintenta al siguiente acceso tras el TTL
+            logger.warning(f"[plant_cache] recarga fallida: {e}")
+            self.loaded_at = time.monotonic()
+
+    async def refresh(self) -> None:
+        """Recarga (single-flight: si ya hay una en curso, se espera a esa)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._load())
+        await asyncio.shield(self._task)
+
+    async def ready(self) -> None:
+        if self.loaded_at is None:
+            await self.refresh()
+        elif time.monotonic() - self.loaded_at > TTL_SECONDS:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._refresh_background())
+
+    def _lookup(self, plant_id: Optional[str], plant_name: Optional[str]) -> Optional[Dict[str, Any]]:
+        if plant_id:
+            return self.by_id.get(str(int(plant_id)))
+        if plant_name:
+            plant = self.by_name.get(plant_name)
+            if plant:
+                return plant
+            candidates = [p for p in (self.by_norm.get(utils._norm(plant_name)), self.by_acs.get(plant_name)) if p]
+            return min(candidates, key=lambda p: int(p["id"])) if candidates else None
+        return None
+
+    async def resolve(
+        self,
+        plant_id: Optional[str] = None,
+        plant_name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Planta {id, name, acs_code} por id, nombre exacto, nombre normalizado o acs_code."""
+        await self.ready()
+        plant = self._lookup(plant_id, plant_name)
+        if plant is None and (plant_id or plant_name) and self.loaded_at is not None:
+            if time.monotonic() - self.loaded_at > MISS_REFRESH_SECONDS:
+                await self.refresh()
+                plant = self._lookup(plant_id, plant_name)
+        return dict(plant) if plant else None
+
+    async def search(self, q: str, limit: int = 20) -> List[Tuple[Dict[str, Any], float]]:
+        """Búsqueda difusa por nombre/acs_code: [(planta, score)] ordenado por score."""
+        await self.ready()
+        return [(dict(self.by_id[pid]), score) for pid, score in self.index.search(q, limit=limit)]
+
+    async def all(self) -> List[Dict[str, Any]]:
+        await self.ready()
+        return list(self.by_id.values())
+
+
+plants = PlantDirectory()
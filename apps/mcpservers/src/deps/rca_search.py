@@ -0,0 +1,283 @@
+"""
+Índice de texto completo (tsvector) de RCA: un documento por Problem Definition con
+event_name / what / where y el texto de sus Solutions y Actions.
+
+El documento vive en una tabla propia mantenida por triggers de sentencia sobre las tres
+tablas RCA (sólo se recalculan los PDs afectados). Las tools no crean nada: el índice se
+construye una vez con
+
+    python -m src.deps.rca_search            # crea tabla, triggers e índices y rellena lo que falte
+    python -m src.deps.rca_search --rebuild  # recalcula todos los documentos (p.ej. tras cambiar RCA_SEARCH_CONFIG)
+    python -m src.deps.rca_search --drop     # elimina triggers, funciones, índices y tabla
+
+y mientras no exista las tools siguen buscando con ILIKE.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import List, Optional
+
+from src.deps import db_cause
+
+logger = logging.getLogger("plant-risk-mcp.rca_search")
+
+
+# -----------------------------------------------------------------------------
+# Config
+# -----------------------------------------------------------------------------
+TABLE = "public.mcp_rca_search_doc"
+
+# auto: tsvector si el índice está construido, si no ILIKE | fts | ilike
+MODE = (os.getenv("RCA_SEARCH_MODE") or "auto").lower()
+# Configuración de text search (simple = sin stemming; los RCAs mezclan idiomas)
+CONFIG = (os.getenv("RCA_SEARCH_CONFIG") or "simple").lower()
+RETRY_SECONDS = float(os.getenv("RCA_SEARCH_RETRY_SECONDS", "300"))
+
+if not re.fullmatch(r"[a-z_]+", CONFIG):
+    raise RuntimeError(f"RCA_SEARCH_CONFIG no válido: {CONFIG!r}")
+
+# Literal (no parámetro) para que las expresiones casen con los índices de expresión
+CFG = f"'{CONFIG}'::regconfig"
+
+# Peso de cada parte del documento; text_in / include_related_text filtran por peso
+WEIGHTS = {"event_name": "a", "what": "b", "where": "c", "related": "d"}
+
+_DOC_SQL = f"""
+    setweight(to_tsvector({CFG}, COALESCE(pd.event_name, '')), 'A')
+    || setweight(to_tsvector({CFG}, COALESCE(pd.what, '')), 'B')
+    || setweight(to_tsvector({CFG}, COALESCE(pd."where", '')), 'C')
+    || setweight(to_tsvector({CFG}, COALESCE(
+           (SELECT string_agg(s.solution, ' ') FROM public.rca_data_solution s WHERE s."rca_ID" = pd.id), '')), 'D')
+    || setweight(to_tsvector({CFG}, COALESCE(
+           (SELECT string_agg(a.action, ' ') FROM public.rca_data_action a WHERE a."rca_ID" = pd.id), '')), 'D')
+"""
+
+TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        pd_id      integer PRIMARY KEY,
+        doc        tsvector NOT NULL,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+DOC_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS mcp_rca_search_doc_gin ON {TABLE} USING gin (doc)"
+# rca_list_related busca en cada Solution/Action por separado: índices de expresión
+RELATED_INDEX_SQL = [
+    f"CREATE INDEX IF NOT EXISTS mcp_rca_solution_fts ON public.rca_data_solution "
+    f"USING gin (to_tsvector({CFG}, COALESCE(solution, '')))",
+    f"CREATE INDEX IF NOT EXISTS mcp_rca_action_fts ON public.rca_data_action "
+    f"USING gin (to_tsvector({CFG}, COALESCE(action, '')))",
+]
+
+REFRESH_FN_SQL = f"""
+    CREATE OR REPLACE FUNCTION public.mcp_rca_search_refresh(ids integer[]) RETURNS void
+    LANGUAGE sql AS $fn$
+        DELETE FROM {TABLE} d
+        WHERE d.pd_id = ANY(ids)
+          AND NOT EXISTS (SELECT 1 FROM public.rca_data_problem_definition pd WHERE pd.id = d.pd_id);
+        INSERT INTO {TABLE} (pd_id, doc, updated_at)
+        SELECT pd.id, {_DOC_SQL}, now()
+        FROM public.rca_data_problem_definition pd
+        WHERE pd.id = ANY(ids)
+        ON CONFLICT (pd_id) DO UPDATE SET doc = EXCLUDED.doc, updated_at = EXCLUDED.updated_at;
+    $fn$
+"""
+
+# Triggers de sentencia con tablas de transición: un INSERT/UPDATE masivo recalcula cada PD
+# una sola vez, y los UPDATE que no tocan columnas de texto (status, fechas...) no recalculan nada.
+PD_TRIGGER_FN_SQL = f"""
+    CREATE OR REPLACE FUNCTION public.mcp_rca_search_pd_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM public.mcp_rca_search_refresh(ARRAY(SELECT n.id FROM new_rows n));
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM public.mcp_rca_search_refresh(ARRAY(
+                SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (n.event_name, n.what, n."where") IS DISTINCT FROM (o.event_name, o.what, o."where")
+            ));
+        ELSE
+            DELETE FROM {TABLE} WHERE pd_id IN (SELECT o.id FROM old_rows o);
+        END IF;
+        RETURN NULL;
+    END
+    $fn$
+"""
+
+
+def _related_trigger_fn_sql(name: str, column: str) -> str:
+    return f"""
+    CREATE OR REPLACE FUNCTION public.{name}() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM public.mcp_rca_search_refresh(ARRAY(SELECT DISTINCT n."rca_ID" FROM new_rows n));
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM public.mcp_rca_search_refresh(ARRAY(
+                SELECT x.pid FROM new_rows n JOIN old_rows o ON o.id = n.id,
+                       LATERAL (VALUES (n."rca_ID"), (o."rca_ID")) x(pid)
+                WHERE (n."rca_ID", n.{column}) IS DISTINCT FROM (o."rca_ID", o.{column})
+            ));
+        ELSE
+            PERFORM public.mcp_rca_search_refresh(ARRAY(SELECT DISTINCT o."rca_ID" FROM old_rows o));
+        END IF;
+        RETURN NULL;
+    END
+    $fn$
+    """
+
+
+# (tabla, función del trigger, SQL de la función)
+TRIGGERS = [
+    ("public.rca_data_problem_definition", "mcp_rca_search_pd_trg", PD_TRIGGER_FN_SQL),
+    ("public.rca_data_solution", "mcp_rca_search_solution_trg", _related_trigger_fn_sql("mcp_rca_search_solution_trg", "solution")),
+    ("public.rca_data_action", "mcp_rca_search_action_trg", _related_trigger_fn_sql("mcp_rca_search_action_trg", "action")),
+]
+_TRANSITIONS = {
+    "INSERT": "REFERENCING NEW TABLE AS new_rows",
+    "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "REFERENCING OLD TABLE AS old_rows",
+}
+
+READY_SQL = f"""
+    SELECT to_regclass('{TABLE}') IS NOT NULL
+       AND to_regprocedure('public.mcp_rca_search_refresh(integer[])') IS NOT NULL AS ok
+"""
+
+
+# -----------------------------------------------------------------------------
+# Consulta
+# -----------------------------------------------------------------------------
+def tsquery_text(text: Optional[str]) -> Optional[str]:
+    """
+    Texto libre -> tsquery con prefijos ('bear fail' -> 'bear:* & fail:*'), para que se
+    parezca al ILIKE '%term%' anterior: casa palabras que empiezan por cada término.
+    """
+    words = re.findall(r"[^\W_]+", (text or "").lower())
+    return " & ".join(f"{w}:*" for w in words) or None
+
+
+def weight_filter(weights: List[str]) -> Optional[str]:
+    """Literal para ts_filter() si sólo se busca en parte del documento; None = todo."""
+    selected = sorted(set(weights))
+    if selected == sorted(WEIGHTS.values()):
+        return None
+    return "'{" + ",".join(selected) + "}'"
+
+
+class RcaSearchIndex:
+    """
+    Sólo comprueba si el índice está construido (cacheado; se reintenta cada
+    RETRY_SECONDS mientras no exista, para detectar un bootstrap posterior).
+    """
+
+    def __init__(self) -> None:
+        self.available: Optional[bool] = None
+        self._checked_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            row = await db_cause.fetch_one(READY_SQL)
+            self.available = bool(row and row["ok"])
+        except Exception as e:
+            logger.warning(f"[rca_search] no se pudo comprobar el índice: {e}")
+            self.available = False
+        if not self.available:
+            logger.info("[rca_search] índice no construido, se busca con ILIKE (python -m src.deps.rca_search)")
+
+    async def ready(self) -> bool:
+        if MODE == "ilike":
+            return False
+        if self.available is None or (not self.available and time.monotonic() - self._checked_at > RETRY_SECONDS):
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._check())
+            await asyncio.shield(self._task)
+        return bool(self.available)
+
+
+index = RcaSearchIndex()
+
+
+# -----------------------------------------------------------------------------
+# Bootstrap / migración
+# -----------------------------------------------------------------------------
+async def install() -> None:
+    await db_cause.execute(TABLE_SQL)
+    await db_cause.execute(DOC_INDEX_SQL)
+    for sql in RELATED_INDEX_SQL:
+        await db_cause.execute(sql)
+    await db_cause.execute(REFRESH_FN_SQL)
+    # Triggers antes del relleno: lo que cambie mientras tanto ya queda indexado
+    for table, fn, fn_sql in TRIGGERS:
+        await db_cause.execute(fn_sql)
+        for event, referencing in _TRANSITIONS.items():
+            trigger = f"{fn}_{event.lower()}"
+            await db_cause.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+            await db_cause.execute(
+                f"CREATE TRIGGER {trigger} AFTER {event} ON {table} {referencing} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION public.{fn}()"
+            )
+
+
+async def backfill(batch: int = 2000, rebuild: bool = False) -> int:
+    """Calcula los documentos que faltan (o todos con rebuild) por lotes de ids; devuelve cuántos."""
+    missing = "" if rebuild else f"AND NOT EXISTS (SELECT 1 FROM {TABLE} d WHERE d.pd_id = pd.id)"
+    if rebuild:
+        await db_cause.execute(
+            f"DELETE FROM {TABLE} d WHERE NOT EXISTS "
+            f"(SELECT 1 FROM public.rca_data_problem_definition pd WHERE pd.id = d.pd_id)"
+        )
+    done, last_id = 0, 0
+    while True:
+        rows = await db_cause.fetch_all(
+            f"SELECT pd.id::int AS id FROM public.rca_data_problem_definition pd "
+            f"WHERE pd.id > %s {missing} ORDER BY pd.id LIMIT %s",
+            (last_id, batch),
+        )
+        if not rows:
+            return done
+        ids = [r["id"] for r in rows]
+        await db_cause.execute("SELECT public.mcp_rca_search_refresh(%s::integer[])", (ids,))
+        done += len(ids)
+        last_id = ids[-1]
+        logger.info(f"[rca_search] {done} documentos (último id {last_id})")
+
+
+async def drop() -> None:
+    for table, fn, _ in TRIGGERS:
+        for event in _TRANSITIONS:
+            await db_cause.execute(f"DROP TRIGGER IF EXISTS {fn}_{event.lower()} ON {table}")
+        await db_cause.execute(f"DROP FUNCTION IF EXISTS public.{fn}()")
+    await db_cause.execute("DROP FUNCTION IF EXISTS public.mcp_rca_search_refresh(integer[])")
+    await db_cause.execute("DROP INDEX IF EXISTS public.mcp_rca_solution_fts")
+    await db_cause.execute("DROP INDEX IF EXISTS public.mcp_rca_action_fts")
+    await db_cause.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Construye/elimina el índice de texto completo de RCA")
+    ap.add_argument("--rebuild", action="store_true", help="recalcula todos los documentos")
+    ap.add_argument("--drop", action="store_true", help="elimina triggers, funciones, índices y tabla")
+    ap.add_argument("--batch", type=int, default=2000, help="PDs por lote en el relleno")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> None:
+        if args.drop:
+            await drop()
+            logger.info("[rca_search] índice eliminado")
+            return
+        await install()
+        n = await backfill(batch=args.batch, rebuild=args.rebuild)
+        logger.info(f"[rca_search] listo: {n} documentos calculados (config {CONFIG})")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
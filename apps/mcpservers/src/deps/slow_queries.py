@@ -0,0 +1,220 @@
+import asyncio
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from src.deps.stmt_cache import normalize_sql
+
+logger = logging.getLogger("plant-risk-mcp.db.slow")
+
+
+# -----------------------------------------------------------------------------
+# Registro de consultas lentas (opt-in) con EXPLAIN en segundo plano
+# -----------------------------------------------------------------------------
+THRESHOLD_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0"))                   # 0 = desactivado
+BUFFER_SIZE = int(os.getenv("DB_SLOW_QUERY_BUFFER", "200"))                # últimas N consultas lentas
+EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "false").lower() == "true"    # EXPLAIN (ANALYZE, BUFFERS)
+EXPLAIN_MS = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_MS", "0")) or THRESHOLD_MS * 2
+EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000"))
+EXPLAIN_INTERVAL = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_INTERVAL", "300"))  # s entre planes de la misma consulta
+MAX_FINGERPRINTS = 500
+MAX_PLAN_LINES = 200
+
+# Literales que las tools meten con f-string (IN (1,2,3), 'open', ...) -> ? para agrupar
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+# EXPLAIN ANALYZE ejecuta la sentencia: sólo lecturas
+_READ_ONLY_RE = re.compile(r"^\s*(?:select|with)\b", re.IGNORECASE)
+_WRITE_RE = re.compile(r"\b(?:insert|update|delete|merge|truncate|create|drop|alter|refresh|call|copy)\b", re.IGNORECASE)
+
+
+def fingerprint(sql: str) -> str:
+    """SQL normalizado: espacios colapsados, literales a ? y listas IN (?, ?, ...) a (...)."""
+    text = _LITERAL_RE.sub("?", normalize_sql(sql))
+    return _IN_LIST_RE.sub("(...)", text)
+
+
+def _shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        inner = sorted({_shape(v) for v in value}) or ["?"]
+        return f"{'|'.join(inner)}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(params: Optional[Sequence[Any]]) -> List[str]:
+    """Tipos (y longitud de las listas) de los parámetros; nunca sus valores."""
+    return [_shape(p) for p in (params or ())]
+
+
+def is_read_only(sql: str) -> bool:
+    return bool(_READ_ONLY_RE.match(sql)) and not _WRITE_RE.search(_LITERAL_RE.sub("?", sql))
+
+
+class SlowQueryLog:
+    """
+    Buffer circular de las últimas consultas que superan `threshold_ms`, más un agregado
+    por consulta normalizada (veces, máximo, total).
+
+    Con `explain` activo, cuando una lectura tarda más de `explain_ms` y es la peor vista
+    hasta ahora para su consulta (o el plan guardado tiene más de `explain_interval` s),
+    se lanza EXPLAIN (ANALYZE, BUFFERS) en segundo plano con los mismos parámetros
+    (como mucho uno a la vez) y se guarda el plan. Los valores de los parámetros sólo
+    viven hasta entonces; el buffer guarda su forma.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = THRESHOLD_MS,
+        size: int = BUFFER_SIZE,
+        explain: bool = EXPLAIN,
+        explain_ms: float = EXPLAIN_MS,
+        explain_interval: float = EXPLAIN_INTERVAL,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.explain_ms = explain_ms
+        self.explain_interval = explain_interval
+        self._lock = threading.Lock()
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max(1, size))
+        self._by_sql: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._explaining = False
+        self._tasks: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def observe(
+        self,
+        db: str,
+        sql: str,
+        params: Optional[Sequence[Any]],
+        seconds: float,
+        rows: int,
+        explainer: Optional[Callable[[str, Sequence[Any]], Any]] = None,
+    ) -> None:
+        """Llamado tras cada consulta; sólo hace trabajo si supera el umbral."""
+        ms = seconds * 1000
+        if not self.enabled or ms < self.threshold_ms:
+            return
+        key = fingerprint(sql)
+        entry = {
+            "db": db,
+            "sql": key,
+            "params": params_shape(params),
+            "ms": round(ms, 2),
+            "rows": rows,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            agg = self._by_sql.pop(key, None) or {"db": db, "sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": None}
+            self._by_sql[key] = agg
+            while len(self._by_sql) > MAX_FINGERPRINTS:
+                self._by_sql.popitem(last=False)
+            agg["count"] += 1
+            agg["total_ms"] += ms
+            worst = ms > agg["max_ms"]
+            agg["max_ms"] = max(agg["max_ms"], ms)
+            plan = agg["plan"]
+            run_explain = (
+                self.explain
+                and explainer is not None
+                and ms >= self.explain_ms
+                and not self._explaining
+                and (plan is None or worst or time.monotonic() - plan["_at"] > self.explain_interval)
+                and is_read_only(sql)
+            )
+            if run_explain:
+                self._explaining = True
+        logger.info(f"[slow:{db}] {ms:.0f} ms rows={rows} sql={key[:300]}")
+        if run_explain:
+            self._start_explain(key, sql, tuple(params or ()), ms, explainer)
+
+    # ---------------- EXPLAIN en segundo plano ----------------
+    def _start_explain(self, key: str, sql: str, params: tuple, ms: float, explainer: Callable) -> None:
+        if inspect.iscoroutinefunction(explainer):
+            # asyncpg: observe() se llama desde el event loop
+            task = asyncio.get_running_loop().create_task(self._explain_async(key, sql, params, ms, explainer))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            threading.Thread(
+                target=self._explain_sync, args=(key, sql, params, ms, explainer), name="slow-query-explain", daemon=True
+            ).start()
+
+    def _explain_sync(self, key: str, sql: str, params: tuple, ms: float, explainer: Callable) -> None:
+        try:
+            self._store_plan(key, ms, explainer(sql, params))
+        except Exception as e:
+            self._store_plan(key, ms, None, e)
+
+    async def _explain_async(self, key: str, sql: str, params: tuple, ms: float, explainer: Callable) -> None:
+        try:
+            self._store_plan(key, ms, await explainer(sql, params))
+        except Exception as e:
+            self._store_plan(key, ms, None, e)
+
+    def _store_plan(self, key: str, ms: float, lines: Optional[List[str]], error: Optional[Exception] = None) -> None:
+        if error is not None:
+            logger.info(f"[slow] EXPLAIN fallido: {error}")
+        plan = {
+            "_at": time.monotonic(),
+            "at": datetime.now(timezone.utc).isoformat(),
+            "query_ms": round(ms, 2),
+            "lines": (lines or [])[:MAX_PLAN_LINES],
+            "error": str(error) if error is not None else None,
+        }
+        with self._lock:
+            self._explaining = False
+            agg = self._by_sql.get(key)
+            if agg is not None:
+                agg["plan"] = plan
+
+    # ---------------- consulta ----------------
+    def entries(self, db: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Últimas consultas lentas, la más reciente primero."""
+        with self._lock:
+            items = [dict(e) for e in reversed(self._entries) if db is None or e["db"] == db]
+        return items[:limit]
+
+    def summary(self, db: Optional[str] = None, limit: int = 20, include_plans: bool = True) -> List[Dict[str, Any]]:
+        """Consultas normalizadas ordenadas por tiempo total, con su último plan si lo hay."""
+        with self._lock:
+            aggs = [dict(a) for a in self._by_sql.values() if db is None or a["db"] == db]
+        aggs.sort(key=lambda a: a["total_ms"], reverse=True)
+        out = []
+        for a in aggs[:limit]:
+            plan = a.pop("plan")
+            a["total_ms"] = round(a["total_ms"], 2)
+            a["max_ms"] = round(a["max_ms"], 2)
+            a["avg_ms"] = round(a["total_ms"] / a["count"], 2)
+            if include_plans and plan is not None:
+                a["plan"] = {k: v for k, v in plan.items() if not k.startswith("_")}
+            out.append(a)
+        return out
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "buffer_size": self._entries.maxlen,
+            "explain": self.explain,
+            "explain_ms": self.explain_ms,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_sql.clear()
+
+
+log = SlowQueryLog()
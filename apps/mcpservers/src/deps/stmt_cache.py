@@ -0,0 +1,95 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+# -----------------------------------------------------------------------------
+# Registro LRU de sentencias preparadas (una instancia por conexión física)
+# -----------------------------------------------------------------------------
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Clave de caché: colapsa espacios fuera de literales/identificadores entrecomillados."""
+    return _TOKEN_RE.sub(lambda m: " " if m.group(0).isspace() else m.group(0), sql).strip()
+
+
+class StatementCacheStats:
+    """Contadores agregados (por base de datos) de todas las cachés de sus conexiones."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def incr(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
+
+
+class StatementCache:
+    """
+    LRU clave SQL normalizada -> sentencia preparada.
+
+    No es thread-safe: cada conexión la usa un único hilo/tarea a la vez.
+    `on_evict` libera la sentencia en el servidor (DEALLOCATE) al salir del LRU.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        stats: StatementCacheStats,
+        on_evict: Optional[Callable[[Any], None]] = None,
+    ):
+        self.capacity = capacity
+        self.stats = stats
+        self.on_evict = on_evict
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Any]:
+        stmt = self._items.get(key)
+        if stmt is None:
+            self.stats.incr("misses")
+            return None
+        self._items.move_to_end(key)
+        self.stats.incr("hits")
+        return stmt
+
+    def put(self, key: str, stmt: Any) -> None:
+        self._items[key] = stmt
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            _, old = self._items.popitem(last=False)
+            self.stats.incr("evictions")
+            self._release(old)
+
+    def invalidate(self, key: str) -> None:
+        stmt = self._items.pop(key, None)
+        if stmt is not None:
+            self.stats.incr("invalidations")
+            self._release(stmt)
+
+    def _release(self, stmt: Any) -> None:
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(stmt)
+        except Exception:
+            pass
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import anyio
+
+from src.deps import bq, ngram, utils
+
+logger = logging.getLogger("plant-risk-mcp.tis_index")
+
+
+# -----------------------------------------------------------------------------
+# Copia en memoria de la tabla maestra de TIS (LOG_INDEX_MASTER), por planta
+# -----------------------------------------------------------------------------
+# Cada N s se mira (en segundo plano) la fecha de modificación de la tabla: si cambió, se recarga
+CHECK_SECONDS = float(os.getenv("TIS_INDEX_CHECK_SECONDS", "60"))
+# Edad máxima de la copia de una planta aunque la tabla no haya cambiado
+TTL_SECONDS = float(os.getenv("TIS_INDEX_TTL_SECONDS", "3600"))
+MAX_PLANTS = int(os.getenv("TIS_INDEX_MAX_PLANTS", "32"))
+# Similitud mínima (1 - distancia de edición / longitud) para que un token "casi igual" cuente
+FUZZY_MIN = float(os.getenv("TIS_INDEX_FUZZY_MIN", "0.75"))
+
+COLUMNS = ("logname", "aliasname", "description", "unit", "ri_class", "log_class", "proposed_alias")
+SEARCH_FIELDS = ("logname", "aliasname", "description")
+
+# Mismos separadores con los que las tools trocean base_logname / natural_query
+_SPLIT_RE = re.compile(r"[.\-:_+#/ ]+")
+
+
+def words(text: Optional[str]) -> List[str]:
+    """'KM1.Raw_Coal-Dosing' -> ['km1', 'raw', 'coal', 'dosing'] (normalizado como utils._norm)."""
+    return [w for w in _SPLIT_RE.split(utils._norm(text)) if w] if text else []
+
+
+def edit_ratio(a: str, b: str) -> float:
+    """1 - distancia de Levenshtein / longitud mayor, en [0, 1]."""
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    if not longest or abs(len(a) - len(b)) / longest > 1 - FUZZY_MIN:
+        return 0.0  # ni con todo lo demás igual llegaría a FUZZY_MIN
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1 - prev[-1] / longest
+
+
+class PlantSearch:
+    """
+    Índice de búsqueda de una planta a nivel de palabra: vocabulario de las columnas
+    SEARCH_FIELDS (palabra -> filas, por columna) y un índice invertido trigrama -> palabras,
+    así que los trigramas se calculan una vez por palabra distinta y no por fila.
+
+    `rank()` sustituye al OR de LIKE / REGEXP_CONTAINS de BigQuery. Cada token de la consulta
+    puntúa contra las palabras de la fila: 1 si es igual, 0.7-1 si está contenida (lo que
+    casaba el LIKE), hasta 0.6 por distancia de edición (erratas) y hasta 0.3 por trigramas.
+    El score de la fila es la media por token; las que antes casaban siguen saliendo.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]]) -> None:
+        self.rows = rows
+        self.postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in SEARCH_FIELDS}
+        for i, row in enumerate(rows):
+            for f in SEARCH_FIELDS:
+                for w in set(words(row.get(f))):
+                    self.postings[f].setdefault(w, []).append(i)
+        self.vocab = sorted({w for f in SEARCH_FIELDS for w in self.postings[f]})
+        self.grams: Dict[str, Set[str]] = {w: ngram.grams(w) for w in self.vocab}
+        self.by_gram: Dict[str, List[str]] = {}
+        for w, g in self.grams.items():
+            for gram in g:
+                self.by_gram.setdefault(gram, []).append(w)
+
+    def _word_scores(self, token: str) -> Dict[str, float]:
+        """Palabra del vocabulario -> puntuación frente a `token` (sólo las > 0)."""
+        out = {w: (1.0 if w == token else 0.7 + 0.3 * len(token) / len(w)) for w in self.vocab if token in w}
+        tg = ngram.grams(token)
+        candidates = {w for gram in tg for w in self.by_gram.get(gram, ())}
+        for w in candidates.difference(out):
+            ratio = edit_ratio(token, w)
+            if ratio >= FUZZY_MIN:
+                out[w] = 0.6 * ratio
+            else:
+                tri = ngram.similarity(tg, self.grams[w])
+                if tri >= 0.3:
+                    out[w] = 0.3 * tri
+        return out
+
+    def rank(
+        self,
+        tokens: Sequence[str],
+        fields: Sequence[str],
+        regexes: Sequence["re.Pattern[str]"] = (),
+        limit: int = 100,
+    ) -> List[Tuple[int, float]]:
+        """[(posición de fila, score en [0, 1])], mejores primero."""
+        query = list(dict.fromkeys(w for t in tokens for w in words(t)))
+        totals: Dict[int, float] = {}
+        matched = set()  # filas con algún token contenido o casi igual (no sólo trigramas)
+        for token in query:
+            best: Dict[int, float] = {}
+            for w, score in self._word_scores(token).items():
+                for f in fields:
+                    for i in self.postings[f].get(w, ()):
+                        if score > best.get(i, 0.0):
+                            best[i] = score
+            for i, score in best.items():
+                totals[i] = totals.get(i, 0.0) + score
+                if score > 0.3:
+                    matched.add(i)
+
+        hits = set()
+        if regexes:
+            for i, row in enumerate(self.rows):
+                if any(r.search(v) for v in (row.get(f) for f in fields) if v is not None for r in regexes):
+                    hits.add(i)
+
+        scored: List[Tuple[int, float]] = []
+        for i in matched | hits:
+            score = totals.get(i, 0.0) / len(query) if query else 0.0
+            if regexes:
+                score = 0.8 * score + 0.2 * (i in hits) if query else 1.0
+            scored.append((i, round(score, 4)))
+        scored.sort(key=lambda x: (-x[1], self.rows[x[0]]["logname"] or ""))
+        return scored[:limit]
+
+
+class _PlantEntry:
+    __slots__ = ("rows", "by_logname", "modified", "loaded_at", "checked_at", "search")
+
+    def __init__(self, rows: List[Dict[str, Any]], modified: Any, keyed: bool = True) -> None:
+        now = time.monotonic()
+        self.rows = rows
+        self.by_logname = {r["logname"]: r for r in rows} if keyed else {}
+        self.modified = modified
+        self.loaded_at = now
+        self.checked_at = now
+        self.search: Optional[PlantSearch] = None
+
+
+class MasterIndex:
+    """
+    Filas (COLUMNS) de cada planta, cargadas al primer uso con una sola consulta a BigQuery
+    (single-flight: N tools a la vez con la caché fría lanzan un único job) y la lista de
+    plantas. Se sirven desde memoria; pasado CHECK_SECONDS el siguiente acceso comprueba en
+    segundo plano `table.modified` (llamada de metadatos, no un job) y recarga si cambió.
+    Pasado TTL_SECONDS se recarga siempre. `invalidate()` tira la copia de una planta (p.ej.
+    tras un UPDATE propio). Como mucho MAX_PLANTS plantas en memoria (LRU).
+    """
+
+    def __init__(self, client: Any, table_id: str, plant_column: str = "plant_name") -> None:
+        self.client = client
+        self.table_id = table_id
+        self.plant_column = plant_column
+        self._plants: "OrderedDict[str, _PlantEntry]" = OrderedDict()
+        self._names: Optional[_PlantEntry] = None
+        self._tasks: Dict[str, asyncio.Task] = {}    # cargas en vuelo
+        self._checks: Dict[str, asyncio.Task] = {}   # comprobaciones de `modified` en vuelo
+
+    # ---------------- BigQuery (vía bq: fuera del event loop, con timeout) ----------------
+    async def _table_modified(self) -> Any:
+        return (await bq.call(self.client, "get_table", self.table_id)).modified
+
+    async def _query_plant(self, plant_name: str) -> List[Dict[str, Any]]:
+        bigquery = await bq.bigquery()
+        query = f"""
+            SELECT {", ".join(COLUMNS)}
+            FROM `{self.table_id}`
+            WHERE {self.plant_column} = @plant_name
+            ORDER BY logname
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name)]
+        )
+        return await bq.query_rows(self.client, query, job_config)
+
+    async def _query_names(self) -> List[Dict[str, Any]]:
+        query = f"""
+            SELECT DISTINCT {self.plant_column} AS plant_name
+            FROM `{self.table_id}`
+            WHERE {self.plant_column} IS NOT NULL
+            ORDER BY plant_name
+        """
+        return await bq.query_rows(self.client, query)
+
+    # ---------------- carga / refresco ----------------
+    async def _load(self, key: str, plant_name: Optional[str]) -> _PlantEntry:
+        started = time.perf_counter()
+        modified = await self._table_modified()
+        if plant_name is None:
+            entry = _PlantEntry(await self._query_names(), modified, keyed=False)
+            self._names = entry
+        else:
+            entry = _PlantEntry(await self._query_plant(plant_name), modified)
+            self._plants[plant_name] = entry
+            self._plants.move_to_end(plant_name)
+            while len(self._plants) > MAX_PLANTS:
+                self._plants.popitem(last=False)
+        logger.info(f"[tis_index] {key}: {len(entry.rows)} filas en {(time.perf_counter() - started) * 1000:.0f} ms")
+        return entry
+
+    async def _single_flight(self, key: str, plant_name: Optional[str]) -> _PlantEntry:
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load(key, plant_name))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None)
+        return await asyncio.shield(task)
+
+    async def _revalidate(self, key: str, plant_name: Optional[str], entry: _PlantEntry) -> None:
+        try:
+            modified = await self._table_modified()
+            if modified != entry.modified:
+                await self._single_flight(key, plant_name)
+            else:
+                entry.checked_at = time.monotonic()
+        except Exception as e:
+            # Seguimos con la copia actual; se reintenta tras CHECK_SECONDS
+            logger.warning(f"[tis_index] comprobación de {key} fallida: {e}")
+            entry.checked_at = time.monotonic()
+
+    async def _get(self, key: str, plant_name: Optional[str], entry: Optional[_PlantEntry]) -> _PlantEntry:
+        now = time.monotonic()
+        if entry is None or now - entry.loaded_at > TTL_SECONDS:
+            return await self._single_flight(key, plant_name)
+        if now - entry.checked_at > CHECK_SECONDS and key not in self._checks and key not in self._tasks:
+            task = asyncio.create_task(self._revalidate(key, plant_name, entry))
+            self._checks[key] = task
+            task.add_done_callback(lambda t, k=key: self._checks.pop(k, None))
+        if plant_name is not None:
+            self._plants.move_to_end(plant_name)
+        return entry
+
+    # ---------------- API ----------------
+    async def plant_names(self) -> List[Dict[str, Any]]:
+        """[{plant_name}] ordenado, como SELECT DISTINCT plant_name ... ORDER BY plant_name."""
+        entry = await self._get("plants", None, self._names)
+        return [dict(r) for r in entry.rows]
+
+    async def rows(self, plant_name: str) -> List[Dict[str, Any]]:
+        """Filas de la planta (ordenadas por logname). No modificar: son las de la caché."""
+        entry = await self._get(f"plant:{plant_name}", plant_name, self._plants.get(plant_name))
+        return entry.rows
+
+    async def by_logname(self, plant_name: str) -> Dict[str, Dict[str, Any]]:
+        entry = await self._get(f"plant:{plant_name}", plant_name, self._plants.get(plant_name))
+        return entry.by_logname
+
+    async def search(
+        self,
+        plant_name: str,
+        tokens: Sequence[str],
+        fields: Sequence[str] = SEARCH_FIELDS,
+        regexes: Sequence["re.Pattern[str]"] = (),
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top `limit` filas de la planta por relevancia (PlantSearch.rank), como
+        {logname, aliasname, description, score}. El índice se construye (en un hilo) al
+        primer uso tras cada carga de la planta.
+        """
+        entry = await self._get(f"plant:{plant_name}", plant_name, self._plants.get(plant_name))
+        if entry.search is None:
+            entry.search = await anyio.to_thread.run_sync(PlantSearch, entry.rows)
+        index = entry.search
+        ranked = await anyio.to_thread.run_sync(index.rank, tokens, fields, regexes, limit)
+        return [
+            {
+                "logname": index.rows[i]["logname"],
+                "aliasname": index.rows[i]["aliasname"],
+                "description": index.rows[i]["description"],
+                "score": score,
+            }
+            for i, score in ranked
+        ]
+
+    def invalidate(self, plant_name: Optional[str] = None) -> None:
+        """Tira la copia de una planta (o todas); la siguiente consulta la recarga."""
+        if plant_name is None:
+            self._plants.clear()
+            self._names = None
+        else:
+            self._plants.pop(plant_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "plants_cached": len(self._plants),
+            "rows_cached": sum(len(e.rows) for e in self._plants.values()),
+            "plant_list_cached": self._names is not None,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Búsquedas en memoria con la misma semántica que las consultas de las tools
+# -----------------------------------------------------------------------------
+def compile_patterns(patterns: Iterable[str]) -> Optional[List["re.Pattern[str]"]]:
+    """REGEXP_CONTAINS -> re.search. None si alguna no compila en Python (RE2 y re difieren)."""
+    try:
+        return [re.compile(p) for p in patterns]
+    except re.error:
+        return None
+
+
+def filter_rows(
+    rows: Sequence[Dict[str, Any]],
+    columns: Sequence[str],
+    *,
+    likes: Sequence[str] = (),
+    regexes: Sequence["re.Pattern[str]"] = (),
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Filas en las que alguna columna contiene algún token (LOWER(col) LIKE LOWER('%tok%'))
+    o casa con alguna regex (REGEXP_CONTAINS). NULL no casa con nada, como en BigQuery.
+    """
+    tokens = [t.lower() for t in likes]
+    out: List[Dict[str, Any]] = []
+    for row in rows:
+        values = [row.get(c) for c in columns]
+        values = [v for v in values if v is not None]
+        lowered = [v.lower() for v in values] if tokens else ()
+        if any(t in v for v in lowered for t in tokens) or any(r.search(v) for v in values for r in regexes):
+            out.append(row)
+            if limit is not None and len(out) >= limit:
+                break
+    return out
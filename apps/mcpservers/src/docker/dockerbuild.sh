@@ -1,3 +1,3 @@
 docker build -t fastmcp-base -f Dockerfile .
-docker tag fastmcp-base bolferdocker/fastmcp-base:0.0.6
-docker push bolferdocker/fastmcp-base:0.0.6
+docker tag fastmcp-base bolferdocker/fastmcp-base:0.0.8
+docker push bolferdocker/fastmcp-base:0.0.8
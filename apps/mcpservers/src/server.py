@@ -20,16 +20,18 @@ Endpoints (preguntas típicas):
 
 import os
 import logging
+import time
+from typing import Optional
 
 from fastmcp import FastMCP
 from fastmcp.exceptions import ToolError
 from fastmcp.server.middleware import Middleware, MiddlewareContext
 from fastmcp.server.auth.providers.google import GoogleProvider
 from fastmcp.server.dependencies import get_access_token
-from src.tools import mpredict, minspect, tis, rca
-from src.deps import utils
+from src.tools import mpredict, minspect, tis, rca, admin
+from src.deps import utils, export, metrics
 
-from fastapi.responses import JSONResponse
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse
 
 from dotenv import load_dotenv
 
@@ -52,7 +54,7 @@ MCP_PATH = os.getenv("MCP_PATH", "/mcp")
 
 SERVER_INSTRUCTIONS = """
 DB-backed Plant Risk MCP Server.
-Auth: Google OAuth (can be disabled via AUTH_DISABLED=true). Whitelist via ALLOWED_EMAILS.
+Auth: Google OAuth (can be disabled via AUTH_DISABLED=true). Whitelist via ALLOWED_EMAILS; admin_* tools need ADMIN_EMAILS.
 HTTP transport at MCP_PATH (default /mcp). Responses are compact by default.
 - Use detail='names' for id+name, 'summary' (default) for compact machines with aggregates, 'full' for full machine row.
 - All list tools are keyset-paginated with page_size and cursor.
@@ -125,9 +127,60 @@ class EmailWhitelistMiddleware(Middleware):
         logger.info(f"[MW on_call_tool] acceso permitido a {email}")
         return await call_next(context)
 
+# -----------------------------------------------------------------------------
+# Métricas por tool (Prometheus en /metrics)
+# -----------------------------------------------------------------------------
+# Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>" (la ruta no pasa por OAuth)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+class MetricsMiddleware(Middleware):
+    """
+    Llamadas, errores y latencia por tool, más el tiempo/filas/espera de BD de esa llamada.
+
+    La etiqueta es el nombre de la tool sólo si está registrada; cualquier otro nombre que
+    mande el cliente cuenta como "unknown", para no crear una serie nueva por cada uno.
+    """
+
+    def __init__(self, mcp: FastMCP) -> None:
+        self.mcp = mcp
+        self._known: Optional[frozenset] = None
+
+    async def _label(self, name: Optional[str]) -> str:
+        # Las tools se registran todas en create_server(): basta leerlas en la primera llamada
+        if self._known is None:
+            self._known = frozenset(t.name for t in await self.mcp.list_tools(run_middleware=False))
+        return name if name in self._known else "unknown"
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = await self._label(getattr(context.message, "name", None))
+        stats = metrics.CallStats()
+        token = metrics.current_call.set(stats)
+        start = time.perf_counter()
+        error = None
+        try:
+            result = await call_next(context)
+            structured = getattr(result, "structured_content", None)
+            if isinstance(structured, dict) and "error" in structured:
+                error = "result"
+            return result
+        except Exception:
+            error = "exception"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.current_call.reset(token)
+            metrics.record_call(tool, elapsed, stats, error)
+            logger.debug(
+                f"[metrics] tool={tool} ms={elapsed * 1000:.1f} db_ms={stats.db_seconds * 1000:.1f} "
+                f"wait_ms={stats.wait_seconds * 1000:.1f} queries={stats.queries} rows={stats.rows} error={error}"
+            )
+
 # -----------------------------------------------------------------------------
 # Server (tools)
 # -----------------------------------------------------------------------------
+TOOL_MODULES = (mpredict, minspect, rca, tis, admin)
+
 def create_server() -> FastMCP:
     mcp = FastMCP(
         name=MCP_NAME,
@@ -135,15 +188,28 @@ def create_server() -> FastMCP:
         instructions=SERVER_INSTRUCTIONS
     )
 
+    @mcp.custom_route("/", methods=["GET"])
     async def root_ok(request):
         return JSONResponse({"status": "ok", "server": MCP_NAME, "time": utils._now_iso()})
 
-    try:
-        mcp.app.add_api_route("/", root_ok, methods=["GET"])
-    except Exception as e:
-        logger.warning(f"No se pudo registrar '/' (no crítico): {e}")
-
-    # Añadimos middleware
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics_endpoint(request):
+        if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+            return PlainTextResponse("unauthorized\n", status_code=401)
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Descarga de los ficheros de minspect_notifications_export / mpredict_alerts_export.
+    # El token (aleatorio, caduca en MCP_EXPORT_TTL) es la credencial: la ruta no pasa por OAuth.
+    @mcp.custom_route(export.ROUTE + "/{token}", methods=["GET"])
+    async def export_download(request):
+        meta = export.lookup(request.path_params.get("token", ""))
+        if meta is None:
+            return JSONResponse({"error": "Export not found or expired"}, status_code=404)
+        # FileResponse envía el fichero por trozos, sin cargarlo entero en memoria
+        return FileResponse(meta["path"], media_type=meta["media_type"], filename=meta["filename"])
+
+    # Añadimos middleware (métricas primero: mide también las llamadas denegadas)
+    mcp.add_middleware(MetricsMiddleware(mcp))
     mcp.add_middleware(EmailWhitelistMiddleware())
 
     # -------- health --------
@@ -151,10 +217,10 @@ def create_server() -> FastMCP:
     def health() -> dict:
         return {"status": "ok", "time": utils._now_iso()}
 
-    mpredict.register(mcp)
-    minspect.register(mcp)
-    rca.register(mcp)
-    tis.register(mcp)
+    # Cada módulo sólo declara sus tools (esquemas); los backends (Cloud SQL, BigQuery) se
+    # importan y conectan en la primera llamada que los usa
+    for module in TOOL_MODULES:
+        module.register(mcp)
 
 
     return mcp
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_access_token
+
+from src.deps import cache, db_cause, db_portal, slow_queries, utils
+
+logger = logging.getLogger("plant-risk-mcp.admin")
+
+# Tools de operación: sólo para estos emails (además de estar en ALLOWED_EMAILS)
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+AUTH_DISABLED = os.getenv("AUTH_DISABLED", "false").lower() == "true"
+
+
+def _require_admin() -> None:
+    if AUTH_DISABLED:
+        return
+    try:
+        token = get_access_token()
+    except Exception:
+        token = None
+    claims = getattr(token, "claims", None) or {}
+    email = (claims.get("email") or "").strip().lower()
+    if not email or email not in ADMIN_EMAILS:
+        logger.info(f"[admin] {email or 'anónimo'} no es admin -> denegado")
+        raise ToolError("Admin only")
+
+
+def register(mcp: FastMCP) -> None:
+    @mcp.tool(
+        description=(
+            "ADMIN. Consultas lentas de BD (DB_SLOW_QUERY_MS): las últimas (recent) y el agregado por "
+            "consulta normalizada (by_sql) con su plan EXPLAIN (ANALYZE, BUFFERS) si se capturó. "
+            "db=portal|rca para filtrar; clear=true vacía el registro."
+        )
+    )
+    async def admin_slow_queries(
+        db: Optional[str] = None,
+        limit: Optional[int] = 50,
+        include_plans: Optional[bool] = True,
+        clear: Optional[bool] = False,
+    ) -> dict:
+        _require_admin()
+        log = slow_queries.log
+        lim = max(1, min(int(limit or 50), 500))
+        out = {
+            "config": log.config(),
+            "recent": log.entries(db=db, limit=lim),
+            "by_sql": log.summary(db=db, limit=lim, include_plans=bool(include_plans)),
+            "time": utils._now_iso(),
+        }
+        if clear:
+            log.clear()
+        return out
+
+    @mcp.tool(
+        description=(
+            "ADMIN. Estado de los pools de BD (portal y rca) y contadores hit/miss de las cachés de "
+            "sentencias preparadas y de resultados de tools."
+        )
+    )
+    def admin_db_stats() -> dict:
+        _require_admin()
+        return {
+            "portal": db_portal.stats(),
+            "rca": db_cause.stats(),
+            "tool_cache": cache.tools.stats(),
+            "time": utils._now_iso(),
+        }
+
+    @mcp.tool(
+        description=(
+            "ADMIN. Invalida la caché de resultados de tools (memoria o Redis compartido): borra las "
+            "entradas de las tools cuyo nombre empieza por `prefix` ('' = todas) y cuyos argumentos "
+            "coinciden con `filters`, p.ej. prefix='mpredict_', filters={'plant_id': '3'}. "
+            "Para ver datos recién cambiados sin esperar al TTL."
+        )
+    )
+    async def admin_cache_invalidate(
+        prefix: Optional[str] = "",
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> dict:
+        _require_admin()
+        removed = await cache.invalidate(prefix or "", **(filters or {}))
+        logger.info(f"[admin] caché invalidada prefix={prefix or ''!r} filters={filters or {}} -> {removed}")
+        return {
+            "prefix": prefix or "",
+            "filters": filters or {},
+            "removed": removed,
+            "cache": cache.tools.stats(),
+            "time": utils._now_iso(),
+        }
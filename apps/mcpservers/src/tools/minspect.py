@@ -4,27 +4,61 @@ from typing import Optional, List, Any, Dict, Tuple
 from fastmcp import FastMCP
 from src.deps import db_portal
 from src.deps import utils
-import base64, json
+from src.deps import plant_cache
+from src.deps import cache
+from src.deps import export
+import base64, json, os
+
+# memory: índice de trigramas en proceso (plant_cache) | trgm: pg_trgm en Postgres
+SEARCH_MODE = os.getenv("MINSPECT_SEARCH_MODE", "memory").lower()
+
+# trgm compara el texto normalizado igual que utils._norm en memoria (minúsculas, sin acentos).
+# unaccent() no es IMMUTABLE y no se puede indexar tal cual, de ahí el envoltorio:
+#   CREATE EXTENSION IF NOT EXISTS pg_trgm;
+#   CREATE EXTENSION IF NOT EXISTS unaccent;
+#   CREATE OR REPLACE FUNCTION public.mcp_unaccent(text) RETURNS text
+#       LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+#       AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+#   CREATE INDEX ON public.plants_plant USING gin (public.mcp_unaccent(lower(name)) gin_trgm_ops);
+#   CREATE INDEX ON public.plants_plant USING gin (public.mcp_unaccent(lower(acs_code)) gin_trgm_ops);
+_TRGM_NAME = "public.mcp_unaccent(lower(name))"
+_TRGM_CODE = "public.mcp_unaccent(lower(acs_code))"
+
+
+def _like_contains(text: str) -> str:
+    """Patrón LIKE '%text%' con los comodines de `text` escapados."""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
 
 
 # ============================================================
-# Cursor helpers (opaque keyset cursor based on primary key id)
+# Cursor helpers (opaque keyset cursors)
 # ============================================================
-def _enc_cursor(last_id: Optional[int]) -> Optional[str]:
+def _enc_cursor(last_id: Optional[int], created_at: Any = None, sort: Optional[str] = None) -> Optional[str]:
+    """
+    id-only cursor by default. With `sort`, the cursor carries the composite
+    (creation_date, id) key of the last row plus the sort it was issued for.
+    """
     if not last_id:
         return None
-    payload = {"id": int(last_id)}
+    payload: Dict[str, Any] = {"id": int(last_id)}
+    if sort:
+        payload["sort"] = sort
+        payload["ts"] = created_at.isoformat() if hasattr(created_at, "isoformat") else created_at
     return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("utf-8")
 
 
 def _dec_cursor(cursor: Optional[str]) -> int:
+    return int(_dec_cursor_keys(cursor).get("id", 0))
+
+
+def _dec_cursor_keys(cursor: Optional[str]) -> Dict[str, Any]:
     if not cursor:
-        return 0
+        return {}
     try:
         data = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8"))
-        return int(data.get("id", 0))
+        return {"id": int(data.get("id", 0)), "ts": data.get("ts"), "sort": data.get("sort")}
     except Exception:
-        return 0
+        return {}
 
 
 def _add_filter(where: List[str], params: List[Any], clause: str, *values: Any):
@@ -36,29 +70,14 @@ async def _resolve_plant_id(
     plant_id: Optional[str] = None,
     plant_name: Optional[str] = None,
 ) -> Optional[int]:
-    """Resuelve id por id o nombre (normalizado)."""
+    """Resuelve id por id o nombre (exacto, normalizado o acs_code) desde el directorio en memoria."""
     if plant_id:
         return int(plant_id)
 
     if plant_name:
-        # Exacto
-        p = await db_portal.fetch_one(
-            "SELECT id FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-            (plant_name,),
-        )
-        if p:
-            return int(p["id"])
-        # Normalizado
-        allp = await db_portal.fetch_all(
-            "SELECT id, name, COALESCE(acs_code,'') AS acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-        )
-        target = utils._norm(plant_name)
-        match = next(
-            (pp for pp in allp if utils._norm(pp["name"]) == target or pp["acs_code"] == plant_name),
-            None,
-        )
-        if match:
-            return int(match["id"])
+        plant = await plant_cache.plants.resolve(plant_name=plant_name)
+        if plant:
+            return int(plant["id"])
     return None
 
 
@@ -111,6 +130,93 @@ def _where_notifications(
     return where_sql, params
 
 
+# ============================================================
+# NOTIFICATIONS — keyset on (creation_date, id)
+# ============================================================
+# Index-friendly with: CREATE INDEX ON public.minspect_minspectdata (creation_date, id);
+# DESC is a backward scan of that same index.
+# Sort keys are qualified (d.) so they don't bind to the `id::text AS id` output column.
+_NOTIFICATION_SORTS = {
+    "-created_at": "d.creation_date DESC, d.id DESC",
+    "created_at": "d.creation_date ASC, d.id ASC",
+}
+# Rows without creation_date are paged by id alone: first for DESC (NULLS FIRST), last for ASC.
+_NOTIFICATION_NULL_ORDER = {
+    "-created_at": "d.id DESC",
+    "created_at": "d.id ASC",
+}
+
+
+def _notification_keyset_segments(sort: str, keys: Dict[str, Any]) -> List[Tuple[str, List[Any], str]]:
+    """
+    Remaining segments (WHERE fragment, params, ORDER BY) after the cursor, in page order.
+    Each segment is a plain row comparison so every page is an index range scan;
+    at most two segments are visited per page.
+    """
+    desc = sort.startswith("-")
+    op = "<" if desc else ">"
+    dated = ("creation_date IS NOT NULL", [], _NOTIFICATION_SORTS[sort])
+    undated = ("creation_date IS NULL", [], _NOTIFICATION_NULL_ORDER[sort])
+    if keys.get("ts") is not None:
+        dated = (
+            f"creation_date IS NOT NULL AND (creation_date, id) {op} (%s, %s)",
+            [keys["ts"], keys["id"]],
+            _NOTIFICATION_SORTS[sort],
+        )
+    elif keys:
+        undated = (f"creation_date IS NULL AND id {op} %s", [keys["id"]], _NOTIFICATION_NULL_ORDER[sort])
+
+    if desc:
+        return [dated] if keys.get("ts") is not None else [undated, dated]
+    return [dated, undated] if not keys or keys.get("ts") is not None else [undated]
+
+
+# ============================================================
+# NOTIFICATIONS — bulk export (Parquet / Arrow)
+# ============================================================
+# Columnas del fichero; el SELECT castea cada una a su tipo para que el esquema sea estable.
+_NOTIFICATION_EXPORT_FIELDS = [
+    ("id", "int64"),
+    ("notification_no", "string"),
+    ("plant_id", "int64"),
+    ("plant_name", "string"),
+    ("fl", "string"),
+    ("created_by", "string"),
+    ("description", "string"),
+    ("planner_group", "string"),
+    ("device_id", "string"),
+    ("system_status", "string"),
+    ("priority", "string"),
+    ("created_at", "timestamp"),
+    ("year", "int32"),
+    ("month", "int32"),
+    ("week", "int32"),
+]
+
+_NOTIFICATION_EXPORT_SQL = """
+    SELECT
+        d.id::bigint                  AS id,
+        d.notification_number::text   AS notification_no,
+        d.plant_id::bigint            AS plant_id,
+        (SELECT p.name FROM public.plants_plant p WHERE p.id = d.plant_id)::text AS plant_name,
+        d.fl::text                    AS fl,
+        d.created_by::text            AS created_by,
+        d.description::text           AS description,
+        d.planner_grb::text           AS planner_group,
+        d.device_id::text             AS device_id,
+        d.system_status::text         AS system_status,
+        d.priority::text              AS priority,
+        d.creation_date::timestamp    AS created_at,
+        d.year::int                   AS year,
+        d.month::int                  AS month,
+        d.week::int                   AS week
+    FROM public.minspect_minspectdata d
+    {where_sql}
+    ORDER BY {order}
+    LIMIT %s
+"""
+
+
 # ============================================================
 # INTERNAL IMPLS (not MCP tools)
 # ============================================================
@@ -133,12 +239,18 @@ async def _list_notifications_impl(
 ) -> Dict[str, Any]:
     """
     Global list with filters + keyset pagination.
-    sort: default = -created_at => creation_date DESC, id DESC
+    sort: default = -created_at => creation_date DESC, id DESC; created_at => ASC.
+    The cursor carries (creation_date, id) of the last row, so each page is O(page).
     """
     ps = utils._page_size(page_size)
+    sort = sort or "-created_at"
+    if sort not in _NOTIFICATION_SORTS:
+        return {"error": f"INVALID_ARGUMENT: sort must be one of {', '.join(_NOTIFICATION_SORTS)}"}
 
     # keyset
-    last_id = _dec_cursor(cursor)
+    keys = _dec_cursor_keys(cursor)
+    if keys and keys.get("sort") != sort:
+        return {"error": "INVALID_ARGUMENT: cursor was issued for a different sort"}
 
     # Build where
     where_sql, params = _where_notifications(
@@ -155,7 +267,6 @@ async def _list_notifications_impl(
         planner_grb=planner_grb,
     )
 
-    # Sort policy => use creation_date DESC then id DESC by default; keyset uses id threshold.
     # Add optional asset prefix filter on device_id or fl before keyset condition.
     if asset:
         if where_sql:
@@ -164,67 +275,68 @@ async def _list_notifications_impl(
             where_sql = "WHERE (device_id ILIKE %s OR fl ILIKE %s)"
         params.extend((f"{asset}%", f"{asset}%"))
 
-    # We strictly keyset on id; secondary sort is stable within page.
-    if where_sql:
-        where_sql = f"{where_sql} AND id > %s"
-    else:
-        where_sql = "WHERE id > %s"
-    params = list(params) + [last_id]
-
-    sql = """
-        SELECT
-            id::text                  AS id,
-            notification_number       AS notification_no,
-            plant_id::text            AS plant_id,
-            COALESCE(fl,'')           AS fl,
-            created_by,
-            description,
-            planner_grb,
-            device_id,
-            system_status,
-            priority,
-            creation_date             AS created_at,
-            year, month, week
-        FROM public.minspect_minspectdata
-        {where_sql}
-        ORDER BY id
-        LIMIT %s;
-    """.format(where_sql=where_sql)
-
-    params.append(ps)
-    rows = await db_portal.fetch_all(sql, tuple(params))
+    # Filas compactas leídas por lotes; cada una se convierte directamente en el item de salida
+    items: List[Dict[str, Any]] = []
+    last = None
+    for seg_sql, seg_params, order in _notification_keyset_segments(sort, keys):
+        if where_sql:
+            page_where = f"{where_sql} AND {seg_sql}"
+        else:
+            page_where = f"WHERE {seg_sql}"
+        sql = """
+            SELECT
+                id::text                  AS id,
+                notification_number       AS notification_no,
+                plant_id::text            AS plant_id,
+                COALESCE(fl,'')           AS fl,
+                created_by,
+                description,
+                planner_grb,
+                device_id,
+                system_status,
+                priority,
+                creation_date             AS created_at,
+                year, month, week
+            FROM public.minspect_minspectdata d
+            {where_sql}
+            ORDER BY {order}
+            LIMIT %s;
+        """.format(where_sql=page_where, order=order)
+        async for r in db_portal.iter_rows(sql, tuple(list(params) + seg_params + [ps - len(items)])):
+            items.append(
+                {
+                    "notification_no": r["notification_no"],
+                    "plant_id": r["plant_id"],
+                    "plant_name": None,
+                    "country": None,
+                    "created_by": r["created_by"],
+                    "description": r["description"],
+                    "created_at": r["created_at"],
+                    "system_status": r["system_status"],
+                    "planner_group": r["planner_grb"],
+                    "asset": r["device_id"] or r["fl"] or None,
+                }
+            )
+            last = r
+        if len(items) >= ps:
+            break
 
     # Attach plant_name (and country/region if available -> NULL-safe placeholders)
     # We avoid depending on extra columns; return None when unknown.
-    if rows:
-        pid_list = list({int(r["plant_id"]) for r in rows})
+    if items:
+        pid_list = list({int(it["plant_id"]) for it in items})
         ph = ", ".join(["%s"] * len(pid_list))
         plants = await db_portal.fetch_all(
             f"SELECT id, name FROM public.plants_plant WHERE id IN ({ph})",
             tuple(pid_list),
         )
         pmap = {str(p["id"]): p["name"] for p in plants}
-    else:
-        pmap = {}
-
-    items: List[Dict[str, Any]] = []
-    for r in rows:
-        items.append(
-            {
-                "notification_no": r["notification_no"],
-                "plant_id": r["plant_id"],
-                "plant_name": pmap.get(r["plant_id"]),
-                "country": None,
-                "created_by": r["created_by"],
-                "description": r["description"],
-                "created_at": r["created_at"],
-                "system_status": r["system_status"],
-                "planner_group": r["planner_grb"],
-                "asset": r["device_id"] or r["fl"] or None,
-            }
-        )
+        for it in items:
+            it["plant_name"] = pmap.get(it["plant_id"])
 
-    next_cursor = _enc_cursor(int(rows[-1]["id"])) if rows and len(rows) == ps else None
+    next_cursor = (
+        _enc_cursor(int(last["id"]), last["created_at"], sort) if last is not None and len(items) == ps else None
+    )
     return {"items": items, "next_cursor": next_cursor}
 
 
@@ -306,38 +418,48 @@ def register(mcp: FastMCP):
     # (1) Search & Metadata
     # ----------------------------------------
     @mcp.tool(description="Fuzzy search de plantas por nombre/alias; devuelve IDs canónicos.")
+    @cache.cached()
     async def minspect_search_plants(q: str, limit: Optional[int] = 20) -> dict:
         if not q or not q.strip():
             return {"error": "INVALID_ARGUMENT: q is required"}
-        qn = utils._norm(q)
+        lim = max(1, min(int(limit or 20), 500))
 
-        # Traemos todas y hacemos matching normalizado; en SQL sólo exact/ILIKE si quieres:
-        plants = await db_portal.fetch_all(
-            """
-            SELECT id::text AS plant_id, name AS plant_name, COALESCE(acs_code,'') AS acs_code
-            FROM public.plants_plant
-            WHERE deleted_at IS NULL
-            ORDER BY id
-            LIMIT 5000;
-            """
-        )
-        items: List[Dict[str, Any]] = []
-        for p in plants:
-            if qn in utils._norm(p["plant_name"]) or qn in utils._norm(p["acs_code"]):
-                items.append(
-                    {
-                        "plant_id": p["plant_id"],
-                        "plant_name": p["plant_name"],
-                        "aliases": [],  # si tienes tabla de alias, aquí puedes rellenar
-                        "country": None,
-                        "region": None,
-                    }
-                )
-            if len(items) >= int(limit or 20):
-                break
+        if SEARCH_MODE == "trgm":
+            # Todas las ramas del WHERE (%, LIKE) las sirven los índices gin_trgm_ops de arriba
+            qs = utils._norm(q)
+            rows = await db_portal.fetch_all(
+                f"""
+                SELECT id::text AS plant_id, name AS plant_name,
+                       GREATEST(similarity({_TRGM_NAME}, %s),
+                                COALESCE(similarity({_TRGM_CODE}, %s), 0))::float AS score
+                FROM public.plants_plant
+                WHERE deleted_at IS NULL
+                  AND ({_TRGM_NAME} %% %s OR {_TRGM_CODE} %% %s
+                       OR {_TRGM_NAME} LIKE %s OR {_TRGM_CODE} LIKE %s)
+                ORDER BY score DESC, id
+                LIMIT %s;
+                """,
+                (qs, qs, qs, qs, _like_contains(qs), _like_contains(qs), lim),
+            )
+            matches = [({"id": r["plant_id"], "name": r["plant_name"]}, round(r["score"], 4)) for r in rows]
+        else:
+            matches = await plant_cache.plants.search(q, limit=lim)
+
+        items: List[Dict[str, Any]] = [
+            {
+                "plant_id": p["id"],
+                "plant_name": p["name"],
+                "score": score,
+                "aliases": [],  # si tienes tabla de alias, aquí puedes rellenar
+                "country": None,
+                "region": None,
+            }
+            for p, score in matches
+        ]
         return {"items": items}
 
     @mcp.tool(description="Lista global de plantas con paginación y flag de actividad Minspect.")
+    @cache.cached()
     async def minspect_list_plants_enhanced(
         active_only: Optional[bool] = False,
         country: Optional[str] = None,  # placeholder; devuelve null
@@ -382,7 +504,8 @@ def register(mcp: FastMCP):
     # ----------------------------------------
     # (2) Global Notifications
     # ----------------------------------------
-    @mcp.tool(description="Global notifications list con filtros y paginación keyset. Admite plant_id/plant_name y filtro de asset (prefijo).")
+    @mcp.tool(description="Global notifications list con filtros y paginación keyset. sort=-created_at (por defecto)|created_at. Admite plant_id/plant_name y filtro de asset (prefijo).")
+    @cache.cached()
     async def minspect_notifications_list(
         plant_ids: Optional[str] = None,  # CSV de ids
         plant_id: Optional[str] = None,
@@ -438,7 +561,78 @@ def register(mcp: FastMCP):
         )
         return data
 
+    @mcp.tool(
+        description=(
+            "Exporta TODAS las notificaciones que cumplen los filtros de /list (sin paginar) a un fichero "
+            "Parquet (por defecto) o Arrow IPC y devuelve download_url (caduca; GET sin más auth). "
+            "Para análisis de datasets completos en vez de paginar /list."
+        )
+    )
+    async def minspect_notifications_export(
+        plant_ids: Optional[str] = None,  # CSV de ids
+        plant_id: Optional[str] = None,
+        plant_name: Optional[str] = None,
+        asset: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        year: Optional[int] = None,
+        month: Optional[int] = None,
+        week: Optional[int] = None,
+        created_by: Optional[str] = None,
+        system_status: Optional[str] = None,
+        priority: Optional[str] = None,
+        planner_grb: Optional[str] = None,
+        sort: Optional[str] = "-created_at",
+        format: Optional[str] = "parquet",  # parquet|arrow
+        max_rows: Optional[int] = None,
+    ) -> dict:
+        pid_list = None
+        if plant_ids:
+            try:
+                pid_list = [int(x) for x in plant_ids.split(",") if x.strip()]
+            except Exception:
+                return {"error": "INVALID_ARGUMENT: plant_ids must be CSV of integers"}
+
+        resolved_pid = None
+        if plant_id or plant_name:
+            resolved_pid = await _resolve_plant_id(plant_id=plant_id, plant_name=plant_name)
+            if not resolved_pid:
+                return {"error": "Plant not found"}
+
+        sort = sort or "-created_at"
+        if sort not in _NOTIFICATION_SORTS:
+            return {"error": f"INVALID_ARGUMENT: sort must be one of {', '.join(_NOTIFICATION_SORTS)}"}
+        if (format or "parquet").lower() not in export.FORMATS:
+            return {"error": f"INVALID_ARGUMENT: format must be one of {', '.join(export.FORMATS)}"}
+        limit = max(1, min(int(max_rows or export.EXPORT_MAX_ROWS), export.EXPORT_MAX_ROWS))
+
+        where_sql, params = _where_notifications(
+            plant_ids=pid_list,
+            plant_id=resolved_pid,
+            created_by=created_by,
+            system_status=system_status,
+            priority=priority,
+            year=year,
+            month=month,
+            week=week,
+            date_from=date_from,
+            date_to=date_to,
+            planner_grb=planner_grb,
+        )
+        if asset:
+            where_sql = f"{where_sql} AND " if where_sql else "WHERE "
+            where_sql += "(device_id ILIKE %s OR fl ILIKE %s)"
+            params.extend((f"{asset}%", f"{asset}%"))
+
+        # +1: si llega esa fila de más, el export sale marcado como truncated
+        sql = _NOTIFICATION_EXPORT_SQL.format(where_sql=where_sql, order=_NOTIFICATION_SORTS[sort])
+        batches = db_portal.fetch_batches(sql, tuple(params + [limit + 1]), export.EXPORT_BATCH_ROWS)
+        return await export.export_batches(
+            "notifications", batches, _NOTIFICATION_EXPORT_FIELDS, fmt=format, max_rows=limit
+        )
+
     @mcp.tool(description="Global notifications count con los mismos filtros que /list.")
+    @cache.cached()
     async def minspect_notifications_count(
         plant_ids: Optional[str] = None,
         date_from: Optional[str] = None,
@@ -472,6 +666,7 @@ def register(mcp: FastMCP):
         return {"count": cnt}
 
     @mcp.tool(description="Aggregations (country/plant/created_by/month/status).")
+    @cache.cached()
     async def minspect_notifications_aggregate(
         group_by: str,  # CSV
         plant_ids: Optional[str] = None,
@@ -513,6 +708,7 @@ def register(mcp: FastMCP):
         return data
 
     @mcp.tool(description="Leaderboard de creadores (scope=global|plant).")
+    @cache.cached()
     async def minspect_top_creators(
         scope: str = "global",
         plant_id: Optional[str] = None,
@@ -566,6 +762,7 @@ def register(mcp: FastMCP):
         return {"items": out}
 
     @mcp.tool(description="Últimas notificaciones por planta/asset (prefix match en asset).")
+    @cache.cached()
     async def minspect_notifications_latest(
         plant_id: Optional[str] = None,
         plant_name: Optional[str] = None,
@@ -617,6 +814,7 @@ def register(mcp: FastMCP):
     # (3) Per-plant rollups (top N por planta)
     # ----------------------------------------
     @mcp.tool(description="Top N creadores por planta (múltiples plantas a la vez).")
+    @cache.cached()
     async def minspect_plant_top_creators(
         plant_ids: str,  # CSV
         date_from: Optional[str] = None,
@@ -633,14 +831,6 @@ def register(mcp: FastMCP):
         if not pids:
             return {"error": "INVALID_ARGUMENT: plant_ids is required and must not be empty"}
 
-        # Traer nombres de planta
-        ph = ", ".join(["%s"] * len(pids))
-        pl = await db_portal.fetch_all(
-            f"SELECT id::text AS plant_id, name AS plant_name FROM public.plants_plant WHERE id IN ({ph})",
-            tuple(pids),
-        )
-        pmap = {int(p["plant_id"]): p["plant_name"] for p in pl}
-
         # Filtrado temporal común
         time_where: List[str] = []
         time_params: List[Any] = []
@@ -656,26 +846,44 @@ def register(mcp: FastMCP):
             _add_filter(time_where, time_params, "week = %s", int(week))
         time_sql = " AND " + " AND ".join(time_where) if time_where else ""
 
-        # Para cada planta: top N
-        out_plants: List[Dict[str, Any]] = []
-        for pid in pids:
-            rows = await db_portal.fetch_all(
-                f"""
-                SELECT created_by, COUNT(*)::int AS count
+        # Top N de todas las plantas en una sola consulta: ranking por planta con ROW_NUMBER().
+        # Se parte de la lista pedida (VALUES) para devolver también plantas sin notificaciones.
+        ph = ", ".join(["%s"] * len(pids))
+        values = ", ".join(["(%s::int)"] * len(pids))
+        rows = await db_portal.fetch_all(
+            f"""
+            WITH ranked AS (
+                SELECT plant_id, created_by, COUNT(*)::int AS count,
+                       ROW_NUMBER() OVER (PARTITION BY plant_id ORDER BY COUNT(*) DESC, created_by) AS rn
                 FROM public.minspect_minspectdata
-                WHERE plant_id = %s {time_sql}
-                GROUP BY created_by
-                ORDER BY count DESC
-                LIMIT %s;
-                """,
-                tuple([pid] + time_params + [int(limit_per_plant or 3)]),
+                WHERE plant_id IN ({ph}) {time_sql}
+                GROUP BY plant_id, created_by
             )
+            SELECT v.plant_id, p.name AS plant_name, r.created_by, r.count
+            FROM (SELECT DISTINCT plant_id FROM (VALUES {values}) AS req(plant_id)) v
+            LEFT JOIN public.plants_plant p ON p.id = v.plant_id
+            LEFT JOIN ranked r ON r.plant_id = v.plant_id AND r.rn <= %s
+            ORDER BY v.plant_id, r.rn;
+            """,
+            tuple(pids + time_params + pids + [int(limit_per_plant or 3)]),
+        )
+        pmap: Dict[int, Optional[str]] = {}
+        tops: Dict[int, List[Dict[str, Any]]] = {}
+        for r in rows:
+            pid = int(r["plant_id"])
+            pmap[pid] = r["plant_name"]
+            top = tops.setdefault(pid, [])
+            if r["created_by"] is not None or r["count"] is not None:
+                top.append({"created_by": r["created_by"], "count": r["count"]})
+
+        out_plants: List[Dict[str, Any]] = []
+        for pid in pids:
             out_plants.append(
                 {
                     "plant_id": str(pid),
                     "plant_name": pmap.get(pid),
                     "country": None,
-                    "top": rows,
+                    "top": tops.get(pid, []),
                 }
             )
         return {"plants": out_plants}
@@ -684,6 +892,7 @@ def register(mcp: FastMCP):
     # (4) Alert ↔ Notification correlation
     # ----------------------------------------
     @mcp.tool(description="Correlaciona alertas predictivas con notificaciones Minspect (misma máquina/asset, ventana temporal).")
+    @cache.cached()
     async def minspect_correlate_alerts_notifications(
         plant_id: Optional[str] = None,
         plant_name: Optional[str] = None,
@@ -712,78 +921,76 @@ def register(mcp: FastMCP):
             params.append(s)
         where_alert_sql = " AND ".join(where_alert)
 
-        # Traemos alertas recientes (limit) con info de asset y ts
-        alerts = await db_portal.fetch_all(
+        # Para matching contra minspect: usamos device_id / fl. Si 'asset' llega, lo usamos como prefix.
+        notif_where = [
+            "d.plant_id = %s",
+            "d.creation_date BETWEEN al.timestamp::timestamp - %s::interval AND al.timestamp::timestamp + %s::interval",
+        ]
+        nparams: List[Any] = [pid, f"{window_before_hours or 72} hours", f"{window_after_hours or 168} hours"]
+        if asset:
+            notif_where.append("(d.device_id ILIKE %s OR d.fl ILIKE %s)")
+            nparams.extend((f"{asset}%", f"{asset}%"))
+
+        # Una sola consulta: alertas recientes (limit) + sus notificaciones en ventana
+        # (LATERAL, máx. 100 por alerta) agregadas en JSON -> una fila por alerta, sin repetir
+        # las columnas de la alerta en cada notificación.
+        rows = await db_portal.fetch_all(
             f"""
-            SELECT
-                m.id::text AS id, m.alert_id, m.timestamp,
-                m.risk_score AS risk_score, m.risk_level AS risk_level,
-                m.name AS alert_type,
-                a.name AS machine_name,
-                a.id::text AS machine_id,
-                a.plant_id
-            FROM public.mpredict_mpredictalert m
-            JOIN public.mpredict_asset a ON a.id = m.asset_id
-            WHERE {where_alert_sql}
-            ORDER BY m.timestamp DESC, m.id DESC
-            LIMIT %s;
+            WITH al AS (
+                SELECT
+                    m.id, m.alert_id, m.timestamp,
+                    m.risk_score AS risk_score, m.risk_level AS risk_level,
+                    m.name AS alert_type,
+                    a.name AS machine_name,
+                    a.id::text AS machine_id,
+                    a.plant_id
+                FROM public.mpredict_mpredictalert m
+                JOIN public.mpredict_asset a ON a.id = m.asset_id
+                WHERE {where_alert_sql}
+                ORDER BY m.timestamp DESC, m.id DESC
+                LIMIT %s
+            )
+            SELECT al.alert_id, al.timestamp, al.risk_score, al.alert_type, al.machine_name, n.notifications
+            FROM al
+            LEFT JOIN LATERAL (
+                SELECT COALESCE(
+                    json_agg(
+                        json_build_object(
+                            'notification_no', x.notification_number,
+                            'created_by', x.created_by,
+                            'created_at', x.creation_date,
+                            'asset', COALESCE(NULLIF(x.device_id, ''), NULLIF(x.fl, '')),
+                            'system_status', x.system_status
+                        )
+                        ORDER BY x.creation_date DESC, x.id DESC
+                    ),
+                    '[]'::json
+                ) AS notifications
+                FROM (
+                    SELECT d.id, d.notification_number, d.created_by, d.creation_date, d.device_id, d.fl, d.system_status
+                    FROM public.minspect_minspectdata d
+                    WHERE {" AND ".join(notif_where)}
+                    ORDER BY d.creation_date DESC, d.id DESC
+                    LIMIT 100
+                ) x
+            ) n ON TRUE
+            ORDER BY al.timestamp DESC, al.id DESC;
             """,
-            tuple(params + [int(limit or 50)]),
+            tuple(params + [int(limit or 50)] + nparams),
         )
 
-        if not alerts:
-            return {"pairs": []}
-
-        # Para matching contra minspect: usamos device_id / fl. Si 'asset' llega, lo usamos como prefix.
-        pairs: List[Dict[str, Any]] = []
-        for al in alerts:
-            ts = al["timestamp"]
-            before = f"{window_before_hours or 72} hours"
-            after = f"{window_after_hours or 168} hours"
-
-            notif_where = [
-                "plant_id = %s",
-                "creation_date BETWEEN %s::timestamp - %s::interval AND %s::timestamp + %s::interval",
-            ]
-            nparams: List[Any] = [pid, ts, before, ts, after]
-
-            if asset:
-                notif_where.append("(device_id ILIKE %s OR fl ILIKE %s)")
-                nparams.extend((f"{asset}%", f"{asset}%"))
-
-            notif_sql = f"""
-                SELECT
-                    notification_number AS notification_no,
-                    created_by,
-                    creation_date AS created_at,
-                    device_id, fl,
-                    system_status
-                FROM public.minspect_minspectdata
-                WHERE {" AND ".join(notif_where)}
-                ORDER BY creation_date DESC, id DESC
-                LIMIT 100;
-            """
-            notifs = await db_portal.fetch_all(notif_sql, tuple(nparams))
-            pairs.append(
-                {
-                    "alert": {
-                        "alert_id": al["alert_id"],
-                        "machine_name": al["machine_name"],
-                        "risk_score": al["risk_score"],
-                        "state": None if s == "any" else s.capitalize(),
-                        "timestamp": ts,
-                        "type": al["alert_type"],
-                    },
-                    "notifications": [
-                        {
-                            "notification_no": n["notification_no"],
-                            "created_by": n["created_by"],
-                            "created_at": n["created_at"],
-                            "asset": n["device_id"] or n["fl"] or None,
-                            "system_status": n["system_status"],
-                        }
-                        for n in notifs
-                    ],
-                }
-            )
+        pairs: List[Dict[str, Any]] = [
+            {
+                "alert": {
+                    "alert_id": r["alert_id"],
+                    "machine_name": r["machine_name"],
+                    "risk_score": r["risk_score"],
+                    "state": None if s == "any" else s.capitalize(),
+                    "timestamp": r["timestamp"],
+                    "type": r["alert_type"],
+                },
+                "notifications": r["notifications"],
+            }
+            for r in rows
+        ]
         return {"pairs": pairs}
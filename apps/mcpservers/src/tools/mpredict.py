@@ -3,12 +3,178 @@ from typing import Any, Dict, List, Optional, Tuple
 from typing import Optional
 from src.deps import db_portal
 from src.deps import utils
+from src.deps import alert_agg
+from src.deps import plant_cache
+from src.deps import cache
+from src.deps import export
 from fastmcp import FastMCP
 
+
+_OPEN_STATE = "lower({alias}.state) = 'open'"
+
+
+def _summary_sql(where_sql: str, *, open_only: bool = False, aggregated: bool = False) -> str:
+    """
+    SQL del detalle 'summary' sobre mpredict_asset (alias a); where_sql lleva los %s previos al LIMIT.
+    aggregated=True lee la vista materializada de alert_agg (index scan) en lugar de la
+    agregación LATERAL en vivo sobre mpredict_mpredictalert.
+    Con open_only todos los agregados (count, last, top level) son sólo de alertas abiertas.
+    """
+    if aggregated:
+        count_col = "agg.open_count" if open_only else "agg.alert_count"
+        last_col = "agg.open_last_ts" if open_only else "agg.last_ts"
+        top_col = "agg.open_top_level" if open_only else "agg.top_level"
+        join = "JOIN" if open_only else "LEFT JOIN"
+        open_filter = " AND agg.open_count > 0" if open_only else ""
+        return f"""
+            SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
+                   a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
+                   COALESCE({count_col}, 0) AS "alertCount",
+                   (COALESCE({count_col}, 0) > 0) AS "hasAlerts",
+                   {last_col} AS "lastAlertAt",
+                   {top_col} AS "topAlertRiskLevel"
+            FROM public.mpredict_asset a
+            {join} {alert_agg.VIEW} agg ON agg.asset_id = a.id
+            WHERE {where_sql}{open_filter}
+            ORDER BY a.id
+            LIMIT %s;
+        """
+
+    state_filter = " AND " + _OPEN_STATE.format(alias="m") if open_only else ""
+    top_state_filter = " AND " + _OPEN_STATE.format(alias="m2") if open_only else ""
+    open_filter = " AND COALESCE(agt.alert_count, 0) > 0" if open_only else ""
+    return f"""
+        SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
+               a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
+               COALESCE(agt.alert_count, 0) AS "alertCount",
+               (COALESCE(agt.alert_count, 0) > 0) AS "hasAlerts",
+               agt.last_ts AS "lastAlertAt",
+               agt.top_level AS "topAlertRiskLevel"
+        FROM public.mpredict_asset a
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*)::int AS alert_count,
+                   MAX(m.timestamp) AS last_ts,
+                   (
+                     SELECT m2.risk_level
+                     FROM public.mpredict_mpredictalert m2
+                     WHERE m2.asset_id = a.id{top_state_filter}
+                     ORDER BY { utils._risk_order_sql('m2') } DESC
+                     LIMIT 1
+                   ) AS top_level
+            FROM public.mpredict_mpredictalert m
+            WHERE m.asset_id = a.id{state_filter}
+        ) agt ON TRUE
+        WHERE {where_sql}{open_filter}
+        ORDER BY a.id
+        LIMIT %s;
+    """
+
+
+# ---------------------------------------------------------------------------
+# Listados de máquinas: SQL generado una vez por (scope, filter, detail)
+# ---------------------------------------------------------------------------
+# scope: prefijo de parámetros antes del cursor (plant -> plant_id).
+_MACHINE_SCOPES = {
+    "global": "",
+    "plant": "a.plant_id = %s AND ",
+}
+# filter: restricción sobre las máquinas; 'open' se resuelve distinto según el detalle.
+_MACHINE_FILTERS = {
+    "all": "",
+    "open": "",
+    "high": " AND a.risk_level = 'HIGH'",
+}
+# detail: summary_agg es el summary leído de la vista de alert_agg.
+_MACHINE_COLUMNS = {
+    "names": "a.id::text AS id, a.name",
+    "full": (
+        'a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area, '
+        'a.risk_score AS "riskScore", a.risk_level AS "riskLevel"'
+    ),
+    "summary": None,
+    "summary_agg": None,
+}
+
+
+def _machines_sql(scope: str, filter: str, detail: str) -> str:
+    """SQL keyset (a.id > %s ... LIMIT %s) de un listado de máquinas."""
+    where_sql = f"{_MACHINE_SCOPES[scope]}a.id > %s{_MACHINE_FILTERS[filter]}"
+    columns = _MACHINE_COLUMNS[detail]
+    if columns is None:
+        return _summary_sql(where_sql, open_only=filter == "open", aggregated=detail == "summary_agg")
+    if filter == "open":
+        where_sql += f"""
+              AND EXISTS (
+                  SELECT 1 FROM public.mpredict_mpredictalert m
+                  WHERE m.asset_id = a.id AND {_OPEN_STATE.format(alias="m")}
+              )"""
+    return f"""
+        SELECT {columns}
+        FROM public.mpredict_asset a
+        WHERE {where_sql}
+        ORDER BY a.id
+        LIMIT %s;
+    """
+
+
+_MACHINES_SQL: Dict[Tuple[str, str, str], str] = {
+    (scope, filter, detail): _machines_sql(scope, filter, detail)
+    for scope in _MACHINE_SCOPES
+    for filter in _MACHINE_FILTERS
+    for detail in _MACHINE_COLUMNS
+}
+
+
+async def _machines_page(
+    scope: str,
+    filter: str,
+    detail: Optional[str],
+    scope_params: Tuple[Any, ...],
+    page_size: Optional[int],
+    cursor: Optional[str],
+) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+    """
+    Ejecuta una página de un listado de máquinas -> (rows, next_cursor, aggregates_as_of).
+    Cualquier detail que no sea names|full es summary. Todas las tools devuelven siempre
+    aggregates_as_of: en summary, el refresco de la vista o ahora si se agregó en vivo;
+    None en names|full (no llevan agregados).
+    """
+    ps = utils._page_size(page_size)
+    after_id = int(cursor) if cursor else 0
+    as_of = None
+    if detail not in ("names", "full"):
+        aggregated = await alert_agg.aggregates.ready()
+        as_of = alert_agg.aggregates.freshness() if aggregated else utils._now_iso()
+        detail = "summary_agg" if aggregated else "summary"
+    sql = _MACHINES_SQL[(scope, filter, detail)]
+    rows = await db_portal.fetch_all(sql, (*scope_params, after_id, ps))
+    next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
+    return rows, next_cursor, as_of
+
+
+# Columnas del export de alertas; el SELECT castea cada una a su tipo para que el esquema sea estable.
+_ALERT_EXPORT_FIELDS = [
+    ("id", "int64"),
+    ("alert_id", "string"),
+    ("timestamp", "timestamptz"),
+    ("name", "string"),
+    ("state", "string"),
+    ("riskScore", "float64"),
+    ("riskLevel", "string"),
+    ("machine_id", "int64"),
+    ("machine_name", "string"),
+    ("plant_id", "int64"),
+    ("plant_name", "string"),
+    ("plant_acs_code", "string"),
+    ("features", "string"),  # JSON de feature_contribution (sólo con include_features)
+]
+
+
 def register(mcp: FastMCP):
     
     # -------- mpredict_list_plants --------
     @mcp.tool(description="Lista plantas de mpredict, minspect con paginación keyset.")
+    @cache.cached()
     async def mpredict_list_plants(page_size: Optional[int] = None, cursor: Optional[str] = None) -> dict:
         ps = utils._page_size(page_size)
         after_id = int(cursor) if cursor else 0
@@ -25,6 +191,7 @@ def register(mcp: FastMCP):
 
     # -------- mpredict_list_machines_for_plant --------
     @mcp.tool(description="Lista máquinas de una planta. detail=names|summary|full")
+    @cache.cached()
     async def mpredict_list_machines_for_plant(
         plant_name: Optional[str] = None,
         plant_id: Optional[str] = None,
@@ -33,108 +200,27 @@ def register(mcp: FastMCP):
         cursor: Optional[str] = None,
     ) -> dict:
         # Resolver planta
-        plant = None
-        if plant_id:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND id = %s",
-                (int(plant_id),),
-            )
-        elif plant_name:
-            # match exacto por nombre; puedes cambiar a ILIKE si quieres más laxo
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-                (plant_name,),
-            )
-            if not plant:
-                # fallback: normalización en Python
-                candidates = await db_portal.fetch_all(
-                    "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-                )
-                target = utils._norm(plant_name)
-                plant = next((p for p in candidates if utils._norm(p["name"]) == target or p["acs_code"] == plant_name), None)
+        plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
 
         if not plant:
             return {"error": "Plant not found", "plant_name": plant_name, "plant_id": plant_id}
 
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-        pid = int(plant["id"])
-
-        if detail == "names":
-            sql = """
-                SELECT id::text AS id, name
-                FROM public.mpredict_asset
-                WHERE plant_id = %s AND id > %s
-                ORDER BY id
-                LIMIT %s;
-            """
-            rows = await db_portal.fetch_all(sql, (pid, after_id, ps))
-            next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
-            return {
-                "plant": plant,
-                "detail": "names",
-                "count": len(rows),
-                "next_cursor": next_cursor,
-                "machines": rows,
-            }
-
-        if detail == "full":
-            sql = """
-                SELECT id::text AS id, name, plant_id::text AS plant_id, area,
-                       risk_score AS "riskScore", risk_level AS "riskLevel"
-                FROM public.mpredict_asset
-                WHERE plant_id = %s AND id > %s
-                ORDER BY id
-                LIMIT %s;
-            """
-            rows = await db_portal.fetch_all(sql, (pid, after_id, ps))
-            next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
-            return {
-                "plant": plant,
-                "detail": "full",
-                "count": len(rows),
-                "next_cursor": next_cursor,
-                "machines": rows,
-            }
-
-        # summary (agregados en SQL, sin traer alertas completas)
-        sql = f"""
-            SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                   a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                   COALESCE(agt.alert_count, 0) AS "alertCount",
-                   (agt.alert_count > 0) AS "hasAlerts",
-                   agt.last_ts AS "lastAlertAt",
-                   agt.top_level AS "topAlertRiskLevel"
-            FROM public.mpredict_asset a
-            LEFT JOIN LATERAL (
-                SELECT COUNT(*)::int AS alert_count,
-                       MAX(m.timestamp) AS last_ts,
-                       (
-                         SELECT m2.risk_level
-                         FROM public.mpredict_mpredictalert m2
-                         WHERE m2.asset_id = a.id
-                         ORDER BY { utils._risk_order_sql('m2') } DESC
-                         LIMIT 1
-                       ) AS top_level
-                FROM public.mpredict_mpredictalert m
-                WHERE m.asset_id = a.id
-            ) agt ON TRUE
-            WHERE a.plant_id = %s AND a.id > %s
-            ORDER BY a.id
-            LIMIT %s;
-        """
-        rows = await db_portal.fetch_all(sql, (pid, after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
+        mode = detail if detail in ("names", "full") else "summary"
+        rows, next_cursor, as_of = await _machines_page(
+            "plant", "all", mode, (int(plant["id"]),), page_size, cursor
+        )
         return {
             "plant": plant,
-            "detail": "summary",
+            "detail": mode,
             "count": len(rows),
             "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
             "machines": rows,
         }
 
     # -------- mpredict_machines_with_open_alerts_in_plant --------
     @mcp.tool(description="Máquinas con alertas abiertas en una planta (detail=names|summary|full).")
+    @cache.cached()
     async def mpredict_machines_with_open_alerts_in_plant(
         plant_name: Optional[str] = None,
         plant_id: Optional[str] = None,
@@ -142,96 +228,27 @@ def register(mcp: FastMCP):
         page_size: Optional[int] = None,
         cursor: Optional[str] = None,
     ) -> dict:
-        # Reutilizamos list_machines_for_plant summary pero filtrando por count>0 en SQL
+        # Mismo listado que list_machines_for_plant, filtrando en SQL las que tienen alertas abiertas
         # Resolver planta
-        plant = None
-        if plant_id:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND id = %s",
-                (int(plant_id),),
-            )
-        elif plant_name:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-                (plant_name,),
-            )
-            if not plant:
-                candidates = await db_portal.fetch_all(
-                    "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-                )
-                target = utils._norm(plant_name)
-                plant = next((p for p in candidates if utils._norm(p["name"]) == target or p["acs_code"] == plant_name), None)
+        plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
         if not plant:
             return {"error": "Plant not found"}
 
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-        pid = int(plant["id"])
-
-        # detail switch
-        if detail == "names":
-            sql = """
-                SELECT a.id::text AS id, a.name
-                FROM public.mpredict_asset a
-                WHERE a.plant_id = %s AND a.id > %s
-                  AND EXISTS (
-                      SELECT 1 FROM public.mpredict_mpredictalert m
-                      WHERE m.asset_id = a.id AND lower(m.state) = 'open'
-                  )
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        elif detail == "full":
-            sql = """
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel"
-                FROM public.mpredict_asset a
-                WHERE a.plant_id = %s AND a.id > %s
-                  AND EXISTS (
-                      SELECT 1 FROM public.mpredict_mpredictalert m
-                      WHERE m.asset_id = a.id AND lower(m.state) = 'open'
-                  )
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        else:
-            sql = f"""
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                       COALESCE(agt.alert_count, 0) AS "alertCount",
-                       (agt.alert_count > 0) AS "hasAlerts",
-                       agt.last_ts AS "lastAlertAt",
-                       agt.top_level AS "topAlertRiskLevel"
-                FROM public.mpredict_asset a
-                LEFT JOIN LATERAL (
-                    SELECT COUNT(*)::int AS alert_count,
-                           MAX(m.timestamp) AS last_ts,
-                           (
-                             SELECT m2.risk_level
-                             FROM public.mpredict_mpredictalert m2
-                             WHERE m2.asset_id = a.id
-                             ORDER BY { utils._risk_order_sql('m2') } DESC
-                             LIMIT 1
-                           ) AS top_level
-                    FROM public.mpredict_mpredictalert m
-                    WHERE m.asset_id = a.id AND lower(m.state) = 'open'
-                ) agt ON TRUE
-                WHERE a.plant_id = %s AND a.id > %s AND COALESCE(agt.alert_count, 0) > 0
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        rows = await db_portal.fetch_all(sql, (pid, after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
+        rows, next_cursor, as_of = await _machines_page(
+            "plant", "open", detail, (int(plant["id"]),), page_size, cursor
+        )
         return {
             "plant": plant,
             "detail": detail or "summary",
             "count": len(rows),
             "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
             "machines": rows,
         }
 
     # -------- mpredict_machines_with_high_risk_in_plant --------
     @mcp.tool(description="Máquinas con riesgo HIGH en una planta (detail=names|summary|full).")
+    @cache.cached()
     async def mpredict_machines_with_high_risk_in_plant(
         plant_name: Optional[str] = None,
         plant_id: Optional[str] = None,
@@ -240,264 +257,76 @@ def register(mcp: FastMCP):
         cursor: Optional[str] = None,
     ) -> dict:
         # Resolver planta
-        plant = None
-        if plant_id:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND id = %s",
-                (int(plant_id),),
-            )
-        elif plant_name:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-                (plant_name,),
-            )
-            if not plant:
-                candidates = await db_portal.fetch_all(
-                    "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-                )
-                target = utils._norm(plant_name)
-                plant = next((p for p in candidates if utils._norm(p["name"]) == target or p["acs_code"] == plant_name), None)
+        plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
         if not plant:
             return {"error": "Plant not found"}
 
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-        pid = int(plant["id"])
-
-        if detail == "names":
-            sql = """
-                SELECT id::text AS id, name
-                FROM public.mpredict_asset
-                WHERE plant_id = %s AND id > %s AND risk_level = 'HIGH'
-                ORDER BY id
-                LIMIT %s;
-            """
-        elif detail == "full":
-            sql = """
-                SELECT id::text AS id, name, plant_id::text AS plant_id, area,
-                       risk_score AS "riskScore", risk_level AS "riskLevel"
-                FROM public.mpredict_asset
-                WHERE plant_id = %s AND id > %s AND risk_level = 'HIGH'
-                ORDER BY id
-                LIMIT %s;
-            """
-        else:
-            sql = f"""
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                       COALESCE(agt.alert_count, 0) AS "alertCount",
-                       (agt.alert_count > 0) AS "hasAlerts",
-                       agt.last_ts AS "lastAlertAt",
-                       agt.top_level AS "topAlertRiskLevel"
-                FROM public.mpredict_asset a
-                LEFT JOIN LATERAL (
-                    SELECT COUNT(*)::int AS alert_count,
-                           MAX(m.timestamp) AS last_ts,
-                           (
-                             SELECT m2.risk_level
-                             FROM public.mpredict_mpredictalert m2
-                             WHERE m2.asset_id = a.id
-                             ORDER BY { utils._risk_order_sql('m2') } DESC
-                             LIMIT 1
-                           ) AS top_level
-                    FROM public.mpredict_mpredictalert m
-                    WHERE m.asset_id = a.id
-                ) agt ON TRUE
-                WHERE a.plant_id = %s AND a.id > %s AND a.risk_level = 'HIGH'
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        rows = await db_portal.fetch_all(sql, (pid, after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
+        rows, next_cursor, as_of = await _machines_page(
+            "plant", "high", detail, (int(plant["id"]),), page_size, cursor
+        )
         return {
             "plant": plant,
             "detail": detail or "summary",
             "count": len(rows),
             "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
             "machines": rows,
         }
 
     # -------- mpredict_list_machines (global) --------
     @mcp.tool(description="Lista máquinas global (detail=names|summary|full), paginación keyset.")
+    @cache.cached()
     async def mpredict_list_machines(
         detail: Optional[str] = "summary",
         page_size: Optional[int] = None,
         cursor: Optional[str] = None,
     ) -> dict:
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-
-        if detail == "names":
-            sql = """
-                SELECT id::text AS id, name
-                FROM public.mpredict_asset
-                WHERE id > %s
-                ORDER BY id
-                LIMIT %s;
-            """
-        elif detail == "full":
-            sql = """
-                SELECT id::text AS id, name, plant_id::text AS plant_id, area,
-                       risk_score AS "riskScore", risk_level AS "riskLevel"
-                FROM public.mpredict_asset
-                WHERE id > %s
-                ORDER BY id
-                LIMIT %s;
-            """
-        else:
-            sql = f"""
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                       COALESCE(agt.alert_count, 0) AS "alertCount",
-                       (agt.alert_count > 0) AS "hasAlerts",
-                       agt.last_ts AS "lastAlertAt",
-                       agt.top_level AS "topAlertRiskLevel"
-                FROM public.mpredict_asset a
-                LEFT JOIN LATERAL (
-                    SELECT COUNT(*)::int AS alert_count,
-                           MAX(m.timestamp) AS last_ts,
-                           (
-                             SELECT m2.risk_level
-                             FROM public.mpredict_mpredictalert m2
-                             WHERE m2.asset_id = a.id
-                             ORDER BY { utils._risk_order_sql('m2') } DESC
-                             LIMIT 1
-                           ) AS top_level
-                    FROM public.mpredict_mpredictalert m
-                    WHERE m.asset_id = a.id
-                ) agt ON TRUE
-                WHERE a.id > %s
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        rows = await db_portal.fetch_all(sql, (after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
-        return {"detail": detail or "summary", "count": len(rows), "next_cursor": next_cursor, "machines": rows}
+        rows, next_cursor, as_of = await _machines_page("global", "all", detail, (), page_size, cursor)
+        return {
+            "detail": detail or "summary",
+            "count": len(rows),
+            "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
+            "machines": rows,
+        }
 
     # -------- mpredict_machines_with_open_alerts (global) --------
     @mcp.tool(description="Máquinas con alertas abiertas (global).")
+    @cache.cached()
     async def mpredict_machines_with_open_alerts(
         detail: Optional[str] = "summary",
         page_size: Optional[int] = None,
         cursor: Optional[str] = None,
     ) -> dict:
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-
-        if detail == "names":
-            sql = """
-                SELECT a.id::text AS id, a.name
-                FROM public.mpredict_asset a
-                WHERE a.id > %s
-                  AND EXISTS (
-                      SELECT 1 FROM public.mpredict_mpredictalert m
-                      WHERE m.asset_id = a.id AND lower(m.state)='open'
-                  )
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        elif detail == "full":
-            sql = """
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel"
-                FROM public.mpredict_asset a
-                WHERE a.id > %s
-                  AND EXISTS (
-                      SELECT 1 FROM public.mpredict_mpredictalert m
-                      WHERE m.asset_id = a.id AND lower(m.state)='open'
-                  )
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        else:
-            sql = f"""
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                       COALESCE(agt.alert_count, 0) AS "alertCount",
-                       (agt.alert_count > 0) AS "hasAlerts",
-                       agt.last_ts AS "lastAlertAt",
-                       agt.top_level AS "topAlertRiskLevel"
-                FROM public.mpredict_asset a
-                LEFT JOIN LATERAL (
-                    SELECT COUNT(*)::int AS alert_count,
-                           MAX(m.timestamp) AS last_ts,
-                           (
-                             SELECT m2.risk_level
-                             FROM public.mpredict_mpredictalert m2
-                             WHERE m2.asset_id = a.id
-                             ORDER BY { utils._risk_order_sql('m2') } DESC
-                             LIMIT 1
-                           ) AS top_level
-                    FROM public.mpredict_mpredictalert m
-                    WHERE m.asset_id = a.id AND lower(m.state)='open'
-                ) agt ON TRUE
-                WHERE a.id > %s AND COALESCE(agt.alert_count, 0) > 0
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        rows = await db_portal.fetch_all(sql, (after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
-        return {"detail": detail or "summary", "count": len(rows), "next_cursor": next_cursor, "machines": rows}
+        rows, next_cursor, as_of = await _machines_page("global", "open", detail, (), page_size, cursor)
+        return {
+            "detail": detail or "summary",
+            "count": len(rows),
+            "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
+            "machines": rows,
+        }
 
     # -------- mpredict_machines_with_high_risk (global) --------
     @mcp.tool(description="Máquinas con riesgo HIGH (global).")
+    @cache.cached()
     async def mpredict_machines_with_high_risk(
         detail: Optional[str] = "summary",
         page_size: Optional[int] = None,
         cursor: Optional[str] = None,
     ) -> dict:
-        ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
-
-        if detail == "names":
-            sql = """
-                SELECT id::text AS id, name
-                FROM public.mpredict_asset
-                WHERE id > %s AND risk_level='HIGH'
-                ORDER BY id
-                LIMIT %s;
-            """
-        elif detail == "full":
-            sql = """
-                SELECT id::text AS id, name, plant_id::text AS plant_id, area,
-                       risk_score AS "riskScore", risk_level AS "riskLevel"
-                FROM public.mpredict_asset
-                WHERE id > %s AND risk_level='HIGH'
-                ORDER BY id
-                LIMIT %s;
-            """
-        else:
-            sql = f"""
-                SELECT a.id::text AS id, a.name, a.plant_id::text AS plant_id, a.area,
-                       a.risk_score AS "riskScore", a.risk_level AS "riskLevel",
-                       COALESCE(agt.alert_count, 0) AS "alertCount",
-                       (agt.alert_count > 0) AS "hasAlerts",
-                       agt.last_ts AS "lastAlertAt",
-                       agt.top_level AS "topAlertRiskLevel"
-                FROM public.mpredict_asset a
-                LEFT JOIN LATERAL (
-                    SELECT COUNT(*)::int AS alert_count,
-                           MAX(m.timestamp) AS last_ts,
-                           (
-                             SELECT m2.risk_level
-                             FROM public.mpredict_mpredictalert m2
-                             WHERE m2.asset_id = a.id
-                             ORDER BY { utils._risk_order_sql('m2') } DESC
-                             LIMIT 1
-                           ) AS top_level
-                    FROM public.mpredict_mpredictalert m
-                    WHERE m.asset_id = a.id
-                ) agt ON TRUE
-                WHERE a.id > %s AND a.risk_level='HIGH'
-                ORDER BY a.id
-                LIMIT %s;
-            """
-        rows = await db_portal.fetch_all(sql, (after_id, ps))
-        next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
-        return {"detail": detail or "summary", "count": len(rows), "next_cursor": next_cursor, "machines": rows}
+        rows, next_cursor, as_of = await _machines_page("global", "high", detail, (), page_size, cursor)
+        return {
+            "detail": detail or "summary",
+            "count": len(rows),
+            "next_cursor": next_cursor,
+            "aggregates_as_of": as_of,
+            "machines": rows,
+        }
 
     # -------- mpredict_list_alerts_in_plant --------
     @mcp.tool(description="Lista alertas de una planta (state=Open|Closed|Any). include_features opcional.")
+    @cache.cached()
     async def mpredict_list_alerts_in_plant(
         plant_name: Optional[str] = None,
         plant_id: Optional[str] = None,
@@ -512,23 +341,7 @@ def register(mcp: FastMCP):
             return {"error": "state debe ser Open|Closed|Any"}
 
         # Resolver planta
-        plant = None
-        if plant_id:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND id = %s",
-                (int(plant_id),),
-            )
-        elif plant_name:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-                (plant_name,),
-            )
-            if not plant:
-                candidates = await db_portal.fetch_all(
-                    "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-                )
-                target = utils._norm(plant_name)
-                plant = next((p for p in candidates if utils._norm(p["name"]) == target or p["acs_code"] == plant_name), None)
+        plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
         if not plant:
             return {"error": "Plant not found"}
 
@@ -606,6 +419,7 @@ def register(mcp: FastMCP):
 
     # -------- mpredict_list_alerts (global) --------
     @mcp.tool(description="Lista alertas global (state=Open|Closed|Any), include_features opcional.")
+    @cache.cached()
     async def mpredict_list_alerts(
         state: Optional[str] = "Open",
         include_features: Optional[bool] = False,
@@ -686,8 +500,79 @@ def register(mcp: FastMCP):
         next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
         return {"state": s.upper() if s != "any" else "ANY", "count": len(alerts_out), "next_cursor": next_cursor, "alerts": alerts_out}
 
+    # -------- mpredict_alerts_export --------
+    @mcp.tool(
+        description=(
+            "Exporta TODAS las alertas que cumplen los filtros (state=Open|Closed|Any, planta, rango de fechas) "
+            "a un fichero Parquet (por defecto) o Arrow IPC y devuelve download_url (caduca; GET sin más auth). "
+            "Para análisis de datasets completos en vez de paginar mpredict_list_alerts."
+        )
+    )
+    async def mpredict_alerts_export(
+        state: Optional[str] = "Any",
+        plant_name: Optional[str] = None,
+        plant_id: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        include_features: Optional[bool] = False,
+        format: Optional[str] = "parquet",  # parquet|arrow
+        max_rows: Optional[int] = None,
+    ) -> dict:
+        s = (state or "Any").strip().lower()
+        if s not in ("open", "closed", "any"):
+            return {"error": "state debe ser Open|Closed|Any"}
+        if (format or "parquet").lower() not in export.FORMATS:
+            return {"error": f"INVALID_ARGUMENT: format must be one of {', '.join(export.FORMATS)}"}
+        limit = max(1, min(int(max_rows or export.EXPORT_MAX_ROWS), export.EXPORT_MAX_ROWS))
+
+        where_parts: List[str] = ["TRUE"]
+        params: List[Any] = []
+        if s != "any":
+            where_parts.append("lower(m.state) = %s")
+            params.append(s)
+        if plant_id or plant_name:
+            plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
+            if not plant:
+                return {"error": "Plant not found"}
+            where_parts.append("a.plant_id = %s")
+            params.append(int(plant["id"]))
+        if date_from:
+            where_parts.append("m.timestamp >= %s")
+            params.append(date_from)
+        if date_to:
+            where_parts.append("m.timestamp <= %s")
+            params.append(date_to)
+
+        select_features = "m.feature_contribution::text" if include_features else "NULL::text"
+        sql = f"""
+            SELECT
+                m.id::bigint AS id,
+                m.alert_id::text AS alert_id,
+                m.timestamp::timestamptz AS timestamp,
+                m.name::text AS name,
+                m.state::text AS state,
+                m.risk_score::float8 AS "riskScore",
+                m.risk_level::text AS "riskLevel",
+                a.id::bigint AS machine_id,
+                a.name::text AS machine_name,
+                p.id::bigint AS plant_id,
+                p.name::text AS plant_name,
+                p.acs_code::text AS plant_acs_code,
+                {select_features} AS features
+            FROM public.mpredict_mpredictalert m
+            JOIN public.mpredict_asset a ON a.id = m.asset_id
+            JOIN public.plants_plant p ON p.id = a.plant_id
+            WHERE {" AND ".join(where_parts)}
+            ORDER BY m.id
+            LIMIT %s
+        """
+        # +1: si llega esa fila de más, el export sale marcado como truncated
+        batches = db_portal.fetch_batches(sql, tuple(params + [limit + 1]), export.EXPORT_BATCH_ROWS)
+        return await export.export_batches("alerts", batches, _ALERT_EXPORT_FIELDS, fmt=format, max_rows=limit)
+
     # -------- mpredict_get_alert_features --------
     @mcp.tool(description="Devuelve features para una alerta (por numeric id o UUID).")
+    @cache.cached()
     async def mpredict_get_alert_features(
         alert_id: Optional[str] = None,
         alert_numeric_id: Optional[str] = None,
@@ -725,6 +610,7 @@ def register(mcp: FastMCP):
 
     # -------- mpredict_get_alert_features_in_plant --------
     @mcp.tool(description="Devuelve features de una alerta dentro de una planta.")
+    @cache.cached()
     async def mpredict_get_alert_features_in_plant(
         plant_name: Optional[str] = None,
         plant_id: Optional[str] = None,
@@ -738,23 +624,7 @@ def register(mcp: FastMCP):
             return {"error": "Debe indicar 'alert_id' (UUID) o 'alert_numeric_id'."}
 
         # Resolver planta
-        plant = None
-        if plant_id:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND id = %s",
-                (int(plant_id),),
-            )
-        elif plant_name:
-            plant = await db_portal.fetch_one(
-                "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL AND name = %s",
-                (plant_name,),
-            )
-            if not plant:
-                candidates = await db_portal.fetch_all(
-                    "SELECT id::text AS id, name, acs_code FROM public.plants_plant WHERE deleted_at IS NULL"
-                )
-                target = utils._norm(plant_name)
-                plant = next((p for p in candidates if utils._norm(p["name"]) == target or p["acs_code"] == plant_name), None)
+        plant = await plant_cache.plants.resolve(plant_id=plant_id, plant_name=plant_name)
         if not plant:
             return {"error": "Plant not found"}
 
@@ -1,7 +1,7 @@
 from datetime import datetime, date
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from src.deps import db_cause, utils
+from src.deps import cache, db_cause, fanout, rca_search, utils
 from fastmcp import FastMCP
 
 # -------------------------- helpers --------------------------
@@ -10,6 +10,25 @@ def _like_param(text: Optional[str]) -> Optional[str]:
     return f"%{text.strip().lower()}%" if text else None
 
 
+def _enc_rank_cursor(rank: float, pd_id: Any) -> str:
+    return f"{rank!r}:{pd_id}"
+
+
+def _dec_rank_cursor(cursor: Optional[str]):
+    """'rank:id' -> (rank, id); None si no hay cursor. ValueError si no es 'rank:id' (p.ej. un id de modo ILIKE)."""
+    if not cursor:
+        return None
+    rank, sep, pd_id = cursor.partition(":")
+    if not sep:
+        raise ValueError(f"cursor sin rank: {cursor!r}")
+    return float(rank), int(pd_id)
+
+
+# Mismo error para un cursor mal formado y para uno emitido en el otro modo de búsqueda
+# (p.ej. un id de ILIKE tras construirse el índice con RCA_SEARCH_MODE=auto).
+_BAD_CURSOR = {"error": "INVALID_ARGUMENT: cursor no válido para esta búsqueda (¿cambió el modo de texto?); repite sin cursor"}
+
+
 def _parse_list(value: Optional[str]) -> Optional[List[str]]:
     if value is None:
         return None
@@ -19,10 +38,80 @@ def _parse_list(value: Optional[str]) -> Optional[List[str]]:
     return parts or None
 
 
+def _pd_filters(
+    when_from: Optional[str],
+    when_to: Optional[str],
+    status_list: Optional[List[str]],
+    plant_list: Optional[List[str]],
+) -> Tuple[List[str], List[Any]]:
+    """Filtros básicos sobre PD (alias pd); la primera parte es siempre TRUE."""
+    where_parts = ["TRUE"]
+    params: List[Any] = []
+    if when_from:
+        where_parts.append("pd.when >= %s")
+        params.append(when_from)
+    if when_to:
+        where_parts.append("pd.when <= %s")
+        params.append(when_to)
+    if status_list:
+        where_parts.append("LOWER(pd.status) = ANY(%s)")
+        params.append([s.lower() for s in status_list])
+    if plant_list:
+        where_parts.append("pd.plant = ANY(%s)")
+        params.append(plant_list)
+    return where_parts, params
+
+
+def _related_counts_sql(select_sql: str, where_parts: List[str], params: List[Any], tail: str = "") -> Tuple[str, List[Any]]:
+    """
+    Una sola sentencia: LEFT JOIN de los PDs filtrados con los conteos de Solutions/Actions
+    pre-agregados por PD (alias s.c / a.c). Con filtros, cada subconsulta se limita a los PDs
+    que los cumplen (semi-join); sin filtros se agrega la tabla entera, que es más barato.
+    """
+    where_sql = " AND ".join(where_parts)
+    related_filter = ""
+    query_params = list(params)
+    if len(where_parts) > 1:
+        related_filter = f'WHERE x."rca_ID" IN (SELECT pd.id FROM public.rca_data_problem_definition pd WHERE {where_sql})'
+        query_params = list(params) * 3
+    sql = f"""
+        SELECT {select_sql}
+        FROM public.rca_data_problem_definition pd
+        LEFT JOIN (
+            SELECT x."rca_ID" AS pid, COUNT(*)::int AS c
+            FROM public.rca_data_solution x
+            {related_filter}
+            GROUP BY x."rca_ID"
+        ) s ON s.pid = pd.id
+        LEFT JOIN (
+            SELECT x."rca_ID" AS pid, COUNT(*)::int AS c
+            FROM public.rca_data_action x
+            {related_filter}
+            GROUP BY x."rca_ID"
+        ) a ON a.pid = pd.id
+        WHERE {where_sql}
+        {tail}
+    """
+    return sql, query_params
+
+
+async def _fetch_grouped_by_rca(sql: str, params: tuple) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    rca_id -> filas (dict) leyendo por lotes de un cursor de servidor: no hay una lista
+    intermedia con todas las filas, sólo el lote en curso y el resultado agrupado.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    async for batch in db_cause.fetch_batches(sql, params):
+        for row in batch:
+            grouped.setdefault(row["rca_id"], []).append(row._asdict())
+    return grouped
+
+
 def register(mcp: FastMCP):
 
     # -------------------------- rca_list_plants --------------------------
     @mcp.tool(description="Lista plantas posibles (tabla rca_data_plant) con filtros y paginación keyset.")
+    @cache.cached()
     async def rca_list_plants(
         text: Optional[str] = None,               # busca en plant / country / region
         country: Optional[List[str]] = None,      # ["Poland","Egypt"] o "Poland,Egypt"
@@ -90,6 +179,7 @@ def register(mcp: FastMCP):
             "Puede buscar también en Solutions/Actions relacionadas (texto), enlazando pd.id = s.\"rca_ID\" / a.\"rca_ID\"."
         )
     )
+    @cache.cached()
     async def rca_list_problems(
         text: Optional[str] = None,
         text_in: Optional[List[str]] = None,         # ["event_name","what","where"]
@@ -99,28 +189,65 @@ def register(mcp: FastMCP):
         when_from: Optional[str] = None,             # "YYYY-MM-DD"
         when_to: Optional[str] = None,               # "YYYY-MM-DD"
         page_size: Optional[int] = None,
-        cursor: Optional[str] = None,                # keyset: id > cursor
+        cursor: Optional[str] = None,                # keyset: id > cursor ('rank:id' con búsqueda de texto indexada)
         detail: Optional[str] = "summary",           # summary|full
     ) -> dict:
-        """Devuelve PDs filtrados con paginación keyset (id > cursor)."""
+        """
+        Devuelve PDs filtrados con paginación keyset.
+
+        Con el índice de texto completo construido (src.deps.rca_search) la búsqueda por
+        `text` usa el documento tsvector del PD (sus columnas y, si include_related_text,
+        sus Solutions/Actions), ordena por ts_rank y el cursor es 'rank:id'. Sin índice
+        (o RCA_SEARCH_MODE=ilike) se busca con ILIKE y se pagina por id > cursor.
+
+        Ojo, los dos modos no casan igual: ILIKE busca cada texto como subcadena ('%term%',
+        'ring' casa 'bearing'), el índice busca palabras que EMPIEZAN por cada término
+        ('bear fail' -> 'bear:* & fail:*'; 'ring' ya no casa 'bearing'). Con
+        RCA_SEARCH_MODE=auto el cambio ocurre solo al construirse el índice; un cursor del
+        otro modo se rechaza con INVALID_ARGUMENT en lugar de volver a la primera página.
+        """
         ps = utils._page_size(page_size)
-        after_id = int(cursor) if cursor else 0
 
         like = _like_param(text)
         allowed_text_cols = {"event_name", "what", "where"}
         text_cols = [c for c in (text_in or ["event_name", "what", "where"]) if c in allowed_text_cols]
+        include_related = include_related_text is None or include_related_text
+
+        # Partes del documento donde buscar; sin ninguna no hay filtro de texto (como con ILIKE)
+        weights = [rca_search.WEIGHTS[c] for c in text_cols]
+        if include_related:
+            weights.append(rca_search.WEIGHTS["related"])
+        tsquery = rca_search.tsquery_text(text) if like and weights else None
+        use_fts = bool(tsquery) and await rca_search.index.ready()
+
+        try:
+            after = _dec_rank_cursor(cursor) if use_fts else (int(cursor) if cursor else 0)
+        except ValueError:
+            return _BAD_CURSOR
 
         status_list = _parse_list(status)
         plant_list = _parse_list(plant)
 
-        where_parts: List[str] = ["pd.id > %s"]
-        params: List[Any] = [after_id]
+        where_parts: List[str] = []
+        params: List[Any] = []
 
-        # Texto en columnas del PD
-        if like and text_cols:
-            or_blocks = [f"LOWER(pd.{col}) ILIKE %s" for col in text_cols]
-            params.extend([like] * len(or_blocks))
-            where_parts.append("( " + " OR ".join(or_blocks) + " )")
+        # rank y filtro sólo sobre las partes pedidas (ts_filter), no sobre todo el documento
+        doc_sql = "d.doc"
+        if use_fts:
+            where_parts.append("d.doc @@ q.q")  # el que usa el índice GIN
+            weight_filter = rca_search.weight_filter(weights)
+            if weight_filter:
+                doc_sql = f"ts_filter(d.doc, {weight_filter})"
+                where_parts.append(f"{doc_sql} @@ q.q")
+        else:
+            where_parts.append("pd.id > %s")
+            params.append(after)
+
+            # Texto en columnas del PD
+            if like and text_cols:
+                or_blocks = [f"LOWER(pd.{col}) ILIKE %s" for col in text_cols]
+                params.extend([like] * len(or_blocks))
+                where_parts.append("( " + " OR ".join(or_blocks) + " )")
 
         # Fechas
         if when_from:
@@ -139,7 +266,7 @@ def register(mcp: FastMCP):
             params.append(plant_list)
 
         # Coincidencias en soluciones/acciones relacionadas
-        if like and (include_related_text is None or include_related_text):
+        if like and include_related and not use_fts:
             where_parts.append(
                 "("
                 " EXISTS (SELECT 1 FROM public.rca_data_solution s "
@@ -153,17 +280,38 @@ def register(mcp: FastMCP):
 
         where_sql = " AND ".join(where_parts)
 
-        select_pd = (
-            "SELECT "
-            "  pd.id::text AS id, pd.plant, pd.country, pd.region, "
-            "  pd.event_name, pd.start_date, pd.end_date, pd.facilitator, pd.leader, "
-            "  pd.status, pd.what, pd.where, pd.when "
-            "FROM public.rca_data_problem_definition pd "
-            f"WHERE {where_sql} "
-            "ORDER BY pd.id "
-            "LIMIT %s"
+        pd_columns = (
+            "pd.plant, pd.country, pd.region, "
+            "pd.event_name, pd.start_date, pd.end_date, pd.facilitator, pd.leader, "
+            "pd.status, pd.what, pd.where, pd.when"
         )
-        params.append(ps)
+        if use_fts:
+            # Keyset sobre (rank DESC, id): el rank se calcula en la subconsulta y se compara fuera
+            keyset = "TRUE"
+            if after:
+                keyset = "(t.rank < %s::real OR (t.rank = %s::real AND t.pd_id > %s))"
+            select_pd = (
+                f"SELECT t.pd_id::text AS id, {pd_columns.replace('pd.', 't.')}, t.rank FROM ( "
+                f"  SELECT pd.id AS pd_id, {pd_columns}, ts_rank({doc_sql}, q.q) AS rank "
+                "  FROM public.rca_data_problem_definition pd "
+                "  JOIN public.mcp_rca_search_doc d ON d.pd_id = pd.id "
+                f"  CROSS JOIN to_tsquery({rca_search.CFG}, %s) AS q(q) "
+                f"  WHERE {where_sql} "
+                ") t "
+                f"WHERE {keyset} "
+                "ORDER BY t.rank DESC, t.pd_id "
+                "LIMIT %s"
+            )
+            params = [tsquery] + params + ([after[0], after[0], after[1]] if after else []) + [ps]
+        else:
+            select_pd = (
+                f"SELECT pd.id::text AS id, {pd_columns} "
+                "FROM public.rca_data_problem_definition pd "
+                f"WHERE {where_sql} "
+                "ORDER BY pd.id "
+                "LIMIT %s"
+            )
+            params.append(ps)
 
         rows = await db_cause.fetch_all(select_pd, tuple(params))
 
@@ -171,41 +319,39 @@ def register(mcp: FastMCP):
         if (detail or "summary").lower() == "full" and rows:
             pd_ids = [int(r["id"]) for r in rows]
 
-            sol_rows = await db_cause.fetch_all(
-                """
-                SELECT
-                    s.id::text AS id,
-                    s."rca_ID"::text AS rca_id,
-                    s.related_cause, s.solution, s.tpn, s.ease, s.impact,
-                    s.validation_date, s.best_solution
-                FROM public.rca_data_solution s
-                WHERE s."rca_ID" = ANY(%s)
-                ORDER BY s.id
-                """,
-                (pd_ids,),
-            )
-            act_rows = await db_cause.fetch_all(
-                """
-                SELECT
-                    a.id::text AS id,
-                    a."rca_ID"::text AS rca_id,
-                    a.related_solution, a.action, a.creation_date,
-                    a.responsible, a.due_date, a.completion_date,
-                    a.plant, a.country, a.region
-                FROM public.rca_data_action a
-                WHERE a."rca_ID" = ANY(%s)
-                ORDER BY a.id
-                """,
-                (pd_ids,),
+            related = await fanout.gather(
+                {
+                    "solutions": _fetch_grouped_by_rca(
+                        """
+                        SELECT
+                            s.id::text AS id,
+                            s."rca_ID"::text AS rca_id,
+                            s.related_cause, s.solution, s.tpn, s.ease, s.impact,
+                            s.validation_date, s.best_solution
+                        FROM public.rca_data_solution s
+                        WHERE s."rca_ID" = ANY(%s)
+                        ORDER BY s.id
+                        """,
+                        (pd_ids,),
+                    ),
+                    "actions": _fetch_grouped_by_rca(
+                        """
+                        SELECT
+                            a.id::text AS id,
+                            a."rca_ID"::text AS rca_id,
+                            a.related_solution, a.action, a.creation_date,
+                            a.responsible, a.due_date, a.completion_date,
+                            a.plant, a.country, a.region
+                        FROM public.rca_data_action a
+                        WHERE a."rca_ID" = ANY(%s)
+                        ORDER BY a.id
+                        """,
+                        (pd_ids,),
+                    ),
+                },
+                limit=db_cause.POOL_SIZE,
             )
-
-            sols_by: Dict[str, List[Dict[str, Any]]] = {}
-            for s in sol_rows:
-                sols_by.setdefault(s["rca_id"], []).append(s)
-
-            acts_by: Dict[str, List[Dict[str, Any]]] = {}
-            for a in act_rows:
-                acts_by.setdefault(a["rca_id"], []).append(a)
+            sols_by, acts_by = related["solutions"], related["actions"]
 
             for r in rows:
                 rid = r["id"]
@@ -215,10 +361,16 @@ def register(mcp: FastMCP):
                 r["actionsCount"] = len(r["actions"])
 
         next_cursor = rows[-1]["id"] if rows and len(rows) == ps else None
+        if use_fts:
+            if next_cursor:
+                next_cursor = _enc_rank_cursor(rows[-1]["rank"], next_cursor)
+            for r in rows:
+                r["rank"] = round(r["rank"], 4)
         return {"count": len(rows), "next_cursor": next_cursor, "problems": rows}
 
     # -------------------------- rca_get_detail --------------------------
     @mcp.tool(description="Devuelve el detalle de un RCA (por rca_id = id de PD), con sus Solutions y Actions.")
+    @cache.cached()
     async def rca_get_detail(
         rca_id: Optional[str] = None,   # id de PD
         problem_id: Optional[str] = None,  # alias del mismo parámetro (compat.)
@@ -227,48 +379,55 @@ def register(mcp: FastMCP):
         if not rid:
             return {"error": "Debe indicar rca_id (id del Problem Definition)"}
 
-        pd_row = await db_cause.fetch_one(
-            """
-            SELECT
-                pd.id::text AS id, pd.plant, pd.country, pd.region,
-                pd.event_name, pd.start_date, pd.end_date, pd.facilitator, pd.leader,
-                pd.status, pd.what, pd.where, pd.when
-            FROM public.rca_data_problem_definition pd
-            WHERE pd.id = %s
-            LIMIT 1
-            """,
-            (int(rid),),
+        # PD, Solutions y Actions son independientes: en paralelo (latencia = la mayor, no la suma)
+        res = await fanout.gather(
+            {
+                "pd": db_cause.fetch_one(
+                    """
+                    SELECT
+                        pd.id::text AS id, pd.plant, pd.country, pd.region,
+                        pd.event_name, pd.start_date, pd.end_date, pd.facilitator, pd.leader,
+                        pd.status, pd.what, pd.where, pd.when
+                    FROM public.rca_data_problem_definition pd
+                    WHERE pd.id = %s
+                    LIMIT 1
+                    """,
+                    (int(rid),),
+                ),
+                "solutions": db_cause.fetch_all(
+                    """
+                    SELECT
+                        s.id::text AS id,
+                        s."rca_ID"::text AS rca_id,
+                        s.related_cause, s.solution, s.tpn, s.ease, s.impact,
+                        s.validation_date, s.best_solution
+                    FROM public.rca_data_solution s
+                    WHERE s."rca_ID" = %s
+                    ORDER BY s.id
+                    """,
+                    (int(rid),),
+                ),
+                "actions": db_cause.fetch_all(
+                    """
+                    SELECT
+                        a.id::text AS id,
+                        a."rca_ID"::text AS rca_id,
+                        a.related_solution, a.action, a.creation_date,
+                        a.responsible, a.due_date, a.completion_date,
+                        a.plant, a.country, a.region
+                    FROM public.rca_data_action a
+                    WHERE a."rca_ID" = %s
+                    ORDER BY a.id
+                    """,
+                    (int(rid),),
+                ),
+            },
+            limit=db_cause.POOL_SIZE,
         )
+        pd_row, solutions, actions = res["pd"], res["solutions"], res["actions"]
         if not pd_row:
             return {"error": "RCA no encontrado"}
 
-        solutions = await db_cause.fetch_all(
-            """
-            SELECT
-                s.id::text AS id,
-                s."rca_ID"::text AS rca_id,
-                s.related_cause, s.solution, s.tpn, s.ease, s.impact,
-                s.validation_date, s.best_solution
-            FROM public.rca_data_solution s
-            WHERE s."rca_ID" = %s
-            ORDER BY s.id
-            """,
-            (int(rid),),
-        )
-        actions = await db_cause.fetch_all(
-            """
-            SELECT
-                a.id::text AS id,
-                a."rca_ID"::text AS rca_id,
-                a.related_solution, a.action, a.creation_date,
-                a.responsible, a.due_date, a.completion_date,
-                a.plant, a.country, a.region
-            FROM public.rca_data_action a
-            WHERE a."rca_ID" = %s
-            ORDER BY a.id
-            """,
-            (int(rid),),
-        )
         pd_row["solutions"] = solutions
         pd_row["actions"] = actions
         pd_row["solutionsCount"] = len(solutions)
@@ -283,6 +442,7 @@ def register(mcp: FastMCP):
             "Incluye, opcionalmente, la suma de Solutions y Actions relacionadas (por pd.id)."
         )
     )
+    @cache.cached()
     async def rca_group_problems(
         by: Optional[str] = "plant",            # plant|date|status
         date_grain: Optional[str] = "day",      # day|week|month (solo si by=date)
@@ -296,24 +456,7 @@ def register(mcp: FastMCP):
         if by not in {"plant", "date", "status"}:
             return {"error": "'by' debe ser plant|date|status"}
 
-        status_list = _parse_list(status)
-        plant_list = _parse_list(plant)
-
-        where_parts = ["TRUE"]
-        params: List[Any] = []
-        if when_from:
-            where_parts.append("pd.when >= %s")
-            params.append(when_from)
-        if when_to:
-            where_parts.append("pd.when <= %s")
-            params.append(when_to)
-        if status_list:
-            where_parts.append("LOWER(pd.status) = ANY(%s)")
-            params.append([s.lower() for s in status_list])
-        if plant_list:
-            where_parts.append("pd.plant = ANY(%s)")
-            params.append(plant_list)
-
+        where_parts, params = _pd_filters(when_from, when_to, _parse_list(status), _parse_list(plant))
         where_sql = " AND ".join(where_parts)
 
         if by == "plant":
@@ -329,63 +472,32 @@ def register(mcp: FastMCP):
             group_select = f"date_trunc('{grain}', pd.when)::date AS key"
             group_by = f"date_trunc('{grain}', pd.when)"
 
-        sql = f"""
-            SELECT
-                {group_select},
-                COUNT(*)::int AS problems
-            FROM public.rca_data_problem_definition pd
-            WHERE {where_sql}
-            GROUP BY {group_by}
-            ORDER BY {group_by}
-        """
-        rows = await db_cause.fetch_all(sql, tuple(params))
-
-        if include_counts_related and rows:
-            # Mapear key -> lista de pd.id
-            sql_keys = f"""
-                SELECT {group_select} AS key, pd.id::int AS id
+        if include_counts_related:
+            sql, query_params = _related_counts_sql(
+                f"{group_select}, COUNT(*)::int AS problems, "
+                "COALESCE(SUM(s.c), 0)::int AS solutions, COALESCE(SUM(a.c), 0)::int AS actions",
+                where_parts,
+                params,
+                tail=f"GROUP BY {group_by} ORDER BY {group_by}",
+            )
+        else:
+            sql = f"""
+                SELECT
+                    {group_select},
+                    COUNT(*)::int AS problems
                 FROM public.rca_data_problem_definition pd
                 WHERE {where_sql}
+                GROUP BY {group_by}
+                ORDER BY {group_by}
             """
-            key_rows = await db_cause.fetch_all(sql_keys, tuple(params))
-            ids_by_key: Dict[Any, List[int]] = {}
-            for kr in key_rows:
-                ids_by_key.setdefault(kr["key"], []).append(kr["id"])
-
-            all_ids = list({pid for lst in ids_by_key.values() for pid in lst})
-            sols_by: Dict[int, int] = {}
-            acts_by: Dict[int, int] = {}
-            if all_ids:
-                sol_counts = await db_cause.fetch_all(
-                    """
-                    SELECT s."rca_ID"::int AS pid, COUNT(*)::int AS c
-                    FROM public.rca_data_solution s
-                    WHERE s."rca_ID" = ANY(%s)
-                    GROUP BY s."rca_ID"
-                    """,
-                    (all_ids,),
-                )
-                act_counts = await db_cause.fetch_all(
-                    """
-                    SELECT a."rca_ID"::int AS pid, COUNT(*)::int AS c
-                    FROM public.rca_data_action a
-                    WHERE a."rca_ID" = ANY(%s)
-                    GROUP BY a."rca_ID"
-                    """,
-                    (all_ids,),
-                )
-                sols_by = {r["pid"]: r["c"] for r in sol_counts}
-                acts_by = {r["pid"]: r["c"] for r in act_counts}
-
-            for r in rows:
-                pid_list = ids_by_key.get(r["key"], [])
-                r["solutions"] = sum(sols_by.get(pid, 0) for pid in pid_list)
-                r["actions"]  = sum(acts_by.get(pid, 0) for pid in pid_list)
+            query_params = params
+        rows = await db_cause.fetch_all(sql, tuple(query_params))
 
         return {"by": by, "rows": rows}
 
     # -------------------------- rca_list_related --------------------------
     @mcp.tool(description="Lista Solutions o Actions relacionadas a uno o varios rca_id (ids de PD).")
+    @cache.cached()
     async def rca_list_related(
         kind: Optional[str] = "solutions",      # solutions|actions|both
         rca_id: Optional[str] = None,
@@ -406,6 +518,9 @@ def register(mcp: FastMCP):
         ps = utils._page_size(page_size)
         after_id = int(cursor) if cursor else 0
         like = _like_param(text)
+        # Con el índice construido, búsqueda por palabras sobre los índices GIN de expresión
+        tsquery = rca_search.tsquery_text(text) if like else None
+        use_fts = bool(tsquery) and await rca_search.index.ready()
 
         ids = rca_ids or ([] if rca_id is None else [rca_id])
         try:
@@ -413,7 +528,7 @@ def register(mcp: FastMCP):
         except Exception:
             return {"error": "rca_id/rca_ids deben ser enteros (ids de PD)"}
 
-        out: Dict[str, Any] = {}
+        queries: Dict[str, Any] = {}
 
         # Solutions
         if kind in {"solutions", "both"}:
@@ -422,7 +537,10 @@ def register(mcp: FastMCP):
             if ids:
                 parts.append('s."rca_ID" = ANY(%s)')
                 prms.append(ids)
-            if like:
+            if use_fts:
+                parts.append(f"to_tsvector({rca_search.CFG}, COALESCE(s.solution, '')) @@ to_tsquery({rca_search.CFG}, %s)")
+                prms.append(tsquery)
+            elif like:
                 parts.append("LOWER(COALESCE(s.solution,'')) ILIKE %s")
                 prms.append(like)
             if validation_from:
@@ -443,12 +561,7 @@ def register(mcp: FastMCP):
                 "ORDER BY s.id LIMIT %s"
             )
             prms.append(ps)
-            sols = await db_cause.fetch_all(sql_s, tuple(prms))
-            out["solutions"] = {
-                "count": len(sols),
-                "next_cursor": (sols[-1]["id"] if sols and len(sols) == ps else None),
-                "rows": sols,
-            }
+            queries["solutions"] = db_cause.fetch_all(sql_s, tuple(prms))
 
         # Actions
         if kind in {"actions", "both"}:
@@ -457,7 +570,10 @@ def register(mcp: FastMCP):
             if ids:
                 parts.append('a."rca_ID" = ANY(%s)')
                 prms.append(ids)
-            if like:
+            if use_fts:
+                parts.append(f"to_tsvector({rca_search.CFG}, COALESCE(a.action, '')) @@ to_tsquery({rca_search.CFG}, %s)")
+                prms.append(tsquery)
+            elif like:
                 parts.append("LOWER(COALESCE(a.action,'')) ILIKE %s")
                 prms.append(like)
             if responsible:
@@ -482,17 +598,22 @@ def register(mcp: FastMCP):
                 "ORDER BY a.id LIMIT %s"
             )
             prms.append(ps)
-            acts = await db_cause.fetch_all(sql_a, tuple(prms))
-            out["actions"] = {
-                "count": len(acts),
-                "next_cursor": (acts[-1]["id"] if acts and len(acts) == ps else None),
-                "rows": acts,
-            }
+            queries["actions"] = db_cause.fetch_all(sql_a, tuple(prms))
 
+        # kind=both: Solutions y Actions en paralelo
+        res = await fanout.gather(queries, limit=db_cause.POOL_SIZE)
+        out: Dict[str, Any] = {}
+        for name, found in res.items():
+            out[name] = {
+                "count": len(found),
+                "next_cursor": (found[-1]["id"] if found and len(found) == ps else None),
+                "rows": found,
+            }
         return out
 
     # -------------------------- rca_simple_counters --------------------------
     @mcp.tool(description="Contadores rápidos: total PDs, Solutions totales y Actions totales (con filtros básicos sobre PD).")
+    @cache.cached()
     async def rca_simple_counters(
         when_from: Optional[str] = None,
         when_to: Optional[str] = None,
@@ -501,51 +622,19 @@ def register(mcp: FastMCP):
     ) -> dict:
         status_list = _parse_list(status)
         plant_list = _parse_list(plant)
-
-        where_parts = ["TRUE"]
-        params: List[Any] = []
-        if when_from:
-            where_parts.append("pd.when >= %s")
-            params.append(when_from)
-        if when_to:
-            where_parts.append("pd.when <= %s")
-            params.append(when_to)
-        if status_list:
-            where_parts.append("LOWER(pd.status) = ANY(%s)")
-            params.append([s.lower() for s in status_list])
-        if plant_list:
-            where_parts.append("pd.plant = ANY(%s)")
-            params.append(plant_list)
-
-        where_sql = " AND ".join(where_parts)
-
-        totals = await db_cause.fetch_one(
-            f"SELECT COUNT(*)::int AS problems FROM public.rca_data_problem_definition pd WHERE {where_sql}",
-            tuple(params),
-        )
-
-        # Obtener ids de PD que cumplen filtros
-        pd_ids_rows = await db_cause.fetch_all(
-            f"SELECT pd.id::int AS id FROM public.rca_data_problem_definition pd WHERE {where_sql}",
-            tuple(params),
+        where_parts, params = _pd_filters(when_from, when_to, status_list, plant_list)
+
+        # PDs, Solutions y Actions en una sola sentencia (sin ids de PD ida y vuelta)
+        sql, query_params = _related_counts_sql(
+            "COUNT(*)::int AS problems, COALESCE(SUM(s.c), 0)::int AS solutions, "
+            "COALESCE(SUM(a.c), 0)::int AS actions",
+            where_parts,
+            params,
         )
-        pd_ids = [r["id"] for r in pd_ids_rows]
-
-        sol_c = act_c = 0
-        if pd_ids:
-            rs = await db_cause.fetch_one(
-                "SELECT COALESCE(SUM(c),0)::int AS c FROM (SELECT COUNT(*)::int AS c FROM public.rca_data_solution WHERE \"rca_ID\" = ANY(%s)) t",
-                (pd_ids,),
-            )
-            ra = await db_cause.fetch_one(
-                "SELECT COALESCE(SUM(c),0)::int AS c FROM (SELECT COUNT(*)::int AS c FROM public.rca_data_action   WHERE \"rca_ID\" = ANY(%s)) t",
-                (pd_ids,),
-            )
-            sol_c = rs["c"] if rs else 0
-            act_c = ra["c"] if ra else 0
 
+        row = await db_cause.fetch_one(sql, tuple(query_params))
         return {
-            "problems": totals.get("problems", 0) if totals else 0,
-            "solutions": sol_c,
-            "actions": act_c,
+            "problems": row["problems"] if row else 0,
+            "solutions": row["solutions"] if row else 0,
+            "actions": row["actions"] if row else 0,
         }
@@ -1,9 +1,13 @@
 from typing import Any, Dict, List, Optional, Union
 from fastmcp import FastMCP
-from google.cloud import bigquery
-import pandas as pd
+import logging
+import os
 import re
 
+from src.deps import bq, tis_index
+
+logger = logging.getLogger("plant-risk-mcp.tis")
+
 
 def register(mcp: FastMCP):
     """
@@ -11,18 +15,37 @@ def register(mcp: FastMCP):
     filtradas por plant_name.
     """
 
-    client = bigquery.Client(project="plants-of-tomorrow-poc")
-    MASTER_TABLE = "`plants-of-tomorrow-poc.AXIOM.LOG_INDEX_MASTER_MCP_test`"
+    # google.cloud.bigquery se importa (en un hilo) y el cliente se crea en la primera llamada
+    client = bq.LazyClient("plants-of-tomorrow-poc")
+    MASTER_TABLE_ID = "plants-of-tomorrow-poc.AXIOM.LOG_INDEX_MASTER_MCP_test"
+    MASTER_TABLE = f"`{MASTER_TABLE_ID}`"
     # Esquema de la tabla:
     # logname, aliasname, description, unit, ri_class, log_class, plant_name, proposed_alias
 
+    # Copia en memoria por planta: con los nombres de columna por defecto las tools leen de aquí
+    # y sólo van a BigQuery para cargar/refrescar (o con columnas personalizadas / extra_where)
+    master = tis_index.MasterIndex(client, MASTER_TABLE_ID)
+    # Pares por llamada en tis_update_alias_bulk (los parámetros viajan en la petición del job)
+    BULK_MAX_UPDATES = int(os.getenv("TIS_BULK_MAX_UPDATES", "5000"))
+
     # -------------------------
     # Utilidades internas
     # -------------------------
-    def _df_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
-        if df is None or df.empty:
-            return []
-        return df.to_dict(orient="records")
+    def _sensor_info(row: Dict[str, Any]) -> str:
+        # NULL -> 'N/A' (con iterrows un NULL salía como 'nan')
+        description, aliasname, unit = (
+            "N/A" if row[c] is None else row[c] for c in ("description", "aliasname", "unit")
+        )
+        return f"{description}, {aliasname}, measured in {unit}"
+
+    def _default_columns(**columns: str) -> bool:
+        return all(name == value for name, value in columns.items())
+
+    def _search_records(rows: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        return [
+            {"logname": r["logname"], "aliasname": r["aliasname"], "description": r["description"]}
+            for r in rows[:limit]
+        ]
 
     async def _lookup_sensor_info(
         plant_name: str,
@@ -39,6 +62,24 @@ def register(mcp: FastMCP):
         """
         result: Dict[str, Optional[str]] = {code: None for code in sensor_codes}
 
+        if _default_columns(
+            logname=logname_column,
+            plant_name=plant_column,
+            description=description_column,
+            aliasname=aliasname_column,
+            unit=unit_column,
+        ):
+            try:
+                by_logname = await master.by_logname(plant_name)
+                for code in sensor_codes:
+                    row = by_logname.get(code)
+                    if row is not None:
+                        result[code] = _sensor_info(row)
+                return result
+            except Exception as e:
+                logger.warning(f"[tis_lookup] índice maestro no disponible: {e}")
+                return result
+
         query = f"""
             SELECT
                 {logname_column} AS logname,
@@ -49,6 +90,7 @@ def register(mcp: FastMCP):
             WHERE {plant_column} = @plant_name
               AND {logname_column} IN UNNEST(@lognames)
         """
+        bigquery = await bq.bigquery()
         job_config = bigquery.QueryJobConfig(
             query_parameters=[
                 bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name),
@@ -57,10 +99,8 @@ def register(mcp: FastMCP):
         )
 
         try:
-            df = client.query(query, job_config=job_config).to_dataframe()
-            for _, row in df.iterrows():
-                info = f"{row.get('description','N/A')}, {row.get('aliasname','N/A')}, measured in {row.get('unit','N/A')}"
-                result[str(row["logname"])] = info
+            rows = await bq.query_rows(client, query, job_config)
+            result.update((str(r["logname"]), _sensor_info(r)) for r in rows)
         except Exception as e:
             print(f"[tis_lookup] BigQuery error: {e}")
 
@@ -74,6 +114,12 @@ def register(mcp: FastMCP):
     async def tis_list_plants(
         plant_column: str = "plant_name",
     ) -> List[Dict[str, Any]]:
+        if plant_column == "plant_name":
+            try:
+                return await master.plant_names()
+            except Exception as e:
+                return [{"status": "FAILURE", "error": str(e)}]
+
         query = f"""
             SELECT DISTINCT
                 {plant_column} AS plant_name
@@ -82,8 +128,7 @@ def register(mcp: FastMCP):
             ORDER BY plant_name
         """
         try:
-            df = client.query(query).to_dataframe()
-            return _df_to_records(df)
+            return await bq.query_rows(client, query)
         except Exception as e:
             return [{"status": "FAILURE", "error": str(e)}]
 
@@ -173,6 +218,7 @@ def register(mcp: FastMCP):
             WHERE {plant_column} = @plant_name
               AND {logname_column} = @logname
         """
+        bigquery = await bq.bigquery()
         job_config = bigquery.QueryJobConfig(
             query_parameters=[
                 bigquery.ScalarQueryParameter("proposed_alias", "STRING", proposed_alias),
@@ -181,12 +227,100 @@ def register(mcp: FastMCP):
             ]
         )
         try:
-            job = client.query(query, job_config=job_config)
-            job.result()
+            job = await bq.query(client, query, job_config)
+            master.invalidate(plant_name)
             return {"status": "SUCCESS", "rows_affected": job.num_dml_affected_rows}
         except Exception as e:
             return {"status": "FAILURE", "error": str(e)}
 
+    # ✅ UPDATE MASIVO: un solo MERGE por planta con los pares (logname, proposed_alias) como ARRAY<STRUCT>
+    @mcp.tool(description=(
+        "Actualiza 'proposed_alias' de muchos lognames de una PLANTA en un solo job de BigQuery (MERGE). "
+        "updates: lista de {logname, proposed_alias} (también vale la salida de tis_generate_log_alias: "
+        "{sensor_code, sensor_alias}). Devuelve el resultado por fila."
+    ))
+    async def tis_update_alias_bulk(
+        plant_name: str,
+        updates: List[Dict[str, Optional[str]]],
+        *,
+        plant_column: str = "plant_name",
+        logname_column: str = "logname",
+        proposed_alias_column: str = "proposed_alias",
+    ) -> Dict[str, Any]:
+        if not updates:
+            return {"status": "FAILURE", "error": "updates no puede estar vacío"}
+        if len(updates) > BULK_MAX_UPDATES:
+            return {"status": "FAILURE", "error": f"Máximo {BULK_MAX_UPDATES} updates por llamada"}
+
+        # Validación y duplicados (MERGE falla si dos filas origen casan con la misma destino): gana la última
+        results: List[Dict[str, Any]] = []
+        latest: Dict[str, int] = {}
+        for item in updates:
+            logname = (item.get("logname") or item.get("sensor_code") or "").strip()
+            alias = (item.get("proposed_alias") or item.get("sensor_alias") or "").strip()
+            status = "PENDING" if logname and alias else "INVALID"
+            results.append({"logname": logname or None, "proposed_alias": alias or None, "status": status})
+            if status == "PENDING":
+                if logname in latest:
+                    results[latest[logname]]["status"] = "SKIPPED_DUPLICATE"
+                latest[logname] = len(results) - 1
+        if not latest:
+            return {"status": "FAILURE", "error": "Ningún update válido (hacen falta logname y proposed_alias)", "results": results}
+
+        # Script de dos sentencias = un job: el MERGE y, como resultado del job, cuántas filas
+        # de la planta casan con cada logname (0 => no existe en la planta)
+        query = f"""
+            MERGE {MASTER_TABLE} AS t
+            USING (SELECT u.logname, u.proposed_alias FROM UNNEST(@updates) AS u) AS s
+            ON t.{plant_column} = @plant_name AND t.{logname_column} = s.logname
+            WHEN MATCHED THEN UPDATE SET {proposed_alias_column} = s.proposed_alias;
+
+            SELECT u.logname, COUNT(t.{logname_column}) AS rows_affected
+            FROM UNNEST(@updates) AS u
+            LEFT JOIN {MASTER_TABLE} AS t
+              ON t.{plant_column} = @plant_name AND t.{logname_column} = u.logname
+            GROUP BY u.logname
+        """
+        bigquery = await bq.bigquery()
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name),
+                bigquery.ArrayQueryParameter(
+                    "updates",
+                    "STRUCT",
+                    [
+                        bigquery.StructQueryParameter(
+                            None,
+                            bigquery.ScalarQueryParameter("logname", "STRING", logname),
+                            bigquery.ScalarQueryParameter("proposed_alias", "STRING", results[i]["proposed_alias"]),
+                        )
+                        for logname, i in latest.items()
+                    ],
+                ),
+            ]
+        )
+        try:
+            matched = {r["logname"]: r["rows_affected"] for r in await bq.query_rows(client, query, job_config)}
+        except Exception as e:
+            return {"status": "FAILURE", "error": str(e)}
+        master.invalidate(plant_name)
+
+        for logname, i in latest.items():
+            n = int(matched.get(logname) or 0)
+            results[i]["status"] = "UPDATED" if n else "NOT_FOUND"
+            results[i]["rows_affected"] = n
+        counts: Dict[str, int] = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return {
+            "status": "SUCCESS",
+            "plant_name": plant_name,
+            "requested": len(updates),
+            "rows_affected": sum(r.get("rows_affected", 0) for r in results),
+            "counts": counts,
+            "results": results,
+        }
+
     @mcp.tool(description="Busca lognames/alias/description similares en una PLANTA (regex personalizadas, sin hardcode).")
     async def tis_search_similar(
         plant_name: str,
@@ -210,6 +344,16 @@ def register(mcp: FastMCP):
         if not patterns:
             return [{"status": "FAILURE", "error": "patterns no puede estar vacío"}]
 
+        compiled = tis_index.compile_patterns(patterns)
+        if compiled is not None and _default_columns(
+            logname=logname_column, aliasname=aliasname_column, description=description_column, plant_name=plant_column
+        ):
+            try:
+                rows = await master.rows(plant_name)
+                return _search_records(tis_index.filter_rows(rows, target_cols, regexes=compiled, limit=limit), limit)
+            except Exception as e:
+                return [{"status": "FAILURE", "error": str(e)}]
+
         ors = []
         for col in target_cols:
             for i, _ in enumerate(patterns):
@@ -226,6 +370,7 @@ def register(mcp: FastMCP):
               AND ({where_or})
             LIMIT {limit}
         """
+        bigquery = await bq.bigquery()
         params = [bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name)]
         for col in target_cols:
             for i, pat in enumerate(patterns):
@@ -233,12 +378,11 @@ def register(mcp: FastMCP):
         job_config = bigquery.QueryJobConfig(query_parameters=params)
 
         try:
-            df = client.query(query, job_config=job_config).to_dataframe()
-            return _df_to_records(df)
+            return await bq.query_rows(client, query, job_config)
         except Exception as e:
             return [{"status": "FAILURE", "error": str(e)}]
 
-    @mcp.tool(description="Devuelve lognames/alias “parecidos” a un logname base dentro de una PLANTA (tokens + regex opcional).")
+    @mcp.tool(description="Devuelve lognames/alias “parecidos” a un logname base dentro de una PLANTA (tokens + regex opcional), ordenados por relevancia (score).")
     async def tis_similar_to_logname(
         plant_name: str,
         base_logname: str,
@@ -282,6 +426,15 @@ def register(mcp: FastMCP):
         if not clauses:
             return [{"status": "FAILURE", "error": "No hay tokens ni patrones para búsqueda"}]
 
+        compiled = tis_index.compile_patterns(extra_patterns or [])
+        if compiled is not None and _default_columns(
+            logname=logname_column, aliasname=aliasname_column, description=description_column, plant_name=plant_column
+        ):
+            try:
+                return await master.search(plant_name, tokens, target_cols, compiled, limit)
+            except Exception as e:
+                return [{"status": "FAILURE", "error": str(e)}]
+
         where_cond = " AND ".join([
             f"{plant_column} = @plant_name",
             "(" + " OR ".join(clauses) + ")",
@@ -296,6 +449,7 @@ def register(mcp: FastMCP):
             WHERE {where_cond}
             LIMIT {limit}
         """
+        bigquery = await bq.bigquery()
         params: List[bigquery.ScalarQueryParameter] = [
             bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name)
         ]
@@ -309,8 +463,7 @@ def register(mcp: FastMCP):
         job_config = bigquery.QueryJobConfig(query_parameters=params)
 
         try:
-            df = client.query(query, job_config=job_config).to_dataframe()
-            return _df_to_records(df)
+            return await bq.query_rows(client, query, job_config)
         except Exception as e:
             return [{"status": "FAILURE", "error": str(e)}]
 
@@ -323,6 +476,18 @@ def register(mcp: FastMCP):
         extra_where: Optional[str] = None,
         limit: int = 200
     ) -> List[Dict[str, Any]]:
+        if (
+            not extra_where
+            and plant_column == "plant_name"
+            and select_columns
+            and all(c in tis_index.COLUMNS for c in select_columns)
+        ):
+            try:
+                rows = await master.rows(plant_name)
+                return [{c: r[c] for c in select_columns} for r in rows[:limit]]
+            except Exception as e:
+                return [{"status": "FAILURE", "error": str(e)}]
+
         cols = ", ".join([f"{c}" for c in select_columns]) if select_columns else "*"
         query = f"""
             SELECT {cols}
@@ -333,16 +498,16 @@ def register(mcp: FastMCP):
             query += f" AND ({extra_where})"
         query += f" LIMIT {limit}"
 
+        bigquery = await bq.bigquery()
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name)]
         )
         try:
-            df = client.query(query, job_config=job_config).to_dataframe()
-            return _df_to_records(df)
+            return await bq.query_rows(client, query, job_config)
         except Exception as e:
             return [{"status": "FAILURE", "error": str(e)}]
 
-    @mcp.tool(description="Búsqueda guiada por CONTEXTO (HAC u otros términos) dentro de una PLANTA (plant_name).")
+    @mcp.tool(description="Búsqueda guiada por CONTEXTO (HAC u otros términos) dentro de una PLANTA (plant_name), ordenada por relevancia (score).")
     async def tis_guided_search_by_context(
         plant_name: str,
         natural_query: str,
@@ -362,6 +527,8 @@ def register(mcp: FastMCP):
           1) Tokenizar natural_query -> tokens (poco opinativo). Usar LIKE por tokens.
           2) Añadir REGEXP_CONTAINS para cada patrón de context_terms, synonyms y extra_patterns.
           3) Combinar todo con OR entre columnas objetivo.
+        Con las columnas por defecto se resuelve en memoria (tis_index): mismas filas más las
+        que sólo difieren por una errata, ordenadas por solape de tokens / edición / trigramas.
         """
         tokens = [t for t in re.split(r"[.\-:_+#/ ]+", natural_query) if t]
         tokens = tokens[:8]  # límite defensivo
@@ -398,6 +565,15 @@ def register(mcp: FastMCP):
         if not likes and not regexes:
             return [{"status": "FAILURE", "error": "No hay tokens ni patrones para búsqueda"}]
 
+        compiled = tis_index.compile_patterns(regex_patterns)
+        if compiled is not None and _default_columns(
+            logname=logname_column, aliasname=aliasname_column, description=description_column, plant_name=plant_column
+        ):
+            try:
+                return await master.search(plant_name, tokens, target_cols, compiled, limit)
+            except Exception as e:
+                return [{"status": "FAILURE", "error": str(e)}]
+
         where_parts = [f"{plant_column} = @plant_name"]
         col_filters = []
         if likes:
@@ -416,6 +592,7 @@ def register(mcp: FastMCP):
             LIMIT {limit}
         """
 
+        bigquery = await bq.bigquery()
         params: List[bigquery.ScalarQueryParameter] = [
             bigquery.ScalarQueryParameter("plant_name", "STRING", plant_name)
         ]
@@ -429,7 +606,6 @@ def register(mcp: FastMCP):
         job_config = bigquery.QueryJobConfig(query_parameters=params)
 
         try:
-            df = client.query(query, job_config=job_config).to_dataframe()
-            return _df_to_records(df)
+            return await bq.query_rows(client, query, job_config)
         except Exception as e:
             return [{"status": "FAILURE", "error": str(e)}]
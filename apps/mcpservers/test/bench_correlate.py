@@ -0,0 +1,220 @@
+"""
+Benchmark de minspect_correlate_alerts_notifications: bucle por alerta vs consulta LATERAL única.
+
+This script:
+  1. Arranca un Postgres local en Docker (o usa BENCH_PGHOST si ya tienes uno).
+  2. Con --seed (implícito con Docker) crea las tablas mpredict/minspect/plants con datos sintéticos.
+  3. Ejecuta la correlación de dos formas sobre la misma planta:
+       - loop:  1 consulta de alertas + 1 consulta de notificaciones por alerta (implementación anterior)
+       - batch: la tool actual (una sola consulta con LEFT JOIN LATERAL ... LIMIT 100)
+  4. Comprueba que ambas devuelven los mismos pares e imprime round-trips y tiempo por llamada.
+
+Run with (desde apps/mcpservers):
+    python test/bench_correlate.py --limit 50 --repeat 20
+    python test/bench_correlate.py --query-latency-ms 2   # simula la latencia de red de Cloud SQL
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from bench_db_backends import PGDB, PGPASS, PGUSER, CONTAINER, _connect, start_container, wait_ready  # noqa: E402
+
+
+def seed(host: str, port: int, plants: int, assets: int, alerts: int, notifications: int) -> None:
+    conn = _connect(host, port)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(
+        "DROP TABLE IF EXISTS public.plants_plant, public.mpredict_asset, "
+        "public.mpredict_mpredictalert, public.minspect_minspectdata CASCADE"
+    )
+    cur.execute("CREATE TABLE public.plants_plant (id serial PRIMARY KEY, name text, acs_code text, deleted_at timestamptz)")
+    cur.execute(
+        "CREATE TABLE public.mpredict_asset (id serial PRIMARY KEY, name text, plant_id int, area text, "
+        "risk_score float, risk_level text)"
+    )
+    cur.execute(
+        "CREATE TABLE public.mpredict_mpredictalert (id serial PRIMARY KEY, alert_id uuid DEFAULT gen_random_uuid(), "
+        "asset_id int, timestamp timestamptz, name text, state text, risk_score float, risk_level text, "
+        "feature_contribution jsonb)"
+    )
+    cur.execute(
+        "CREATE TABLE public.minspect_minspectdata (id serial PRIMARY KEY, notification_number text, plant_id int, "
+        "fl text, created_by text, description text, planner_grb text, device_id text, system_status text, "
+        "priority text, creation_date timestamp, year int, month int, week int)"
+    )
+    cur.execute(
+        "INSERT INTO public.plants_plant (name, acs_code) SELECT 'Plant ' || g, 'AC' || g FROM generate_series(1, %s) g",
+        (plants,),
+    )
+    cur.execute(
+        "INSERT INTO public.mpredict_asset (name, plant_id, area, risk_score, risk_level) "
+        "SELECT 'M' || g, 1 + g %% %s, 'A', random(), 'LOW' FROM generate_series(1, %s) g",
+        (plants, assets),
+    )
+    cur.execute(
+        "INSERT INTO public.mpredict_mpredictalert (asset_id, timestamp, name, state, risk_score, risk_level) "
+        "SELECT 1 + g %% %s, timestamptz '2024-06-01' - (g || ' hours')::interval, 'al', "
+        "(ARRAY['Open','Closed'])[1 + g %% 2], random(), 'HIGH' FROM generate_series(1, %s) g",
+        (assets, alerts),
+    )
+    cur.execute(
+        "INSERT INTO public.minspect_minspectdata (notification_number, plant_id, fl, created_by, description, "
+        "device_id, system_status, creation_date) "
+        "SELECT 'N' || g, 1 + g %% %s, 'FL' || g %% 50, 'user' || g %% 17, 'desc', 'D' || g %% 40, 'OSNO', "
+        "timestamp '2024-06-01' - ((g %% 8760) || ' hours')::interval FROM generate_series(1, %s) g",
+        (plants, notifications),
+    )
+    cur.execute("CREATE INDEX ON public.mpredict_asset (plant_id)")
+    cur.execute("CREATE INDEX ON public.mpredict_mpredictalert (asset_id, timestamp)")
+    cur.execute("CREATE INDEX ON public.minspect_minspectdata (plant_id, creation_date, id)")
+    cur.execute("ANALYZE")
+    conn.close()
+
+
+def _key(notification_no, created_at, asset):
+    # La tool devuelve created_at ya serializado (JSON); el bucle, datetime
+    return notification_no, created_at.isoformat() if hasattr(created_at, "isoformat") else created_at, asset
+
+
+# -----------------------------------------------------------------------------
+# Implementación anterior (una consulta de notificaciones por alerta), como referencia
+# -----------------------------------------------------------------------------
+async def correlate_loop(db_portal, pid, window_before_hours=72, window_after_hours=168, limit=50):
+    alerts = await db_portal.fetch_all(
+        """
+        SELECT m.id::text AS id, m.alert_id, m.timestamp, m.risk_score, m.name AS alert_type, a.name AS machine_name
+        FROM public.mpredict_mpredictalert m
+        JOIN public.mpredict_asset a ON a.id = m.asset_id
+        WHERE a.plant_id = %s
+        ORDER BY m.timestamp DESC, m.id DESC
+        LIMIT %s;
+        """,
+        (pid, limit),
+    )
+    pairs = []
+    for al in alerts:
+        ts = al["timestamp"]
+        notifs = await db_portal.fetch_all(
+            """
+            SELECT notification_number AS notification_no, created_by, creation_date AS created_at,
+                   device_id, fl, system_status
+            FROM public.minspect_minspectdata
+            WHERE plant_id = %s
+              AND creation_date BETWEEN %s::timestamp - %s::interval AND %s::timestamp + %s::interval
+            ORDER BY creation_date DESC, id DESC
+            LIMIT 100;
+            """,
+            (pid, ts, f"{window_before_hours} hours", ts, f"{window_after_hours} hours"),
+        )
+        pairs.append((str(al["alert_id"]), [_key(n["notification_no"], n["created_at"], n["device_id"] or n["fl"] or None)
+                                            for n in notifs]))
+    return pairs
+
+
+def run(args) -> None:
+    import anyio
+    from fastmcp import FastMCP
+    from src.deps import db_portal, plant_cache
+    from src.tools import minspect
+
+    calls = {"n": 0}
+    fetch_all, fetch_one = db_portal.fetch_all, db_portal.fetch_one
+    latency = args.query_latency_ms / 1000.0
+
+    # Cuenta round-trips (y añade latencia de red simulada) en el punto único de acceso a BD
+    async def counted_all(sql, params=None):
+        calls["n"] += 1
+        if latency:
+            await anyio.sleep(latency)
+        return await fetch_all(sql, params)
+
+    async def counted_one(sql, params=None):
+        calls["n"] += 1
+        if latency:
+            await anyio.sleep(latency)
+        return await fetch_one(sql, params)
+
+    db_portal.fetch_all, db_portal.fetch_one = counted_all, counted_one
+
+    mcp = FastMCP("bench")
+    minspect.register(mcp)
+
+    async def main():
+        tool = await mcp.get_tool("minspect_correlate_alerts_notifications")
+        await plant_cache.plants.ready()
+        pid = args.plant_id
+
+        results = {}
+        for name in ("loop", "batch"):
+            calls["n"] = 0
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                if name == "loop":
+                    out = await correlate_loop(db_portal, pid, limit=args.limit)
+                else:
+                    data = await tool.fn(plant_id=str(pid), limit=args.limit)
+                    out = [(str(p["alert"]["alert_id"]),
+                            [_key(n["notification_no"], n["created_at"], n["asset"]) for n in p["notifications"]])
+                           for p in data["pairs"]]
+            wall = time.perf_counter() - t0
+            results[name] = out
+            print(json.dumps({
+                "impl": name,
+                "alerts": len(out),
+                "pairs": sum(len(n) for _, n in out),
+                "round_trips_per_call": calls["n"] / args.repeat,
+                "ms_per_call": round(wall / args.repeat * 1000, 2),
+            }))
+        print(json.dumps({"same_result": results["loop"] == results["batch"]}))
+
+    anyio.run(main)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=50, help="alertas por llamada (parámetro limit de la tool)")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--plant-id", type=int, default=1)
+    ap.add_argument("--query-latency-ms", type=float, default=0.0, help="latencia artificial por round-trip")
+    ap.add_argument("--alerts", type=int, default=20_000)
+    ap.add_argument("--notifications", type=int, default=500_000)
+    ap.add_argument("--seed", action="store_true", help="recrea las tablas sintéticas (siempre con Docker)")
+    ap.add_argument("--port", type=int, default=int(os.getenv("BENCH_PGPORT", "55432")))
+    args = ap.parse_args()
+
+    host = os.getenv("BENCH_PGHOST")
+    started = False
+    if not host:
+        host = start_container(args.port)
+        started = True
+        args.seed = True
+    try:
+        wait_ready(host, args.port)
+        if args.seed:
+            seed(host, args.port, plants=10, assets=500, alerts=args.alerts, notifications=args.notifications)
+        os.environ.update(
+            PORTAL_PGHOST=host,
+            PORTAL_PGPORT=str(args.port),
+            PORTAL_PGUSER=PGUSER,
+            PORTAL_PGPASS=PGPASS,
+            PORTAL_PGDB=PGDB,
+            MPREDICT_AGG_ENABLED="false",
+            MCP_CACHE_TTL="0",  # medir la consulta, no la caché de resultados
+        )
+        run(args)
+    finally:
+        if started:
+            import subprocess
+
+            subprocess.run(["docker", "rm", "-f", CONTAINER], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark de backends de BD del MCP server (pg8000 + hilos vs asyncpg).
+
+This script:
+  1. Arranca un Postgres local en Docker (o usa BENCH_PGHOST si ya tienes uno).
+  2. Crea una tabla sintética y la rellena.
+  3. Lanza, para cada backend (DB_BACKEND=pg8000|asyncpg), N sesiones concurrentes
+     que hacen consultas vía src.deps.db_portal.fetch_all / fetch_one.
+  4. Imprime throughput y latencias p50/p95/p99 por backend.
+
+Run with (desde apps/mcpservers):
+    python test/bench_db_backends.py --sessions 200 --queries 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONTAINER = "mcp-bench-postgres"
+PGPASS = "bench"
+PGUSER = "postgres"
+PGDB = "postgres"
+
+
+def start_container(port: int) -> str:
+    subprocess.run(["docker", "rm", "-f", CONTAINER], capture_output=True)
+    subprocess.run(
+        [
+            "docker", "run", "-d", "--name", CONTAINER,
+            "-e", f"POSTGRES_PASSWORD={PGPASS}",
+            "-p", f"{port}:5432",
+            "postgres:16-alpine",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return "127.0.0.1"
+
+
+def wait_ready(host: str, port: int, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while True:
+        try:
+            _connect(host, port).close()
+            return
+        except Exception:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _connect(host: str, port: int):
+    import pg8000.dbapi
+
+    if host.startswith("/"):
+        return pg8000.dbapi.connect(user=PGUSER, password=PGPASS, database=PGDB, unix_sock=f"{host}/.s.PGSQL.{port}")
+    return pg8000.dbapi.connect(user=PGUSER, password=PGPASS, database=PGDB, host=host, port=port)
+
+
+def seed(host: str, port: int, rows: int) -> None:
+    conn = _connect(host, port)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS bench_items")
+    cur.execute(
+        "CREATE TABLE bench_items (id serial PRIMARY KEY, plant_id int, name text, ts timestamp, score float)"
+    )
+    cur.execute(
+        "INSERT INTO bench_items (plant_id, name, ts, score) "
+        "SELECT g %% 50, 'item ' || g, timestamp '2024-01-01' + (g || ' minutes')::interval, random() "
+        "FROM generate_series(1, %s) g",
+        (rows,),
+    )
+    cur.execute("CREATE INDEX ON bench_items (plant_id, id)")
+    cur.execute("ANALYZE bench_items")
+    conn.close()
+
+
+# -----------------------------------------------------------------------------
+# Worker (se ejecuta en un subproceso por backend: el backend se elige al importar)
+# -----------------------------------------------------------------------------
+def worker(sessions: int, queries: int, query_sleep_ms: float) -> None:
+    sys.path.insert(0, APP_DIR)
+    import anyio
+    from src.deps import db_portal
+
+    latencies = []
+    sleep = f", (SELECT pg_sleep({query_sleep_ms / 1000.0})) _s" if query_sleep_ms else ""
+    sql_page = f"SELECT id, name, ts, score FROM bench_items{sleep} WHERE plant_id = %s AND id > %s ORDER BY id LIMIT %s"
+    sql_one = "SELECT COUNT(*)::int AS c FROM bench_items WHERE plant_id = %s AND ts >= %s"
+
+    async def session(i: int) -> None:
+        for q in range(queries):
+            t0 = time.perf_counter()
+            if q % 2:
+                await db_portal.fetch_one(sql_one, (i % 50, "2024-01-05"))
+            else:
+                await db_portal.fetch_all(sql_page, (i % 50, q * 10, 50))
+            latencies.append(time.perf_counter() - t0)
+
+    async def main() -> float:
+        await db_portal.fetch_one("SELECT 1 AS ok")  # calienta el pool
+        t0 = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            for i in range(sessions):
+                tg.start_soon(session, i)
+        return time.perf_counter() - t0
+
+    wall = anyio.run(main)
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    print(json.dumps({
+        "backend": db_portal.BACKEND,
+        "queries": len(latencies),
+        "wall_s": round(wall, 3),
+        "qps": round(len(latencies) / wall, 1),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+    }))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=200, help="sesiones MCP concurrentes simuladas")
+    ap.add_argument("--queries", type=int, default=20, help="consultas por sesión")
+    ap.add_argument("--pool-size", type=int, default=10)
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--query-sleep-ms", type=float, default=0.0, help="latencia artificial por consulta (pg_sleep)")
+    ap.add_argument("--port", type=int, default=int(os.getenv("BENCH_PGPORT", "55432")))
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args.sessions, args.queries, args.query_sleep_ms)
+        return
+
+    host = os.getenv("BENCH_PGHOST")
+    started = False
+    if not host:
+        host = start_container(args.port)
+        started = True
+    try:
+        wait_ready(host, args.port)
+        seed(host, args.port, args.rows)
+        for backend in ("pg8000", "asyncpg"):
+            env = dict(
+                os.environ,
+                DB_BACKEND=backend,
+                PORTAL_PGHOST=host,
+                PORTAL_PGPORT=str(args.port),
+                PORTAL_PGUSER=PGUSER,
+                PORTAL_PGPASS=PGPASS,
+                PORTAL_PGDB=PGDB,
+                PORTAL_POOL_SIZE=str(args.pool_size),
+            )
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker",
+                 "--sessions", str(args.sessions), "--queries", str(args.queries),
+                 "--query-sleep-ms", str(args.query_sleep_ms)],
+                env=env, cwd=APP_DIR, check=True, capture_output=True, text=True,
+            )
+            print(out.stdout.strip().splitlines()[-1])
+    finally:
+        if started:
+            subprocess.run(["docker", "rm", "-f", CONTAINER], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark de regresión de rca_group_problems (include_counts_related=True) sobre datos RCA sintéticos.
+
+This script:
+  1. Arranca un Postgres local en Docker (o usa BENCH_PGHOST si ya tienes uno).
+  2. Con --seed (implícito con Docker) crea rca_data_problem_definition / solution / action con
+     --problems PDs y ~2 Solutions y ~3 Actions por PD.
+  3. Para cada agrupación (plant, status, date:month, y plant con filtros) ejecuta:
+       - multi: la implementación anterior (grupos + ids por key + 2 consultas con = ANY(ids))
+       - single: la tool actual (una sola sentencia con LEFT JOIN sobre subconsultas pre-agregadas)
+  4. Comprueba que ambas dan las mismas filas e imprime round-trips, ids enviados y tiempo por llamada.
+
+Run with (desde apps/mcpservers):
+    python test/bench_rca_group.py --problems 50000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from bench_db_backends import PGDB, PGPASS, PGUSER, CONTAINER, _connect, start_container, wait_ready  # noqa: E402
+
+
+def seed(host: str, port: int, problems: int) -> None:
+    conn = _connect(host, port)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(
+        "DROP TABLE IF EXISTS public.rca_data_problem_definition, public.rca_data_solution, "
+        "public.rca_data_action CASCADE"
+    )
+    cur.execute(
+        "CREATE TABLE public.rca_data_problem_definition (id serial PRIMARY KEY, plant text, country text, "
+        "region text, event_name text, start_date date, end_date date, facilitator text, leader text, "
+        "status text, what text, \"where\" text, \"when\" date)"
+    )
+    cur.execute(
+        "CREATE TABLE public.rca_data_solution (id serial PRIMARY KEY, \"rca_ID\" int, related_cause text, "
+        "solution text, tpn int, ease int, impact int, validation_date date, best_solution bool)"
+    )
+    cur.execute(
+        "CREATE TABLE public.rca_data_action (id serial PRIMARY KEY, \"rca_ID\" int, related_solution text, "
+        "action text, creation_date date, responsible text, due_date date, completion_date date, "
+        "plant text, country text, region text)"
+    )
+    cur.execute(
+        "INSERT INTO public.rca_data_problem_definition (plant, country, region, event_name, status, what, "
+        "\"where\", \"when\") "
+        "SELECT 'P' || g %% 40, 'Spain', 'EU', 'event ' || g, (ARRAY['Open','Closed','Cancelled'])[1 + g %% 3], "
+        "'what', 'kiln', date '2022-01-01' + g %% 1000 FROM generate_series(1, %s) g",
+        (problems,),
+    )
+    cur.execute(
+        "INSERT INTO public.rca_data_solution (\"rca_ID\", solution) "
+        "SELECT 1 + g %% %s, 'solution ' || g FROM generate_series(1, %s) g",
+        (problems, problems * 2),
+    )
+    cur.execute(
+        "INSERT INTO public.rca_data_action (\"rca_ID\", action) "
+        "SELECT 1 + g %% %s, 'action ' || g FROM generate_series(1, %s) g",
+        (problems, problems * 3),
+    )
+    cur.execute("CREATE INDEX ON public.rca_data_solution (\"rca_ID\")")
+    cur.execute("CREATE INDEX ON public.rca_data_action (\"rca_ID\")")
+    cur.execute("ANALYZE")
+    conn.close()
+
+
+# -----------------------------------------------------------------------------
+# Implementación anterior (4 round-trips, ids de PD ida y vuelta), como referencia
+# -----------------------------------------------------------------------------
+async def group_multi(db_cause, group_select, group_by, where_sql, params, stats):
+    rows = await db_cause.fetch_all(
+        f"SELECT {group_select}, COUNT(*)::int AS problems FROM public.rca_data_problem_definition pd "
+        f"WHERE {where_sql} GROUP BY {group_by} ORDER BY {group_by}",
+        params,
+    )
+    key_rows = await db_cause.fetch_all(
+        f"SELECT {group_select}, pd.id::int AS id FROM public.rca_data_problem_definition pd WHERE {where_sql}",
+        params,
+    )
+    ids_by_key = {}
+    for kr in key_rows:
+        ids_by_key.setdefault(kr["key"], []).append(kr["id"])
+    all_ids = [kr["id"] for kr in key_rows]
+    stats["ids_sent"] += 2 * len(all_ids)
+    sol = await db_cause.fetch_all(
+        'SELECT "rca_ID"::int AS pid, COUNT(*)::int AS c FROM public.rca_data_solution WHERE "rca_ID" = ANY(%s) GROUP BY 1',
+        (all_ids,),
+    )
+    act = await db_cause.fetch_all(
+        'SELECT "rca_ID"::int AS pid, COUNT(*)::int AS c FROM public.rca_data_action WHERE "rca_ID" = ANY(%s) GROUP BY 1',
+        (all_ids,),
+    )
+    sols_by = {r["pid"]: r["c"] for r in sol}
+    acts_by = {r["pid"]: r["c"] for r in act}
+    for r in rows:
+        ids = ids_by_key.get(r["key"], [])
+        r["solutions"] = sum(sols_by.get(i, 0) for i in ids)
+        r["actions"] = sum(acts_by.get(i, 0) for i in ids)
+    return rows
+
+
+# (key select, group by, WHERE equivalente para la referencia, params, kwargs de la tool)
+CASES = {
+    "plant": ("pd.plant AS key", "pd.plant", "TRUE", (), {"by": "plant"}),
+    "status": ("pd.status AS key", "pd.status", "TRUE", (), {"by": "status"}),
+    "date:month": ("date_trunc('month', pd.when)::date AS key", "date_trunc('month', pd.when)", "TRUE", (),
+                   {"by": "date", "date_grain": "month"}),
+    "plant open since 2024": ("pd.plant AS key", "pd.plant", "pd.when >= %s AND LOWER(pd.status) = ANY(%s)",
+                              ("2024-01-01", ["open"]), {"by": "plant", "when_from": "2024-01-01", "status": "Open"}),
+}
+
+
+def run(args) -> None:
+    import anyio
+    from fastmcp import FastMCP
+    from src.deps import db_cause
+    from src.tools import rca
+
+    calls = {"n": 0}
+    fetch_all = db_cause.fetch_all
+
+    async def counted_all(sql, params=()):
+        calls["n"] += 1
+        return await fetch_all(sql, params)
+
+    db_cause.fetch_all = counted_all
+
+    mcp = FastMCP("bench")
+    rca.register(mcp)
+
+    async def main():
+        tool = await mcp.get_tool("rca_group_problems")
+        for label, (group_select, group_by, where_sql, params, kwargs) in CASES.items():
+            results = {}
+            for impl in ("multi", "single"):
+                stats = {"ids_sent": 0}
+                calls["n"] = 0
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    if impl == "multi":
+                        out = await group_multi(db_cause, group_select, group_by, where_sql, params, stats)
+                    else:
+                        out = (await tool.fn(include_counts_related=True, **kwargs))["rows"]
+                wall = time.perf_counter() - t0
+                results[impl] = out
+                print(json.dumps({
+                    "by": label,
+                    "impl": impl,
+                    "groups": len(out),
+                    "round_trips_per_call": calls["n"] / args.repeat,
+                    "ids_sent_per_call": stats["ids_sent"] // args.repeat,
+                    "ms_per_call": round(wall / args.repeat * 1000, 2),
+                }))
+            print(json.dumps({"by": label, "same_result": results["multi"] == results["single"]}))
+
+    anyio.run(main)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--problems", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", action="store_true", help="recrea las tablas RCA sintéticas (siempre con Docker)")
+    ap.add_argument("--port", type=int, default=int(os.getenv("BENCH_PGPORT", "55432")))
+    args = ap.parse_args()
+
+    host = os.getenv("BENCH_PGHOST")
+    started = False
+    if not host:
+        host = start_container(args.port)
+        started = True
+        args.seed = True
+    try:
+        wait_ready(host, args.port)
+        if args.seed:
+            seed(host, args.port, args.problems)
+        os.environ.update(
+            RCA_PGHOST=host,
+            RCA_PGPORT=str(args.port),
+            RCA_PGUSER=PGUSER,
+            RCA_PGPASS=PGPASS,
+            RCA_PGDB=PGDB,
+            MCP_CACHE_TTL="0",  # medir la consulta, no la caché de resultados
+        )
+        run(args)
+    finally:
+        if started:
+            import subprocess
+
+            subprocess.run(["docker", "rm", "-f", CONTAINER], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de memoria de lectura de filas: fetch_all (dicts) vs fetch_rows (filas compactas)
+vs fetch_batches (cursor de servidor por lotes).
+
+This script:
+  1. Arranca un Postgres local en Docker (o usa BENCH_PGHOST si ya tienes uno).
+  2. Crea y rellena bench_items con --rows filas (misma tabla que bench_db_backends.py).
+  3. Para cada backend (DB_BACKEND=pg8000|asyncpg) lee la tabla entera de las tres formas y
+     agrega score por plant_id, como haría una tool que resume un resultado grande.
+  4. Imprime, por modo: tiempo, pico de memoria Python (tracemalloc) y colecciones del GC.
+
+Run with (desde apps/mcpservers):
+    python test/bench_row_streaming.py --rows 500000 --batch-size 2000
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from bench_db_backends import PGDB, PGPASS, PGUSER, CONTAINER, seed, start_container, wait_ready  # noqa: E402
+
+SQL = "SELECT id, plant_id, name, ts, score FROM bench_items ORDER BY id"
+
+
+def worker(batch_size: int) -> None:
+    import anyio
+    from src.deps import db_portal
+
+    async def consume(mode: str) -> int:
+        totals = {}
+        if mode == "fetch_all":
+            rows = await db_portal.fetch_all(SQL)
+        elif mode == "fetch_rows":
+            rows = await db_portal.fetch_rows(SQL)
+        else:
+            rows = None
+        if rows is not None:
+            for r in rows:
+                totals[r["plant_id"]] = totals.get(r["plant_id"], 0.0) + r["score"]
+            return len(rows)
+        n = 0
+        async for batch in db_portal.fetch_batches(SQL, (), batch_size):
+            for r in batch:
+                totals[r["plant_id"]] = totals.get(r["plant_id"], 0.0) + r["score"]
+            n += len(batch)
+        return n
+
+    async def main() -> None:
+        await db_portal.fetch_one("SELECT 1 AS ok")  # calienta el pool
+        for mode in ("fetch_all", "fetch_rows", "fetch_batches"):
+            gc.collect()
+            collections = sum(s["collections"] for s in gc.get_stats())
+            t0 = time.perf_counter()
+            rows = await consume(mode)
+            wall = time.perf_counter() - t0
+            gc_runs = sum(s["collections"] for s in gc.get_stats()) - collections
+
+            gc.collect()
+            tracemalloc.start()
+            await consume(mode)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(json.dumps({
+                "backend": db_portal.BACKEND,
+                "mode": mode,
+                "rows": rows,
+                "ms": round(wall * 1000, 1),
+                "peak_mib": round(peak / 2**20, 1),
+                "gc_collections": gc_runs,
+            }))
+
+    anyio.run(main)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--batch-size", type=int, default=2000)
+    ap.add_argument("--port", type=int, default=int(os.getenv("BENCH_PGPORT", "55432")))
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args.batch_size)
+        return
+
+    host = os.getenv("BENCH_PGHOST")
+    started = False
+    if not host:
+        host = start_container(args.port)
+        started = True
+    try:
+        wait_ready(host, args.port)
+        seed(host, args.port, args.rows)
+        for backend in ("pg8000", "asyncpg"):
+            env = dict(
+                os.environ,
+                DB_BACKEND=backend,
+                PORTAL_PGHOST=host,
+                PORTAL_PGPORT=str(args.port),
+                PORTAL_PGUSER=PGUSER,
+                PORTAL_PGPASS=PGPASS,
+                PORTAL_PGDB=PGDB,
+                PORTAL_STMT_CACHE_SIZE="0",
+            )
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", "--batch-size", str(args.batch_size)],
+                env=env, cwd=APP_DIR, check=True, capture_output=True, text=True,
+            )
+            for line in out.stdout.strip().splitlines()[-3:]:
+                print(line)
+    finally:
+        if started:
+            subprocess.run(["docker", "rm", "-f", CONTAINER], capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
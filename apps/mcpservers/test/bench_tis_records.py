@@ -0,0 +1,134 @@
+"""
+Microbenchmark de la conversión de resultados de BigQuery en las tools tis_, sin BigQuery.
+
+This script:
+  1. Genera --rows filas de una planta (logname, aliasname, description, unit) como
+     google.cloud.bigquery.table.Row, lo mismo que itera un RowIterator.
+  2. Convierte a la antigua: DataFrame -> iterrows() para el dict de lookup y
+     to_dict(orient="records") para los records (lo que hacían las tools con to_dataframe()).
+  3. Convierte como ahora: bq.query_rows (dicts directos del iterador) y el dict de lookup
+     recorriéndolos una vez, y comprueba que salen los mismos records y lognames (los NULL
+     del lookup ahora se ven como N/A, antes como 'nan').
+  4. Imprime el mejor de --repeat por modo y lo que cuesta importar pandas en un proceso nuevo
+     (coste que el arranque ya no paga si nadie pide un DataFrame).
+
+Run with (desde apps/mcpservers):
+    python test/bench_tis_records.py --rows 50000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+COLUMNS = ("logname", "aliasname", "description", "unit")
+
+
+class FakeJob:
+    job_id = "bench"
+
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def result(self, timeout=None):
+        return self
+
+    @property
+    def schema(self):
+        from google.cloud.bigquery import SchemaField
+
+        return [SchemaField(name, "STRING") for name in COLUMNS]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeClient:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def query(self, sql, job_config=None):
+        return FakeJob(self.rows)
+
+
+def make_rows(n: int):
+    from google.cloud.bigquery.table import Row
+
+    fields = {name: i for i, name in enumerate(COLUMNS)}
+    return [
+        Row(
+            (
+                f"KM1.TT{i:05d}",
+                f"Kiln_Motor_Bearing_Temp_{i}" if i % 4 else None,
+                f"KM1 Raw Coal Dosing to Mill Feeder {i}, Laufmeldung Kohlewaage",
+                "degC",
+            ),
+            fields,
+        )
+        for i in range(n)
+    ]
+
+
+def old_way(rows):
+    import pandas as pd
+
+    # Como to_dataframe() con columnas STRING (object, NULL -> None); cota inferior: sin Arrow
+    df = pd.DataFrame([r.values() for r in rows], columns=list(COLUMNS), dtype=object)
+    lookup = {}
+    for _, row in df.iterrows():
+        lookup[str(row["logname"])] = f"{row.get('description','N/A')}, {row.get('aliasname','N/A')}, measured in {row.get('unit','N/A')}"
+    records = df.to_dict(orient="records")
+    return lookup, records
+
+
+def new_way(rows):
+    import anyio
+    from src.deps import bq
+
+    records = anyio.run(bq.query_rows, FakeClient(rows), "SELECT ...")
+    na = lambda v: "N/A" if v is None else v  # noqa: E731  (como _sensor_info en tis.py)
+    lookup = dict(
+        (str(r["logname"]), f"{na(r['description'])}, {na(r['aliasname'])}, measured in {na(r['unit'])}")
+        for r in records
+    )
+    return lookup, records
+
+
+def import_ms(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=APP_DIR)
+    return round(float(out.stdout.strip()) * 1000, 1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rows = make_rows(args.rows)
+    old_way(rows[:10])  # importa pandas fuera de la medida
+    results = {}
+    for name, fn in (("pandas_iterrows", old_way), ("row_iterator", new_way)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            lookup, records = fn(rows)
+            best = min(best, time.perf_counter() - t0)
+        results[name] = (lookup, records)
+        print(json.dumps({"mode": name, "rows": args.rows, "best_ms": round(best * 1000, 1)}))
+
+    same = results["pandas_iterrows"][0].keys() == results["row_iterator"][0].keys()
+    same = same and results["pandas_iterrows"][1] == results["row_iterator"][1]
+    print(json.dumps({"same_output": same, "import_pandas_ms": import_ms("pandas")}))
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
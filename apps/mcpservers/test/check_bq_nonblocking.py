@@ -0,0 +1,175 @@
+"""
+Comprobación de que las tools tis_ no bloquean el event loop (src/deps/bq.py), sin BigQuery.
+
+This script:
+  1. Sustituye google.cloud.bigquery.Client por un cliente falso cuyos jobs tardan
+     --job-seconds en un time.sleep (bloqueante, como el cliente real) y anotan cancel().
+  2. Arranca el servidor completo (create_server) y lanza --concurrency llamadas a
+     tis_query_by_plant con extra_where (siempre van a BigQuery) mientras llama a `health`
+     en bucle: mide la latencia de health y cuántos jobs llegan a ejecutarse a la vez.
+  3. Con BQ_TIMEOUT_SECONDS bajo comprueba que la tool devuelve FAILURE y cancela el job.
+  4. Cancela una llamada en curso (cliente que se va) y comprueba que el job se cancela.
+
+Run with (desde apps/mcpservers):
+    python test/check_bq_nonblocking.py --concurrency 8 --job-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "src"))
+
+
+class FakeJob:
+    def __init__(self, client: "FakeClient", job_id: str, seconds: float) -> None:
+        self.client = client
+        self.job_id = job_id
+        self.seconds = seconds
+        self.cancelled = threading.Event()
+        self.num_dml_affected_rows = 0
+
+    def result(self, timeout=None):
+        with self.client.lock:
+            self.client.running += 1
+            self.client.max_running = max(self.client.max_running, self.client.running)
+        try:
+            deadline = time.monotonic() + min(self.seconds, timeout if timeout is not None else self.seconds)
+            while time.monotonic() < deadline and not self.cancelled.is_set():
+                time.sleep(0.01)
+            if self.cancelled.is_set():
+                raise RuntimeError(f"Job {self.job_id} was cancelled")
+            if timeout is not None and timeout < self.seconds:
+                raise TimeoutError(f"Job {self.job_id} timed out")
+            return self
+        finally:
+            with self.client.lock:
+                self.client.running -= 1
+
+    @property
+    def schema(self):
+        from google.cloud.bigquery import SchemaField
+
+        return [SchemaField(name, "STRING") for name in ("logname", "aliasname", "description", "unit")]
+
+    def __iter__(self):
+        from google.cloud.bigquery.table import Row
+
+        fields = {name: i for i, name in enumerate(("logname", "aliasname", "description", "unit"))}
+        return iter([Row((self.job_id, None, "fake", "C"), fields)])
+
+    def cancel(self) -> bool:
+        self.client.cancelled.append(self.job_id)
+        self.cancelled.set()
+        return True
+
+
+class FakeClient:
+    seconds = 1.0
+
+    def __init__(self, project=None, **kwargs) -> None:
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.jobs = 0
+        self.cancelled = []
+
+    def query(self, sql, job_config=None):
+        self.jobs += 1
+        return FakeJob(self, f"job-{self.jobs}", self.seconds)
+
+
+def run(args) -> None:
+    for k, v in {
+        "AUTH_DISABLED": "true", "ALLOWED_EMAILS": "check@example.com",
+        "GOOGLE_CLIENT_ID": "x", "GOOGLE_CLIENT_SECRET": "x",
+        "PORTAL_PGHOST": "127.0.0.1", "PORTAL_PGUSER": "x", "PORTAL_PGPASS": "x", "PORTAL_PGDB": "x",
+        "RCA_PGHOST": "127.0.0.1", "RCA_PGUSER": "x", "RCA_PGPASS": "x", "RCA_PGDB": "x",
+    }.items():
+        os.environ.setdefault(k, v)
+
+    import anyio
+    from fastmcp import Client
+    from google.cloud import bigquery
+
+    FakeClient.seconds = args.job_seconds
+    clients = []
+    bigquery.Client = lambda *a, **kw: clients.append(FakeClient(*a, **kw)) or clients[-1]
+
+    import server
+    from src.deps import bq
+
+    results = []
+
+    def check(name: str, ok: bool, **extra) -> None:
+        results.append(ok)
+        print(json.dumps({"check": name, "ok": ok, **extra}))
+
+    slow_args = {"plant_name": "P1", "extra_where": "unit = 'C'"}
+
+    async def main() -> None:
+        mcp = server.create_server()
+        async with Client(mcp) as c:
+            latencies = []
+            finished = []
+
+            async def slow_call() -> None:
+                r = await c.call_tool("tis_query_by_plant", slow_args)
+                finished.append(r.structured_content)
+
+            started = time.perf_counter()
+            async with anyio.create_task_group() as tg:
+                for _ in range(args.concurrency):
+                    tg.start_soon(slow_call)
+                while len(finished) < args.concurrency:
+                    t0 = time.perf_counter()
+                    await c.call_tool("health", {})
+                    latencies.append(time.perf_counter() - t0)
+                    await anyio.sleep(0.02)
+            wall = time.perf_counter() - started
+            fake = clients[0]  # el cliente de BigQuery se crea en la primera consulta
+            worst = max(latencies)
+            check(
+                f"health stays responsive during {args.concurrency} slow BigQuery calls",
+                worst < args.max_health_ms / 1000,
+                health_calls=len(latencies), worst_ms=round(worst * 1000, 1), wall_s=round(wall, 2),
+            )
+            check(
+                f"at most BQ_MAX_CONCURRENCY={bq.MAX_CONCURRENCY} jobs at once",
+                fake.max_running <= bq.MAX_CONCURRENCY, max_running=fake.max_running,
+            )
+            check("all slow calls succeeded", all("status" not in r["result"][0] for r in finished))
+
+            bq.TIMEOUT_SECONDS = args.job_seconds / 4
+            r = (await c.call_tool("tis_query_by_plant", slow_args)).structured_content["result"][0]
+            check("timeout -> FAILURE and job cancelled", r.get("status") == "FAILURE" and f"job-{fake.jobs}" in fake.cancelled, error=r.get("error"))
+            bq.TIMEOUT_SECONDS = args.job_seconds * 10
+
+            tool = await mcp.get_tool("tis_query_by_plant")
+            with anyio.move_on_after(args.job_seconds / 4):
+                await tool.fn(**slow_args)
+            await anyio.sleep(0.05)
+            check("cancelled call -> job cancelled", f"job-{fake.jobs}" in fake.cancelled, cancelled=fake.cancelled)
+
+        print(json.dumps({"passed": sum(results), "failed": len(results) - sum(results)}))
+
+    anyio.run(main)
+    if not all(results):
+        sys.exit(1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--job-seconds", type=float, default=1.5)
+    ap.add_argument("--max-health-ms", type=float, default=250.0)
+    run(ap.parse_args())
+
+
+if __name__ == "__main__":
+    main()
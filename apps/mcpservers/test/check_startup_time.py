@@ -0,0 +1,125 @@
+"""
+Regresión de arranque en frío del servidor MCP (python -X importtime), sin BD ni BigQuery.
+
+This script:
+  1. En un proceso nuevo, sólo con las variables de OAuth/whitelist (ninguna de BD), importa
+     server y llama a create_server(), como al arrancar un pod.
+  2. Comprueba que se han registrado las tools de todos los módulos y que NO se ha cargado
+     ningún backend pesado (BigQuery, pandas, pyarrow, Cloud SQL Connector, drivers Postgres):
+     se importan e inicializan en su primer uso.
+  3. Comprueba que la validación de variables de BD se hace en el primer uso (db_portal.stats()
+     falla entonces, no al importar).
+  4. Lee la salida de -X importtime: tiempo acumulado de `server` y de los módulos propios
+     (src.*), y falla si los propios superan --max-own-ms.
+
+Run with (desde apps/mcpservers):
+    python test/check_startup_time.py
+    python test/check_startup_time.py --max-own-ms 150 --top 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = (
+    "google.cloud.bigquery",
+    "google.cloud.sql.connector",
+    "pandas",
+    "pyarrow",
+    "asyncpg",
+    "pg8000",
+    "fastapi",
+)
+
+CHILD = f"""
+import asyncio, json, sys, time
+sys.path[:0] = [{APP_DIR!r}, {os.path.join(APP_DIR, "src")!r}]
+t0 = time.perf_counter()
+import server
+mcp = server.create_server()
+ready = time.perf_counter() - t0
+tools = sorted(t.name for t in asyncio.run(mcp.list_tools()))
+from src.deps import db_portal
+try:
+    db_portal.stats()
+    deferred = False
+except RuntimeError:
+    deferred = True
+print(json.dumps({{
+    "ready_ms": round(ready * 1000, 1),
+    "tools": tools,
+    "heavy_loaded": sorted(m for m in {HEAVY!r} if m in sys.modules),
+    "db_env_checked_on_first_use": deferred,
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """módulo -> µs acumulados (primera aparición)."""
+    out: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].strip()
+        out.setdefault(name, int(parts[1]))
+    return out
+
+
+def top_level_own(times: Dict[str, int]) -> List[Tuple[str, int]]:
+    # src.tools.x / src.deps.x ya incluyen a sus hijos: sumar sólo el primer nivel bajo src
+    own = [(m, us) for m, us in times.items() if m.startswith("src.") and m.count(".") == 2]
+    return sorted(own, key=lambda kv: -kv[1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-own-ms", type=float, default=200.0)
+    ap.add_argument("--top", type=int, default=8)
+    args = ap.parse_args()
+
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("PORTAL_", "RCA_", "DB_"))}
+    env.update(GOOGLE_CLIENT_ID="check", GOOGLE_CLIENT_SECRET="check", ALLOWED_EMAILS="check@example.com")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        env=env, cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-3000:])
+        sys.exit(proc.returncode)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    times = parse_importtime(proc.stderr)
+
+    own = top_level_own(times)
+    own_ms = sum(us for _, us in own) / 1000
+    checks = [
+        ("tools from every module registered",
+         all(any(t.startswith(p) for t in result["tools"]) for p in ("mpredict_", "minspect_", "rca_", "tis_", "admin_"))),
+        ("no heavy backend imported at startup", not result["heavy_loaded"]),
+        ("db env validated on first use", result["db_env_checked_on_first_use"]),
+        (f"own modules import < {args.max_own_ms:.0f} ms", own_ms < args.max_own_ms),
+    ]
+    print(json.dumps({
+        "server_import_ms": round(times.get("server", 0) / 1000, 1),
+        "ready_ms": result["ready_ms"],
+        "own_modules_ms": round(own_ms, 1),
+        "tools": len(result["tools"]),
+        "heavy_loaded": result["heavy_loaded"],
+    }))
+    for name, us in own[: args.top]:
+        print(json.dumps({"module": name, "ms": round(us / 1000, 1)}))
+    for name, ok in checks:
+        print(json.dumps({"check": name, "ok": ok}))
+    if not all(ok for _, ok in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
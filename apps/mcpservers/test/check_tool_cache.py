@@ -0,0 +1,130 @@
+"""
+Comprobación de la caché de resultados de tools (src/deps/cache.py), sin BD.
+
+This script:
+  1. Registra en un FastMCP una tool de prueba decorada con @cache.cached() que cuenta
+     sus ejecuciones y tarda --load-ms en responder.
+  2. Comprueba que el esquema de parámetros de la tool es el mismo con y sin decorador.
+  3. Lanza --concurrency llamadas idénticas a la vez (single-flight: 1 ejecución), repite
+     (hit), cambia argumentos (miss), espera al TTL (miss) e invalida por prefijo y por filtro.
+  4. Con --redis-url repite todo contra un Redis (o compatible: valkey, keydb...) local,
+     con dos instancias de caché para simular dos réplicas; y comprueba que la tool
+     admin_cache_invalidate borra por filtro las entradas de la caché global.
+
+Run with (desde apps/mcpservers):
+    python test/check_tool_cache.py
+    docker run -d --rm -p 6379:6379 valkey/valkey && python test/check_tool_cache.py --redis-url redis://localhost:6379/0
+    # sin Docker: python -c "from fakeredis import TcpFakeServer as S; S(('127.0.0.1', 6379)).serve_forever()"
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def run(args) -> None:
+    import anyio
+    from fastmcp import FastMCP
+    from src.deps import cache
+
+    runs = {"n": 0}
+    results = []
+
+    def check(name: str, ok: bool) -> None:
+        results.append(ok)
+        print(json.dumps({"check": name, "ok": ok}))
+
+    async def plant_summary(plant_id: Optional[str] = None, state: Optional[List[str]] = None, page_size: Optional[int] = None) -> dict:
+        runs["n"] += 1
+        await anyio.sleep(args.load_ms / 1000)
+        if plant_id == "missing":
+            return {"error": "Planta no encontrada"}
+        return {"plant_id": plant_id, "state": state, "run": runs["n"]}
+
+    async def scenario(label: str, tc: "cache.ToolCache", replica: Optional["cache.ToolCache"] = None) -> None:
+        mcp = FastMCP("check")
+        mcp.tool(description="prueba")(tc.cached(ttl=args.ttl)(plant_summary))
+        plain = FastMCP("plain")
+        plain.tool(description="prueba")(plant_summary)
+        tool = await mcp.get_tool("plant_summary")
+        check(f"{label}: same parameters schema", tool.parameters == (await plain.get_tool("plant_summary")).parameters)
+
+        await tc.invalidate()
+        runs["n"] = 0
+        async with anyio.create_task_group() as tg:
+            for _ in range(args.concurrency):
+                tg.start_soon(tool.fn, "3", ["open"])
+        check(f"{label}: {args.concurrency} concurrent identical calls -> 1 load", runs["n"] == 1)
+
+        await tool.fn(plant_id=" 3 ", state=["open"], page_size=None)
+        check(f"{label}: normalized kwargs hit", runs["n"] == 1)
+        await tool.fn("4", ["open"])
+        check(f"{label}: different args miss", runs["n"] == 2)
+        await tool.fn("missing")
+        await tool.fn("missing")
+        check(f"{label}: error responses not cached", runs["n"] == 4)
+
+        if replica is not None:
+            mcp2 = FastMCP("replica")
+            mcp2.tool(description="prueba")(replica.cached(ttl=args.ttl)(plant_summary))
+            await (await mcp2.get_tool("plant_summary")).fn("3", ["open"])
+            check(f"{label}: second replica hits shared entry", runs["n"] == 4)
+
+        removed = await tc.invalidate("plant_", plant_id="4")
+        await tool.fn("4", ["open"])
+        await tool.fn("3", ["open"])
+        check(f"{label}: filter invalidation drops only plant_id=4 ({removed})", removed == 1 and runs["n"] == 5)
+
+        removed = await tc.invalidate("plant_")
+        await tool.fn("3", ["open"])
+        check(f"{label}: prefix invalidation ({removed})", removed == 2 and runs["n"] == 6)
+
+        await anyio.sleep(args.ttl + 0.1)
+        await tool.fn("3", ["open"])
+        check(f"{label}: expired after ttl", runs["n"] == 7)
+
+    async def admin_scenario() -> None:
+        from fastmcp import Client
+        from src.tools import admin
+
+        admin.AUTH_DISABLED = True
+        mcp = FastMCP("admin")
+        mcp.tool(description="prueba")(cache.cached(ttl=args.ttl * 10)(plant_summary))
+        admin.register(mcp)
+        async with Client(mcp) as c:
+            await c.call_tool("plant_summary", {"plant_id": "8"})
+            await c.call_tool("plant_summary", {"plant_id": "9"})
+            before = runs["n"]
+            r = (await c.call_tool("admin_cache_invalidate", {"prefix": "plant_", "filters": {"plant_id": "8"}})).structured_content
+            await c.call_tool("plant_summary", {"plant_id": "8"})
+            await c.call_tool("plant_summary", {"plant_id": "9"})
+            check(f"admin_cache_invalidate drops only plant_id=8 ({r['removed']})", r["removed"] == 1 and runs["n"] == before + 1)
+
+    async def main():
+        await scenario("memory", cache.ToolCache(redis_url=None))
+        if args.redis_url:
+            await scenario("redis", cache.ToolCache(redis_url=args.redis_url), cache.ToolCache(redis_url=args.redis_url))
+        await admin_scenario()
+        print(json.dumps({"passed": sum(results), "failed": len(results) - sum(results)}))
+
+    anyio.run(main)
+    if not all(results):
+        sys.exit(1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--redis-url", default=os.getenv("MCP_CACHE_REDIS_URL"))
+    ap.add_argument("--ttl", type=float, default=1.0)
+    ap.add_argument("--load-ms", type=float, default=50.0)
+    ap.add_argument("--concurrency", type=int, default=20)
+    run(ap.parse_args())
+
+
+if __name__ == "__main__":
+    main()